@@ -0,0 +1,153 @@
+"""
+Fake GitHub Models server for benchmarks
+
+Answers OpenAI-style /chat/completions requests with canned tags, suggestions
+or translations, after a configurable delay and with a configurable error rate.
+Requests with "stream": true get the same text back as SSE chunks.
+
+Usage:
+    python benchmarks/fake_models_server.py --port 8099 --latency-ms 300 --jitter-ms 100 --error-rate 0.02
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TAGS = ['work', 'meeting', 'project', 'idea', 'learning', 'personal', 'todo', 'research']
+
+
+def _completion_text(messages, rng) -> str:
+    system = (messages[0].get('content') or '') if messages else ''
+    if 'generates relevant tags' in system:
+        return json.dumps(rng.sample(TAGS, 3))
+    if 'writing assistant' in system:
+        return json.dumps({
+            'improvements': ['Add a concrete example', 'State the goal up front'],
+            'tone_analysis': 'professional',
+            'readability_score': 'medium',
+            'suggested_edits': ['Split the long second sentence'],
+            'completion_suggestions': ['Add next steps']
+        })
+    user = (messages[-1].get('content') or '') if messages else ''
+    return '译文：' + user[:200]
+
+
+class FakeModelsHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeGitHubModels/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        config = self.server.config
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+
+        with self.server.lock:
+            delay = max(0.0, config['latency'] + self.server.rng.uniform(-config['jitter'], config['jitter']))
+            fail = self.server.rng.random() < config['error_rate']
+            text = _completion_text(body.get('messages', []), self.server.rng)
+            self.server.requests += 1
+        time.sleep(delay)
+
+        if not self.path.endswith('/chat/completions'):
+            self._send(404, {'error': 'not found'})
+        elif fail:
+            self._send(429, {'error': {'message': 'Rate limit exceeded (fake)'}})
+        elif body.get('stream'):
+            self._stream(body, text)
+        else:
+            prompt_tokens = sum(len((m.get('content') or '').split()) for m in body.get('messages', []))
+            self._send(200, {
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion',
+                'model': body.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                'usage': {
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': len(text.split()),
+                    'total_tokens': prompt_tokens + len(text.split())
+                }
+            })
+
+    def _stream(self, body, text):
+        """Send the completion as OpenAI-style SSE chunks, a few characters at a time"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            for start in range(0, len(text), 8):
+                chunk = {'choices': [{'index': 0, 'delta': {'content': text[start:start + 8]}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(self.server.config['token_delay'])
+            if (body.get('stream_options') or {}).get('include_usage'):
+                prompt_tokens = sum(len((m.get('content') or '').split()) for m in body.get('messages', []))
+                usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(text.split()),
+                         'total_tokens': prompt_tokens + len(text.split())}
+                self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode('utf-8'))
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            with self.server.lock:
+                self.server.cancelled += 1
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeModelsServer(ThreadingHTTPServer):
+    # Large listen backlog so bursts from the async client are not reset
+    request_queue_size = 1024
+
+
+def start_server(port: int = 0, latency_ms: float = 200, jitter_ms: float = 0,
+                 error_rate: float = 0.0, seed: int = 42, token_delay_ms: float = 10) -> FakeModelsServer:
+    """Start the fake server on a background thread; port 0 picks a free port"""
+    server = FakeModelsServer(('127.0.0.1', port), FakeModelsHandler)
+    server.daemon_threads = True
+    server.config = {
+        'latency': latency_ms / 1000,
+        'jitter': jitter_ms / 1000,
+        'error_rate': error_rate,
+        'token_delay': token_delay_ms / 1000
+    }
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.cancelled = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake GitHub Models API for benchmarks')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--token-delay-ms', type=float, default=10, help='Delay between streamed chunks')
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.seed,
+                          args.token_delay_ms)
+    print(f"Fake GitHub Models listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Benchmark suite for the NoteTaker hot API paths
+
+Seeds a database with a deterministic corpus, starts a fake GitHub Models
+server and drives the Flask app in-process. Each corpus size runs in its own
+interpreter so peak RSS is reported per size.
+
+WARNING: the target database is wiped (all tables dropped) before seeding.
+
+Without --database-url the suite runs against an embedded SQLite file in the
+temp directory, so it needs no external database.
+
+Usage:
+    python benchmarks/run.py --sizes 1000
+    python benchmarks/run.py --database-url postgresql://localhost/notetaker_bench --sizes 1000,10000
+    python benchmarks/run.py ... --save-baseline main
+    python benchmarks/run.py ... --compare main --threshold 0.2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+BASELINE_DIR = os.path.join(BENCH_DIR, 'baselines')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024, 1)
+
+
+def run_scenario(app, name, method, make_request, iterations, concurrency):
+    """Issue `iterations` requests over `concurrency` threads and summarize latency"""
+    def one(i):
+        client = app.test_client()
+        path, body = make_request(i)
+        started = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        response.close()  # Runs call_on_close hooks, as a WSGI server would
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(iterations)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status >= 400)
+    return {
+        'scenario': name,
+        'requests': iterations,
+        'errors': errors,
+        'throughput_rps': round(iterations / wall, 2) if wall else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def worker(args):
+    """Benchmark one corpus size inside this process and print JSON results"""
+    sys.path.insert(0, PROJECT_ROOT)
+    sys.path.insert(0, BENCH_DIR)
+    from fake_models_server import start_server
+
+    fake = start_server(0, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    base_url = f'http://127.0.0.1:{fake.server_address[1]}'
+    os.environ.update({
+        'DATABASE_URL': args.database_url,
+        'GITHUB_TOKEN': 'benchmark-token',
+        'GITHUB_MODELS_BASE_URL': base_url,
+        'TRANSLATION_API_ENDPOINT': f'{base_url}/chat/completions',
+        'DB_CONNECTION_MODE': 'pooled',
+        'DB_POOL_SIZE': str(max(args.concurrency, 5)),
+        # Concurrent export/analyze-all requests all come from one user; measure them, don't reject them
+        'TENANT_MAX_CONCURRENT_JOBS': '0',
+        # Likewise for the per-client rate limits and pool queues: measure capacity, not shedding
+        'ADMISSION_ENABLED': 'false',
+    })
+
+    from seed import reset_schema, seed_corpus
+    from src.main import app
+    from src.models.user import db
+
+    with app.app_context():
+        reset_schema(db)
+        seeded = seed_corpus(db, args.size, seed=args.seed, pending_analysis=args.pending_analysis)
+    note_ids = seeded['note_ids']
+    export_ids = note_ids[-args.export_notes:]
+    rss_after_seed = peak_rss_mb()
+
+    light = args.requests
+    heavy = max(1, min(args.requests, args.heavy_requests))
+    scenarios = [
+        ('get_notes', 'GET', lambda i: ('/api/notes', None), heavy),
+        ('get_notes_filtered', 'GET', lambda i: ('/api/notes?auto_tags=work', None), heavy),
+        ('search_notes', 'GET', lambda i: (f'/api/notes/search?q={["deadline", "budget", "travel"][i % 3]}', None), heavy),
+        ('get_note', 'GET', lambda i: (f'/api/notes/{note_ids[i % len(note_ids)]}', None), light),
+        ('export_markdown', 'POST', lambda i: ('/api/export/markdown', {'note_ids': export_ids}), heavy),
+        ('export_pdf', 'POST', lambda i: ('/api/export/pdf', {'note_ids': export_ids}), heavy),
+        ('export_docx', 'POST', lambda i: ('/api/export/docx', {'note_ids': export_ids}), heavy),
+        ('export_all', 'POST', lambda i: ('/api/export/all', {'note_ids': export_ids}), heavy),
+        ('analyze', 'POST', lambda i: (f'/api/notes/{note_ids[i % len(note_ids)]}/analyze', None), light),
+        ('translate', 'POST', lambda i: (f'/api/notes/{note_ids[i % len(note_ids)]}/translate', None), light),
+        ('analyze_all', 'POST', lambda i: ('/api/notes/analyze-all', {}), 1),
+    ]
+    selected = set(args.scenarios.split(',')) if args.scenarios else None
+
+    results = []
+    for name, method, make_request, iterations in scenarios:
+        if selected and name not in selected:
+            continue
+        concurrency = 1 if name == 'analyze_all' else args.concurrency
+        results.append(run_scenario(app, name, method, make_request, iterations, concurrency))
+
+    print(json.dumps({
+        'size': args.size,
+        'seeded': {key: value for key, value in seeded.items() if key != 'note_ids'},
+        'rss_after_seed_mb': rss_after_seed,
+        'peak_rss_mb': peak_rss_mb(),
+        'upstream_requests': fake.requests,
+        'scenarios': results
+    }))
+    fake.shutdown()
+    return 0
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def compare(report, baseline, threshold):
+    """Print per-scenario deltas; return the regressions beyond threshold"""
+    regressions = []
+    previous = {
+        (size['size'], row['scenario']): row
+        for size in baseline['sizes'] for row in size['scenarios']
+    }
+    print(f"\nComparison with baseline {baseline.get('name')} ({baseline.get('revision')}), threshold {threshold:.0%}")
+    for size in report['sizes']:
+        for row in size['scenarios']:
+            old = previous.get((size['size'], row['scenario']))
+            if not old:
+                continue
+            p99_change = (row['p99_ms'] - old['p99_ms']) / old['p99_ms'] if old['p99_ms'] else 0
+            rps_change = (row['throughput_rps'] - old['throughput_rps']) / old['throughput_rps'] if old['throughput_rps'] else 0
+            flag = ''
+            if p99_change > threshold or rps_change < -threshold:
+                flag = '  ❌ regression'
+                regressions.append((size['size'], row['scenario']))
+            print(f"  {size['size']:>7} {row['scenario']:<20} p99 {old['p99_ms']:>9} -> {row['p99_ms']:>9} ms ({p99_change:+.0%}) "
+                  f"rps {old['throughput_rps']:>8} -> {row['throughput_rps']:>8} ({rps_change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark NoteTaker hot API paths')
+    parser.add_argument('--database-url', default=os.environ.get('BENCH_DATABASE_URL'),
+                        help='Database to wipe and seed (default: $BENCH_DATABASE_URL, else a temporary SQLite file)')
+    parser.add_argument('--sizes', default='1000,10000', help='Comma-separated corpus sizes')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per light scenario')
+    parser.add_argument('--heavy-requests', type=int, default=20, help='Requests per list/search/export scenario')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--export-notes', type=int, default=200, help='Notes included in each export')
+    parser.add_argument('--pending-analysis', type=int, default=50, help='Notes left for analyze-all')
+    parser.add_argument('--latency-ms', type=float, default=200, help='Fake model latency')
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fake model error rate (0-1)')
+    parser.add_argument('--scenarios', help='Comma-separated subset of scenarios')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save-baseline', metavar='NAME', help='Save results as benchmarks/baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='Compare against benchmarks/baselines/NAME.json')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p99/throughput change')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not args.database_url:
+        args.database_url = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'notetaker_bench.db')
+    if args.worker:
+        return worker(args)
+
+    report = {
+        'revision': git_revision(),
+        'created_at': datetime.utcnow().isoformat(),
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('worker', 'size', 'database_url', 'save_baseline', 'compare')},
+        'sizes': []
+    }
+    forwarded = [
+        f'--{key.replace("_", "-")}={value}' for key, value in vars(args).items()
+        if value is not None and key not in ('worker', 'size', 'database_url', 'save_baseline', 'compare')
+    ]
+    for size in [int(value) for value in args.sizes.split(',') if value]:
+        print(f"Benchmarking {size} notes...", file=sys.stderr)
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *forwarded,
+             '--database-url', args.database_url, '--worker', '--size', str(size)],
+            cwd=PROJECT_ROOT, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(result.stderr[-3000:], file=sys.stderr)
+            return result.returncode
+        report['sizes'].append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    for size in report['sizes']:
+        print(f"\n{size['size']} notes (peak RSS {size['peak_rss_mb']} MB, {size['upstream_requests']} upstream calls)")
+        print(f"  {'scenario':<20} {'req':>5} {'err':>4} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'rss MB':>8}")
+        for row in size['scenarios']:
+            print(f"  {row['scenario']:<20} {row['requests']:>5} {row['errors']:>4} {row['throughput_rps']:>9} "
+                  f"{row['p50_ms']:>9} {row['p99_ms']:>9} {row['peak_rss_mb']:>8}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_path = os.path.join(RESULTS_DIR, f"{report['revision'] or 'run'}_{int(time.time())}.json")
+    with open(results_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {os.path.relpath(results_path, PROJECT_ROOT)}")
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        report['name'] = args.save_baseline
+        with open(os.path.join(BASELINE_DIR, f'{args.save_baseline}.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved as {args.save_baseline}")
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json')) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Deterministic corpus seeding for benchmarks
+
+Creates the schema and fills it with notes, tags and note-tag links generated
+from a fixed random seed, so every run measures the same data.
+"""
+import random
+from pathlib import Path
+from datetime import datetime, timedelta
+from sqlalchemy import insert, text
+
+WORDS = (
+    'meeting project deadline review budget design api database cache latency '
+    'roadmap customer feedback release sprint planning research idea draft '
+    'summary action item follow up team goal metric report launch bug fix '
+    'learning course chapter notes lecture exam family weekend travel recipe'
+).split()
+TAG_NAMES = [
+    'work', 'personal', 'ideas', 'meeting', 'todo', 'important', 'learning', 'project',
+    'research', 'travel', 'finance', 'health', 'reading', 'draft', 'archive', 'urgent'
+]
+BATCH_SIZE = 1000
+# Applied after create_all in the order the README's setup steps give, as on a migrated Supabase database
+MIGRATIONS = [
+    Path(__file__).resolve().parent.parent / name for name in (
+        'supabase_setup.sql',
+        'database_migration_tags.sql',
+        'database_migration_updated_at.sql',
+        'database_migration_llm_usage.sql',
+        'database_migration_note_stats.sql',
+        'database_migration_user_ownership.sql',
+        'database_migration_note_revisions.sql',
+        'database_migration_note_archive.sql',
+    )
+]
+
+
+def _sentence(rng: random.Random, length: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(length)).capitalize() + '.'
+
+
+def reset_schema(db) -> None:
+    """Drop and recreate all tables, plus the indexes the SQL migrations add"""
+    if db.engine.dialect.name == 'sqlite':
+        from src.services import sqlite_backend
+        sqlite_backend.drop_schema()
+        sqlite_backend.create_schema()
+        return
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.begin() as conn:
+            # Not in the models' metadata; tag_stats references tag and would block drop_all
+            conn.execute(text('DROP TABLE IF EXISTS note_stats_daily, tag_stats'))
+    db.drop_all()
+    db.create_all()
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.begin() as conn:
+            conn.execute(text('CREATE INDEX IF NOT EXISTS idx_note_tag_tag_id ON note_tag(tag_id)'))
+        # Triggers, summary tables and the per-user indexes, so writes pay the same cost as production
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            for migration in MIGRATIONS:
+                conn.exec_driver_sql(migration.read_text())
+            # Drop the sample notes and tags the setup scripts insert, and the summaries counting them
+            conn.exec_driver_sql(
+                'TRUNCATE note, tag, note_tag, note_stats_daily, tag_stats RESTART IDENTITY CASCADE'
+            )
+
+
+def seed_corpus(db, notes: int, seed: int = 42, pending_analysis: int = 50) -> dict:
+    """Insert `notes` notes; all but `pending_analysis` are marked as already analyzed"""
+    from src.models.note import Note, compute_text_stats
+    from src.models.tag import Tag, NoteTag
+
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1)
+
+    with db.engine.begin() as conn:
+        conn.execute(insert(Tag.__table__), [
+            {'name': name, 'color': '#6B73FF', 'created_at': now} for name in TAG_NAMES
+        ])
+        tag_ids = [row[0] for row in conn.execute(text('SELECT id FROM tag ORDER BY id'))]
+
+        note_ids = []
+        for start in range(0, notes, BATCH_SIZE):
+            rows = []
+            for i in range(start, min(start + BATCH_SIZE, notes)):
+                updated = now + timedelta(minutes=i)
+                analyzed = i >= pending_analysis
+                content = ' '.join(_sentence(rng, rng.randint(6, 20)) for _ in range(rng.randint(2, 12)))
+                rows.append({
+                    'title': _sentence(rng, rng.randint(3, 8))[:200],
+                    'content': content,
+                    **compute_text_stats(content),
+                    'auto_tags': rng.sample(TAG_NAMES, rng.randint(0, 4)),
+                    'created_at': updated,
+                    'updated_at': updated,
+                    'last_ai_analysis': updated + timedelta(seconds=1) if analyzed else None,
+                })
+            result = conn.execute(
+                insert(Note.__table__).returning(Note.__table__.c.id, sort_by_parameter_order=True), rows
+            )
+            note_ids.extend(row[0] for row in result)
+
+        links = []
+        for note_id in note_ids:
+            for tag_id in rng.sample(tag_ids, rng.randint(0, 3)):
+                links.append({'note_id': note_id, 'tag_id': tag_id, 'created_at': now})
+        for start in range(0, len(links), BATCH_SIZE):
+            conn.execute(insert(NoteTag.__table__), links[start:start + BATCH_SIZE])
+
+    return {'notes': len(note_ids), 'tags': len(tag_ids), 'note_tags': len(links), 'note_ids': note_ids}
@@ -0,0 +1,41 @@
+-- Database Migration: LLM Usage Ledger
+-- Run this in your Supabase SQL Editor
+
+-- Append-only ledger of GitHub Models calls (written in batches by the app)
+CREATE TABLE IF NOT EXISTS llm_usage (
+    id BIGSERIAL PRIMARY KEY,
+    -- UTC without a zone, like the datetime.utcnow() values the ledger writes and compares with
+    created_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC'),
+    service VARCHAR(50) NOT NULL,
+    method VARCHAR(80) NOT NULL,
+    note_id BIGINT, -- No foreign key: usage history outlives deleted notes
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms DOUBLE PRECISION NOT NULL DEFAULT 0,
+    status VARCHAR(20) NOT NULL,
+    cache_hit BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+-- Tables created by an earlier version of this file used TIMESTAMPTZ, so day boundaries
+-- depended on the session TimeZone
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'llm_usage' AND column_name = 'created_at' AND data_type = 'timestamp with time zone'
+    ) THEN
+        ALTER TABLE llm_usage
+            ALTER COLUMN created_at TYPE TIMESTAMP USING created_at AT TIME ZONE 'UTC',
+            ALTER COLUMN created_at SET DEFAULT (NOW() AT TIME ZONE 'UTC');
+    END IF;
+END $$;
+
+-- Time-range scans for the aggregate endpoint and daily budget checks
+CREATE INDEX IF NOT EXISTS idx_llm_usage_created_at ON llm_usage USING brin(created_at);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_service_method ON llm_usage(service, method, created_at);
+
+-- Verify the table was created
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'llm_usage'
+ORDER BY ordinal_position;
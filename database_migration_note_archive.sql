@@ -0,0 +1,44 @@
+-- Database Migration: Note Archive Tier
+-- Run this in your Supabase SQL Editor after database_migration_user_ownership.sql and
+-- database_migration_updated_at.sql
+
+-- Archived notes stay in note as stubs (title, tags, statistics, a short preview of the content)
+ALTER TABLE note ADD COLUMN IF NOT EXISTS is_archived BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE note ADD COLUMN IF NOT EXISTS archived_at TIMESTAMPTZ;
+ALTER TABLE note ADD COLUMN IF NOT EXISTS last_accessed_at TIMESTAMPTZ; -- Last rehydration; restarts the idle clock
+
+-- Archival candidates: the oldest notes still in the hot tier
+CREATE INDEX IF NOT EXISTS idx_note_hot_updated_at ON note(updated_at) WHERE NOT is_archived;
+
+-- Cold tier: content, content_zh and ai_suggestions as one zlib-compressed JSON payload per note
+CREATE TABLE IF NOT EXISTS note_archive (
+    note_id BIGINT PRIMARY KEY REFERENCES note(id) ON DELETE CASCADE,
+    user_id BIGINT, -- Copied from the note so searches stay within one user
+    payload BYTEA NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0, -- Uncompressed payload bytes
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    search TSVECTOR -- 'simple' vector of title and content, computed when the note is archived
+);
+
+-- Payloads are already compressed; skip TOAST's own compression attempt
+ALTER TABLE note_archive ALTER COLUMN payload SET STORAGE EXTERNAL;
+
+-- Searches over archived notes, per user (btree_gin, see database_migration_user_ownership.sql)
+CREATE INDEX IF NOT EXISTS idx_note_archive_user_search ON note_archive USING gin(user_id, search);
+
+-- Archiving and rehydration swap content for a preview and back; neither is an edit, so the note keeps
+-- its updated_at and its place in the list (extends database_migration_updated_at.sql)
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.is_archived IS NOT DISTINCT FROM OLD.is_archived
+       AND (NEW.title IS DISTINCT FROM OLD.title OR NEW.content IS DISTINCT FROM OLD.content) THEN
+        NEW.updated_at = NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+-- Verify the archive tier exists
+SELECT indexname FROM pg_indexes
+WHERE indexname IN ('idx_note_hot_updated_at', 'idx_note_archive_user_search');
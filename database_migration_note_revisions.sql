@@ -0,0 +1,47 @@
+-- Database Migration: Note Revision History
+-- Run this in your Supabase SQL Editor
+
+-- A zlib snapshot every REVISION_SNAPSHOT_INTERVAL revisions, compressed line diffs in between
+CREATE TABLE IF NOT EXISTS note_revision (
+    id BIGSERIAL PRIMARY KEY,
+    note_id BIGINT NOT NULL REFERENCES note(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    is_snapshot BOOLEAN NOT NULL DEFAULT FALSE,
+    title VARCHAR(200) NOT NULL,
+    payload BYTEA NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0, -- Uncompressed content length
+    edits INTEGER NOT NULL DEFAULT 1, -- Saves coalesced into this revision
+    -- UTC without a zone, like the datetime.utcnow() values the application compares them with
+    created_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC'),
+    updated_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC'),
+    -- Also serves latest-revision lookups and snapshot-to-revision range scans
+    CONSTRAINT uq_note_revision_seq UNIQUE (note_id, seq)
+);
+
+-- Tables created by an earlier version of this file used TIMESTAMPTZ, which psycopg2 returns as
+-- timezone-aware values that cannot be compared with the application's naive UTC timestamps
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'note_revision' AND column_name = 'created_at' AND data_type = 'timestamp with time zone'
+    ) THEN
+        ALTER TABLE note_revision
+            ALTER COLUMN created_at TYPE TIMESTAMP USING created_at AT TIME ZONE 'UTC',
+            ALTER COLUMN created_at SET DEFAULT (NOW() AT TIME ZONE 'UTC'),
+            ALTER COLUMN updated_at TYPE TIMESTAMP USING updated_at AT TIME ZONE 'UTC',
+            ALTER COLUMN updated_at SET DEFAULT (NOW() AT TIME ZONE 'UTC');
+    END IF;
+END $$;
+
+-- Age-based pruning (POST /api/revisions/prune) looks for notes with old revisions
+CREATE INDEX IF NOT EXISTS idx_note_revision_updated_at ON note_revision(updated_at);
+
+-- Payloads are already compressed; skip TOAST's own compression attempt
+ALTER TABLE note_revision ALTER COLUMN payload SET STORAGE EXTERNAL;
+
+-- Verify the table was created
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'note_revision'
+ORDER BY ordinal_position;
@@ -0,0 +1,186 @@
+-- Database Migration: Note Text Statistics and Analytics Summaries
+-- Run this in your Supabase SQL Editor
+
+-- Per-note text statistics (the app recomputes them whenever content is written)
+ALTER TABLE note ADD COLUMN IF NOT EXISTS word_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE note ADD COLUMN IF NOT EXISTS char_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE note ADD COLUMN IF NOT EXISTS sentence_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE note ADD COLUMN IF NOT EXISTS avg_word_length DOUBLE PRECISION NOT NULL DEFAULT 0;
+
+-- Backfill existing notes (same rules as compute_text_stats in src/models/note.py)
+UPDATE note SET
+    word_count = s.words,
+    char_count = char_length(content),
+    sentence_count = (
+        SELECT count(*) FROM regexp_split_to_table(content, '[.!?]+') AS part WHERE btrim(part) <> ''
+    ),
+    avg_word_length = CASE WHEN s.words = 0 THEN 0
+        ELSE round(char_length(regexp_replace(content, '\s', '', 'g'))::numeric / s.words, 2) END
+FROM (
+    SELECT id, CASE WHEN btrim(content) = '' THEN 0
+        ELSE array_length(regexp_split_to_array(btrim(content), '\s+'), 1) END AS words
+    FROM note
+) AS s
+WHERE note.id = s.id AND note.word_count = 0 AND btrim(note.content) <> '';
+
+-- Summary tables read by /api/analytics, maintained by the triggers below
+CREATE TABLE IF NOT EXISTS note_stats_daily (
+    day DATE PRIMARY KEY, -- note created_at date
+    notes INTEGER NOT NULL DEFAULT 0,
+    words BIGINT NOT NULL DEFAULT 0,
+    chars BIGINT NOT NULL DEFAULT 0,
+    translated INTEGER NOT NULL DEFAULT 0 -- notes with a Chinese translation
+);
+
+CREATE TABLE IF NOT EXISTS tag_stats (
+    tag_id BIGINT PRIMARY KEY REFERENCES tag(id) ON DELETE CASCADE,
+    notes INTEGER NOT NULL DEFAULT 0,
+    words BIGINT NOT NULL DEFAULT 0
+);
+
+-- Statement-level: one aggregated upsert per statement, so bulk writes and imports
+-- touch each day row once instead of once per note
+CREATE OR REPLACE FUNCTION note_stats_daily_refresh()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO note_stats_daily AS d (day, notes, words, chars, translated)
+        SELECT created_at::date, count(*), sum(word_count), sum(char_count), count(title_zh)
+        FROM new_rows GROUP BY 1
+        ON CONFLICT (day) DO UPDATE SET
+            notes = d.notes + EXCLUDED.notes, words = d.words + EXCLUDED.words,
+            chars = d.chars + EXCLUDED.chars, translated = d.translated + EXCLUDED.translated;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE note_stats_daily AS d SET
+            notes = d.notes - o.notes, words = d.words - o.words,
+            chars = d.chars - o.chars, translated = d.translated - o.translated
+        FROM (
+            SELECT created_at::date AS day, count(*) AS notes, sum(word_count) AS words,
+                   sum(char_count) AS chars, count(title_zh) AS translated
+            FROM old_rows GROUP BY 1
+        ) AS o
+        WHERE d.day = o.day;
+    ELSE
+        -- Net change per day; updates that leave the statistics alone (AI fields, tags) write nothing
+        INSERT INTO note_stats_daily AS d (day, notes, words, chars, translated)
+        SELECT day, sum(notes), sum(words), sum(chars), sum(translated) FROM (
+            SELECT created_at::date AS day, -1 AS notes, -word_count AS words,
+                   -char_count AS chars, -(title_zh IS NOT NULL)::int AS translated
+            FROM old_rows
+            UNION ALL
+            SELECT created_at::date, 1, word_count, char_count, (title_zh IS NOT NULL)::int
+            FROM new_rows
+        ) AS delta
+        GROUP BY day
+        HAVING sum(notes) <> 0 OR sum(words) <> 0 OR sum(chars) <> 0 OR sum(translated) <> 0
+        ON CONFLICT (day) DO UPDATE SET
+            notes = d.notes + EXCLUDED.notes, words = d.words + EXCLUDED.words,
+            chars = d.chars + EXCLUDED.chars, translated = d.translated + EXCLUDED.translated;
+
+        UPDATE tag_stats AS t SET words = t.words + delta.words
+        FROM (
+            SELECT nt.tag_id, sum(n.word_count - o.word_count) AS words
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            JOIN note_tag nt ON nt.note_id = n.id
+            WHERE n.word_count <> o.word_count
+            GROUP BY nt.tag_id
+        ) AS delta
+        WHERE t.tag_id = delta.tag_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS trigger_note_stats_insert ON note;
+CREATE TRIGGER trigger_note_stats_insert
+    AFTER INSERT ON note
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION note_stats_daily_refresh();
+
+DROP TRIGGER IF EXISTS trigger_note_stats_update ON note;
+CREATE TRIGGER trigger_note_stats_update
+    AFTER UPDATE ON note
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION note_stats_daily_refresh();
+
+DROP TRIGGER IF EXISTS trigger_note_stats_delete ON note;
+CREATE TRIGGER trigger_note_stats_delete
+    AFTER DELETE ON note
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION note_stats_daily_refresh();
+
+-- A deleted note's tag links are removed by the ON DELETE CASCADE after the note row is
+-- gone, so its words are taken off its tags here while the links still exist
+CREATE OR REPLACE FUNCTION tag_stats_note_deleted()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE tag_stats SET words = words - OLD.word_count
+    WHERE tag_id IN (SELECT tag_id FROM note_tag WHERE note_id = OLD.id);
+    RETURN OLD;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS trigger_tag_stats_note_deleted ON note;
+CREATE TRIGGER trigger_tag_stats_note_deleted
+    BEFORE DELETE ON note
+    FOR EACH ROW
+    EXECUTE FUNCTION tag_stats_note_deleted();
+
+CREATE OR REPLACE FUNCTION tag_stats_refresh()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO tag_stats AS t (tag_id, notes, words)
+        SELECT l.tag_id, count(*), COALESCE(sum(n.word_count), 0)
+        FROM new_links l LEFT JOIN note n ON n.id = l.note_id
+        GROUP BY l.tag_id
+        ON CONFLICT (tag_id) DO UPDATE SET notes = t.notes + EXCLUDED.notes, words = t.words + EXCLUDED.words;
+    ELSE
+        -- Notes deleted in the same statement are already gone and contribute 0 words here
+        UPDATE tag_stats AS t SET notes = t.notes - o.notes, words = t.words - o.words
+        FROM (
+            SELECT l.tag_id, count(*) AS notes, COALESCE(sum(n.word_count), 0) AS words
+            FROM old_links l LEFT JOIN note n ON n.id = l.note_id
+            GROUP BY l.tag_id
+        ) AS o
+        WHERE t.tag_id = o.tag_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS trigger_tag_stats_insert ON note_tag;
+CREATE TRIGGER trigger_tag_stats_insert
+    AFTER INSERT ON note_tag
+    REFERENCING NEW TABLE AS new_links
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION tag_stats_refresh();
+
+DROP TRIGGER IF EXISTS trigger_tag_stats_delete ON note_tag;
+CREATE TRIGGER trigger_tag_stats_delete
+    AFTER DELETE ON note_tag
+    REFERENCING OLD TABLE AS old_links
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION tag_stats_refresh();
+
+-- Rebuild the summaries from scratch (also safe to re-run to repair drift)
+BEGIN;
+LOCK TABLE note, note_tag IN SHARE MODE;
+TRUNCATE note_stats_daily, tag_stats;
+INSERT INTO note_stats_daily (day, notes, words, chars, translated)
+SELECT created_at::date, count(*), sum(word_count), sum(char_count), count(title_zh)
+FROM note GROUP BY 1;
+INSERT INTO tag_stats (tag_id, notes, words)
+SELECT nt.tag_id, count(*), sum(n.word_count)
+FROM note_tag nt JOIN note n ON n.id = nt.note_id
+GROUP BY nt.tag_id;
+COMMIT;
+
+-- Verify the summaries were populated
+SELECT 'note_stats_daily' AS summary, count(*) AS rows FROM note_stats_daily
+UNION ALL
+SELECT 'tag_stats', count(*) FROM tag_stats;
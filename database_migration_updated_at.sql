@@ -0,0 +1,19 @@
+-- Database Migration: Edit-Only updated_at Trigger
+-- Run this in your Supabase SQL Editor
+
+-- updated_at orders the notes list and marks notes as needing AI analysis again, so only edits of
+-- title or content bump it. The Note model applies the same rule to ORM writes, so background enrichment,
+-- translation and AI analysis results keep the note's position;
+-- updates that set updated_at themselves (tag changes, updated_at = updated_at) keep the value they set
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.title IS DISTINCT FROM OLD.title OR NEW.content IS DISTINCT FROM OLD.content THEN
+        NEW.updated_at = NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+-- Verify the trigger still calls the function
+SELECT tgname FROM pg_trigger WHERE tgname = 'update_note_updated_at';
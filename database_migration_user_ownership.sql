@@ -0,0 +1,104 @@
+-- Database Migration: Per-User Notes and Tags
+-- Run this in your Supabase SQL Editor after database_migration_note_stats.sql
+
+-- btree_gin lets user_id lead GIN indexes, so array and full-text lookups stay within one user
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+CREATE TABLE IF NOT EXISTS "user" (
+    id BIGSERIAL PRIMARY KEY,
+    username VARCHAR(80) UNIQUE NOT NULL,
+    email VARCHAR(120) UNIQUE NOT NULL
+);
+
+-- Owners; NULL rows form the shared scope used by requests without an X-User-Id header
+ALTER TABLE note ADD COLUMN IF NOT EXISTS user_id BIGINT REFERENCES "user"(id) ON DELETE CASCADE;
+ALTER TABLE tag ADD COLUMN IF NOT EXISTS user_id BIGINT REFERENCES "user"(id) ON DELETE CASCADE;
+
+-- Tag names are unique per user; NULLs never compare equal, so the shared scope gets a partial index
+ALTER TABLE tag DROP CONSTRAINT IF EXISTS tag_name_key;
+ALTER TABLE tag DROP CONSTRAINT IF EXISTS uq_tag_user_name;
+ALTER TABLE tag ADD CONSTRAINT uq_tag_user_name UNIQUE (user_id, name);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_tag_shared_name ON tag(name) WHERE user_id IS NULL;
+DROP INDEX IF EXISTS idx_tag_name;
+
+-- Tenant-leading indexes replace the installation-wide ones
+CREATE INDEX IF NOT EXISTS idx_note_user_updated_at ON note(user_id, updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_note_user_auto_tags ON note USING gin(user_id, auto_tags);
+-- Per-user full-text index; /api/notes/search repeats this exact expression so the planner can use it
+CREATE INDEX IF NOT EXISTS idx_note_user_search ON note
+    USING gin(user_id, to_tsvector('simple', title || ' ' || content));
+DROP INDEX IF EXISTS idx_note_updated_at;
+DROP INDEX IF EXISTS idx_note_auto_tags;
+DROP INDEX IF EXISTS idx_note_search;
+
+-- Analytics summaries per owner (user_id, or 0 for the shared scope)
+ALTER TABLE note_stats_daily ADD COLUMN IF NOT EXISTS owner BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE note_stats_daily DROP CONSTRAINT IF EXISTS note_stats_daily_pkey;
+ALTER TABLE note_stats_daily ADD PRIMARY KEY (owner, day);
+
+CREATE OR REPLACE FUNCTION note_stats_daily_refresh()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO note_stats_daily AS d (owner, day, notes, words, chars, translated)
+        SELECT COALESCE(user_id, 0), created_at::date, count(*), sum(word_count), sum(char_count), count(title_zh)
+        FROM new_rows GROUP BY 1, 2
+        ON CONFLICT (owner, day) DO UPDATE SET
+            notes = d.notes + EXCLUDED.notes, words = d.words + EXCLUDED.words,
+            chars = d.chars + EXCLUDED.chars, translated = d.translated + EXCLUDED.translated;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE note_stats_daily AS d SET
+            notes = d.notes - o.notes, words = d.words - o.words,
+            chars = d.chars - o.chars, translated = d.translated - o.translated
+        FROM (
+            SELECT COALESCE(user_id, 0) AS owner, created_at::date AS day, count(*) AS notes,
+                   sum(word_count) AS words, sum(char_count) AS chars, count(title_zh) AS translated
+            FROM old_rows GROUP BY 1, 2
+        ) AS o
+        WHERE d.owner = o.owner AND d.day = o.day;
+    ELSE
+        -- Net change per owner and day; updates that leave the statistics alone (AI fields, tags) write nothing
+        INSERT INTO note_stats_daily AS d (owner, day, notes, words, chars, translated)
+        SELECT owner, day, sum(notes), sum(words), sum(chars), sum(translated) FROM (
+            SELECT COALESCE(user_id, 0) AS owner, created_at::date AS day, -1 AS notes, -word_count AS words,
+                   -char_count AS chars, -(title_zh IS NOT NULL)::int AS translated
+            FROM old_rows
+            UNION ALL
+            SELECT COALESCE(user_id, 0), created_at::date, 1, word_count, char_count, (title_zh IS NOT NULL)::int
+            FROM new_rows
+        ) AS delta
+        GROUP BY owner, day
+        HAVING sum(notes) <> 0 OR sum(words) <> 0 OR sum(chars) <> 0 OR sum(translated) <> 0
+        ON CONFLICT (owner, day) DO UPDATE SET
+            notes = d.notes + EXCLUDED.notes, words = d.words + EXCLUDED.words,
+            chars = d.chars + EXCLUDED.chars, translated = d.translated + EXCLUDED.translated;
+
+        UPDATE tag_stats AS t SET words = t.words + delta.words
+        FROM (
+            SELECT nt.tag_id, sum(n.word_count - o.word_count) AS words
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            JOIN note_tag nt ON nt.note_id = n.id
+            WHERE n.word_count <> o.word_count
+            GROUP BY nt.tag_id
+        ) AS delta
+        WHERE t.tag_id = delta.tag_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Rebuild the daily summaries per owner
+BEGIN;
+LOCK TABLE note IN SHARE MODE;
+TRUNCATE note_stats_daily;
+INSERT INTO note_stats_daily (owner, day, notes, words, chars, translated)
+SELECT COALESCE(user_id, 0), created_at::date, count(*), sum(word_count), sum(char_count), count(title_zh)
+FROM note GROUP BY 1, 2;
+COMMIT;
+
+-- Verify the owner columns and indexes exist
+SELECT indexname FROM pg_indexes
+WHERE tablename IN ('note', 'tag') AND indexname IN (
+    'idx_note_user_updated_at', 'idx_note_user_auto_tags', 'idx_note_user_search', 'uq_tag_shared_name'
+);
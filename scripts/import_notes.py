@@ -0,0 +1,70 @@
+"""
+Command-line note import for NoteTaker
+
+Usage:
+    python scripts/import_notes.py notes.jsonl
+    python scripts/import_notes.py export.md --format markdown
+    python scripts/import_notes.py notes.jsonl --user-id 42
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app
+from src.models.user import db
+from src.services.import_service import note_importer, detect_format, PARSERS
+from src.services.tenancy import tenancy
+
+
+def print_progress(report):
+    print(
+        f"read={report['records_read']} staged={report['records_staged']} "
+        f"skipped={report['records_skipped']} batches={report['batches']} "
+        f"elapsed={report['elapsed_seconds']}s",
+        file=sys.stderr
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import notes from JSONL or a Markdown export')
+    parser.add_argument('path', help='File to import, or - for stdin')
+    parser.add_argument('--format', choices=sorted(PARSERS), help='Input format (default: from extension)')
+    parser.add_argument('--batch-size', type=int, default=None, help='Rows per COPY batch')
+    parser.add_argument('--user-id', type=int, default=None,
+                        help='Owner of the imported notes and tags (default: DEFAULT_USER_ID, else shared)')
+    args = parser.parse_args()
+
+    user_id = args.user_id if args.user_id is not None else tenancy.default_user_id
+    if user_id is not None and user_id <= 0:
+        parser.error('--user-id must be a positive integer')
+    if user_id is None and tenancy.require_user:
+        parser.error('--user-id is required when TENANT_REQUIRE_USER is true')
+
+    format_type = args.format or detect_format(args.path)
+    if args.batch_size:
+        note_importer.batch_size = args.batch_size
+
+    with app.app_context():
+        stream = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8', newline='')
+        try:
+            report = note_importer.import_lines(stream, format_type, progress=print_progress, user_id=user_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Import failed: {e}", file=sys.stderr)
+            return 1
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    print(f"✅ Imported {report['notes_created']} notes "
+          f"({report['tags_created']} new tags, {report['records_skipped']} skipped)")
+    for error in report['errors']:
+        print(f"  - {error}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,497 @@
+"""
+ASGI Entry Point for NoteTaker
+Serves the AI endpoints (translate, analyze, suggestions and their SSE streams)
+and the change feed stream on the event loop so waiting on GitHub Models or on
+note changes does not hold a worker thread, and hands every other request to the
+Flask app on a thread pool.
+
+Run with: uvicorn src.asgi:app --host 0.0.0.0 --port 5001
+"""
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.main import app as flask_app
+from src.models.note import db
+from src.services.admission import admission_control, AdmissionRejected
+from src.services.async_ai import async_ai_analysis_service, async_translation_service, models_client
+from src.services.cache import note_cache
+from src.services.change_feed import change_feed
+from src.services.llm_ledger import llm_ledger
+from src.services.metrics import metrics
+from src.services.read_replicas import read_replicas
+from src.services.structured_logging import get_logger, set_request_id
+from src.services.tenancy import tenancy, TenantError
+from src.services.tiering import note_tiering
+from src.services.streaming import SSE_HEADERS, SSE_OPEN, sse_event
+
+logger = get_logger('asgi')
+
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 32))
+_wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='wsgi')
+
+
+def _wsgi_environ(scope, body) -> Dict:
+    """PEP 3333 environ for an ASGI http scope"""
+    script_name = scope.get('root_path', '').encode('utf-8').decode('latin1')
+    path_info = scope['path'].encode('utf-8').decode('latin1')
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers') or []:
+        name = name.decode('latin1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        value = value.decode('latin1')
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+class ThreadedWsgiToAsgi:
+    """Serves a WSGI app over ASGI with each request on our own thread pool
+
+    asgiref's WsgiToAsgi runs every WSGI call on one shared thread
+    (thread_sensitive=True), so Flask requests would run one at a time.
+    """
+
+    def __init__(self, wsgi_application):
+        self.wsgi_application = wsgi_application
+
+    async def __call__(self, scope, receive, send):
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            await loop.run_in_executor(_wsgi_executor, context.run, self._run, scope, body, loop, send)
+
+    def _run(self, scope, body, loop, send) -> None:
+        """Runs in a worker thread; start_response and iteration stay on that thread"""
+        def sync_send(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and start.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            start['message'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+            }
+            return send_body
+
+        def send_body(data):
+            if not start.get('sent'):
+                start['sent'] = True
+                sync_send(start['message'])
+            if data:
+                sync_send({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+        result = self.wsgi_application(_wsgi_environ(scope, body), start_response)
+        try:
+            for data in result:
+                send_body(data)
+            send_body(b'')
+            sync_send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Runs call_on_close callbacks, e.g. releasing admission slots
+            if hasattr(result, 'close'):
+                result.close()
+
+
+# Database helpers, run off the event loop inside a Flask app context
+
+def _load_note(note_id: int) -> Optional[Dict]:
+    with flask_app.app_context():
+        note = note_tiering.get(note_id)
+        if note is None:
+            return None
+        return {
+            'title': note.title,
+            'content': note.content,
+            'stats': note.text_stats,
+            'ai_suggestions': note.ai_suggestions,
+            'last_ai_analysis': note.last_ai_analysis
+        }
+
+
+def _save_note(note_id: int, values: Dict) -> bool:
+    with flask_app.app_context():
+        try:
+            note = note_tiering.get(note_id)
+            if note is None:
+                return False
+            for key, value in values.items():
+                setattr(note, key, value)
+            change_feed.record('note.updated', note, fields=sorted(values))
+            db.session.commit()
+            note_cache.invalidate('notes')
+            return True
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def _not_found() -> Tuple[int, Dict]:
+    return 404, {'success': False, 'error': 'Note not found'}
+
+
+# Native async handlers, called with the ASGI scope and the path's note id;
+# responses match the Flask routes they shadow
+
+async def translate_note(scope, note_id: int) -> Tuple[int, Dict]:
+    """Translate note content to Chinese"""
+    try:
+        note = await asyncio.to_thread(_load_note, note_id)
+        if note is None:
+            return _not_found()
+
+        with llm_ledger.note_context(note_id):
+            title_zh, content_zh = await async_translation_service.translate_note(note['title'], note['content'])
+
+        if not await asyncio.to_thread(_save_note, note_id, {'title_zh': title_zh, 'content_zh': content_zh}):
+            return _not_found()
+        return 200, {
+            'success': True,
+            'title_zh': title_zh,
+            'content_zh': content_zh
+        }
+    except Exception as e:
+        return 500, {'error': f'Translation failed: {str(e)}'}
+
+
+async def analyze_note(scope, note_id: int) -> Tuple[int, Dict]:
+    """Analyze note with AI for tags and writing suggestions"""
+    try:
+        note = await asyncio.to_thread(_load_note, note_id)
+        if note is None:
+            return _not_found()
+
+        with llm_ledger.note_context(note_id):
+            auto_tags, suggestions = await async_ai_analysis_service.analyze_note_content(
+                note['title'], note['content'], note['stats']
+            )
+
+        saved = await asyncio.to_thread(_save_note, note_id, {
+            'auto_tags': auto_tags,
+            'ai_suggestions': suggestions,
+            'last_ai_analysis': datetime.utcnow()
+        })
+        if not saved:
+            return _not_found()
+        return 200, {
+            'success': True,
+            'auto_tags': auto_tags,
+            'suggestions': suggestions,
+            'message': 'Note analyzed successfully'
+        }
+    except Exception as e:
+        return 500, {'success': False, 'error': str(e)}
+
+
+async def get_suggestions(scope, note_id: int) -> Tuple[int, Dict]:
+    """Get AI writing suggestions for a note"""
+    try:
+        note = await asyncio.to_thread(_load_note, note_id)
+        if note is None:
+            return _not_found()
+
+        # Check if we have recent suggestions
+        if note['ai_suggestions'] and note['last_ai_analysis']:
+            time_diff = datetime.utcnow() - note['last_ai_analysis']
+            if time_diff.total_seconds() < 3600:  # 1 hour cache
+                llm_ledger.record('ai_analysis', 'generate_writing_suggestions', 'cached',
+                                  cache_hit=True, note_id=note_id)
+                return 200, {
+                    'success': True,
+                    'suggestions': note['ai_suggestions'],
+                    'cached': True
+                }
+
+        with llm_ledger.note_context(note_id):
+            suggestions = await async_ai_analysis_service.generate_writing_suggestions(
+                note['title'], note['content'], note['stats']
+            )
+
+        saved = await asyncio.to_thread(_save_note, note_id, {
+            'ai_suggestions': suggestions,
+            'last_ai_analysis': datetime.utcnow()
+        })
+        if not saved:
+            return _not_found()
+        return 200, {
+            'success': True,
+            'suggestions': suggestions,
+            'cached': False
+        }
+    except Exception as e:
+        return 500, {'success': False, 'error': str(e)}
+
+
+# Streaming handlers return an async iterator of SSE frames instead of a dict
+
+async def translate_note_stream(scope, note_id: int) -> Tuple[int, Union[Dict, AsyncIterator[str]]]:
+    """Stream the Chinese translation as Server-Sent Events, saving it once complete"""
+    note = await asyncio.to_thread(_load_note, note_id)
+    if note is None:
+        return _not_found()
+    sources = (('title_zh', note['title']), ('content_zh', note['content']))
+
+    async def generate():
+        yield SSE_OPEN
+        translated = {}
+        try:
+            with llm_ledger.note_context(note_id):
+                for field, source in sources:
+                    parts = []
+                    async for delta in async_translation_service.stream_translation(source):
+                        parts.append(delta)
+                        yield sse_event('delta', {'field': field, 'text': delta})
+                    translated[field] = ''.join(parts).strip()
+
+            if not await asyncio.to_thread(_save_note, note_id, translated):
+                yield sse_event('error', {'success': False, 'error': 'Note not found'})
+                return
+            yield sse_event('done', {'success': True, **translated})
+        except Exception as e:
+            yield sse_event('error', {'success': False, 'error': f'Translation failed: {str(e)}'})
+
+    return 200, generate()
+
+
+async def stream_suggestions(scope, note_id: int) -> Tuple[int, Union[Dict, AsyncIterator[str]]]:
+    """Stream AI writing suggestions as Server-Sent Events, saving them once complete"""
+    note = await asyncio.to_thread(_load_note, note_id)
+    if note is None:
+        return _not_found()
+
+    async def cached():
+        llm_ledger.record('ai_analysis', 'generate_writing_suggestions', 'cached',
+                          cache_hit=True, note_id=note_id)
+        yield sse_event('done', {'success': True, 'suggestions': note['ai_suggestions'], 'cached': True})
+
+    if note['ai_suggestions'] and note['last_ai_analysis']:
+        if (datetime.utcnow() - note['last_ai_analysis']).total_seconds() < 3600:
+            return 200, cached()
+
+    async def generate():
+        yield SSE_OPEN
+        try:
+            parts = []
+            with llm_ledger.note_context(note_id):
+                async for delta in async_ai_analysis_service.stream_writing_suggestions(note['title'], note['content']):
+                    parts.append(delta)
+                    yield sse_event('delta', {'text': delta})
+            suggestions = async_ai_analysis_service.parse_suggestions(''.join(parts), note['title'], note['content'],
+                                                                   note['stats'])
+
+            saved = await asyncio.to_thread(_save_note, note_id, {
+                'ai_suggestions': suggestions,
+                'last_ai_analysis': datetime.utcnow()
+            })
+            if not saved:
+                yield sse_event('error', {'success': False, 'error': 'Note not found'})
+                return
+            yield sse_event('done', {'success': True, 'suggestions': suggestions, 'cached': False})
+        except Exception as e:
+            yield sse_event('error', {'success': False, 'error': str(e)})
+
+    return 200, generate()
+
+
+async def stream_note_changes(scope) -> Tuple[int, AsyncIterator[str]]:
+    """Push note and tag changes as Server-Sent Events, resuming after Last-Event-ID"""
+    headers = dict(scope.get('headers') or [])
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    last_event_id = (headers.get(b'last-event-id') or b'').decode('latin1') or \
+        (query.get('last_event_id') or [None])[0]
+    # Streams end after CHANGE_FEED_MAX_SECONDS; EventSource reconnects and resumes
+    deadline = time.monotonic() + change_feed.max_stream_seconds
+
+    async def generate():
+        # Subscribed on first iteration, so the finally below always runs for it
+        subscription = change_feed.subscribe(last_event_id, user_id=tenancy.current_user_id())
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                item = await subscription.next_event(min(change_feed.heartbeat_seconds, remaining))
+                if item is None:
+                    yield ': heartbeat\n\n'
+                else:
+                    yield sse_event(item['type'], item, item.get('id'))
+        finally:
+            subscription.close()
+
+    return 200, generate()
+
+
+# (method, path pattern, Flask rule used as the metrics label, handler, rate limit class or None)
+NATIVE_ROUTES = [
+    ('POST', re.compile(r'^/api/notes/(\d+)/translate$'), '/api/notes/<int:note_id>/translate', translate_note, 'ai'),
+    ('POST', re.compile(r'^/api/notes/(\d+)/analyze$'), '/api/notes/<int:note_id>/analyze', analyze_note, 'ai'),
+    ('GET', re.compile(r'^/api/notes/(\d+)/suggestions$'), '/api/notes/<int:note_id>/suggestions', get_suggestions,
+     'ai'),
+    ('GET', re.compile(r'^/api/notes/(\d+)/translate/stream$'), '/api/notes/<int:note_id>/translate/stream',
+     translate_note_stream, 'ai'),
+    ('GET', re.compile(r'^/api/notes/(\d+)/suggestions/stream$'), '/api/notes/<int:note_id>/suggestions/stream',
+     stream_suggestions, 'ai'),
+    # Waits on events for minutes; served here so it does not hold one of the ASGI_WSGI_THREADS
+    ('GET', re.compile(r'^/api/notes/stream$'), '/api/notes/stream', stream_note_changes, None),
+]
+
+
+class NoteTakerASGI:
+    def __init__(self, wsgi_app):
+        self.wsgi = ThreadedWsgiToAsgi(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http':
+            for method, pattern, rule, handler, rate_class in NATIVE_ROUTES:
+                match = pattern.match(scope['path'])
+                if match and scope['method'] == method:
+                    args = [int(value) for value in match.groups()]
+                    return await self._handle(scope, receive, send, rule, handler, rate_class, args)
+        await self.wsgi(scope, receive, send)
+
+    async def _handle(self, scope, receive, send, rule, handler, rate_class, args):
+        started = time.perf_counter()
+        headers = dict(scope.get('headers') or [])
+        incoming_id = headers.get(b'x-request-id')
+        request_id = set_request_id(incoming_id.decode('latin1') if incoming_id else None)
+        response_headers = [
+            (b'x-request-id', request_id.encode('latin1')),
+            (b'access-control-allow-origin', b'*'),
+        ]
+
+        error = None
+        try:
+            user_id = tenancy.resolve((headers.get(tenancy.header.lower().encode('latin1')) or b'').decode('latin1'))
+            # Rate limited like the Flask routes; AI_MAX_CONCURRENCY already bounds the calls in flight here
+            if rate_class is not None:
+                client = scope.get('client')
+                admission_control.check_rate(rate_class, admission_control.client_key(client[0] if client else None))
+        except TenantError as e:
+            user_id, error = None, e
+        except AdmissionRejected as e:
+            error = e
+            response_headers.append((b'retry-after', str(e.retry_after).encode('ascii')))
+
+        # to_thread and the streaming tasks copy the context, so the database helpers see this user too
+        with tenancy.acting_as(user_id):
+            if isinstance(error, AdmissionRejected):
+                status, payload = error.status, {'success': False, 'error': str(error), 'retry_after': error.retry_after}
+            elif error is not None:
+                status, payload = (401 if tenancy.require_user else 400), {'success': False, 'error': str(error)}
+            else:
+                status, payload = await handler(scope, *args)
+            if isinstance(payload, dict):
+                body = json.dumps(payload, default=str).encode('utf-8')
+                # The AI result was committed to the primary; keep this client's next reads there too
+                cookie = read_replicas.sticky_cookie(scope.get('scheme') == 'https') \
+                    if scope['method'] == 'POST' and status < 400 else None
+                if cookie:
+                    response_headers.append((b'set-cookie', cookie.encode('latin1')))
+                await send({
+                    'type': 'http.response.start',
+                    'status': status,
+                    'headers': response_headers + [
+                        (b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode('ascii')),
+                    ]
+                })
+                await send({'type': 'http.response.body', 'body': body})
+            else:
+                await send({
+                    'type': 'http.response.start',
+                    'status': status,
+                    'headers': response_headers + [(b'content-type', b'text/event-stream; charset=utf-8')] + [
+                        (name.lower().encode('ascii'), value.encode('ascii')) for name, value in SSE_HEADERS.items()
+                    ]
+                })
+                await self._stream(receive, send, payload)
+
+        elapsed = time.perf_counter() - started
+        metrics.request_latency.observe((rule, scope['method']), elapsed)
+        metrics.requests.inc((rule, scope['method'], status))
+
+    async def _stream(self, receive, send, frames: AsyncIterator[str]):
+        """Send SSE frames until done, cancelling the upstream call if the client disconnects"""
+        async def pump():
+            async for frame in frames:
+                await send({'type': 'http.response.body', 'body': frame.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def wait_for_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        pump_task = asyncio.ensure_future(pump())
+        disconnect_task = asyncio.ensure_future(wait_for_disconnect())
+        done, _ = await asyncio.wait({pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        if pump_task in done:
+            disconnect_task.cancel()
+            pump_task.result()
+        else:
+            logger.info('Client disconnected, cancelling stream')
+            pump_task.cancel()
+            try:
+                await pump_task
+            except asyncio.CancelledError:
+                pass
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await models_client.aclose()
+                await asyncio.to_thread(llm_ledger.flush)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+app = NoteTakerASGI(flask_app)
@@ -1,16 +1,38 @@
 import os
 import sys
+import hmac
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, request, jsonify
 from flask_cors import CORS
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.note import note_bp
 from src.routes.enhanced import enhanced_bp  # Import new enhanced routes
+from src.routes.bulk import bulk_bp
 from src.models.note import Note
 from src.models.tag import Tag, NoteTag  # Import new models
+from src.models.llm_usage import LlmUsage
+from src.models.note_revision import NoteRevision
+from src.models.note_archive import NoteArchive
+from src.services.compression import response_compressor
+from src.services.cache import note_cache
+from src.services.db_connection import connection_monitor, build_engine_options, resolve_connection_mode
+from src.services.metrics import metrics
+from src.services.profiler import request_profiler
+from src.services.llm_ledger import llm_ledger
+from src.services.structured_logging import structured_logging
+from src.services.enrichment import enrichment_pipeline
+from src.services.change_feed import change_feed
+from src.services.typeahead import typeahead_index
+from src.services.tenancy import tenancy
+from src.services.revisions import revision_history
+from src.services.tiering import note_tiering
+from src.services.static_assets import static_assets
+from src.services.read_replicas import read_replicas
+from src.services.admission import admission_control
+from src.services import sqlite_backend
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -22,12 +44,22 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
 # Enable CORS for all routes
 CORS(app)
 
+# JSON logs via a background queue, X-Request-ID correlation and per-route sampling (LOG_SAMPLE_RATES)
+structured_logging.init_app(app)
+
+# Scope notes, tags, caches and job quotas to the user in X-User-Id (TENANT_USER_HEADER)
+tenancy.init_app(app)
+
+# Compress JSON, text and Markdown responses (COMPRESSION_MIN_SIZE / COMPRESSION_LEVEL)
+response_compressor.init_app(app)
+
 # register blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(note_bp, url_prefix='/api')
 app.register_blueprint(enhanced_bp, url_prefix='/api')  # Register enhanced features
+app.register_blueprint(bulk_bp, url_prefix='/api')
 
-# Database configuration - Supabase PostgreSQL ONLY
+# Database configuration - Supabase PostgreSQL, or sqlite:///notetaker.db for single-node deployments
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if not DATABASE_URL:
     # For Vercel deployment, this should be set in environment variables
@@ -40,8 +72,44 @@ if not DATABASE_URL:
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Connection pooling: NullPool + per-transaction timeouts on serverless, tuned pool otherwise
+DB_CONNECTION_MODE = resolve_connection_mode()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(DB_CONNECTION_MODE, DATABASE_URL)
+
+# Optional read replicas (DATABASE_REPLICA_URLS) as extra binds with the same pool settings
+read_replicas.configure(app, DB_CONNECTION_MODE)
+
 # Initialize database connection
 db.init_app(app)
+with app.app_context():
+    if sqlite_backend.is_sqlite_url(DATABASE_URL):
+        # WAL pragmas; tables, FTS5 index and triggers are created here instead of by SQL migrations
+        sqlite_backend.install(db.engine)
+        sqlite_backend.create_schema()
+    connection_monitor.install(db.engine, DB_CONNECTION_MODE)
+    metrics.init_app(app, db.engine)
+    read_replicas.init_app(app, db)
+    llm_ledger.init_app(app, db.engine)
+    change_feed.init_app(app, db.session, db.engine)
+
+# Per-class concurrency pools (ai/export/crud) with bounded queues and per-client token buckets;
+# registered after tenancy and metrics so clients are keyed by user and shed requests are counted
+admission_control.init_app(app)
+
+# Prefix index for /api/suggest, built on first lookup and kept current from the change feed
+typeahead_index.init_app(change_feed)
+
+# Background re-tagging/suggestions/translation of idle notes (ENRICHMENT_ENABLED)
+enrichment_pipeline.init_app(app)
+
+# Hashed, precompressed static files (STATIC_HTML_MAX_AGE), built on the first page request
+static_assets.init_app(app)
+
+# Opt-in request profiling (X-Profile + X-Profile-Token headers, or PROFILE_SAMPLE_RATE)
+request_profiler.init_app(app)
+
+if os.environ.get('DB_WARMUP', 'false').lower() == 'true' and os.environ.get('DATABASE_URL'):
+    connection_monitor.warm_up(app, int(os.environ.get('DB_WARMUP_CONNECTIONS', 1)))
 
 # Health check endpoint for Vercel debugging
 @app.route('/health')
@@ -64,9 +132,8 @@ def api_status():
         if os.environ.get('DATABASE_URL'):
             try:
                 from sqlalchemy import text
-                with app.app_context():
-                    db.session.execute(text('SELECT 1'))
-                    db.session.commit()
+                db.session.execute(text('SELECT 1'))
+                db.session.commit()
                 db_status = 'connected'
             except Exception as e:
                 db_status = f'error: {str(e)[:100]}'
@@ -74,11 +141,87 @@ def api_status():
         return {
             'api': 'online',
             'database': db_status,
-            'translation': 'configured' if os.environ.get('GITHUB_TOKEN') else 'not_configured'
+            'connection': connection_monitor.stats(),
+            'translation': 'configured' if os.environ.get('GITHUB_TOKEN') else 'not_configured',
+            'cache': note_cache.stats(),
+            'enrichment': enrichment_pipeline.stats(),
+            'change_feed': change_feed.stats(),
+            'typeahead': typeahead_index.stats(),
+            'tenancy': tenancy.stats(),
+            'revisions': revision_history.stats(),
+            'archive': note_tiering.stats(),
+            'static_assets': static_assets.stats(),
+            'read_replicas': read_replicas.stats(),
+            'admission': admission_control.stats()
         }
     except Exception as e:
         return {'error': str(e)}, 500
 
+# Maintenance jobs touch every user's notes: they require MAINTENANCE_TOKEN and are disabled without it
+MAINTENANCE_TOKEN = os.environ.get('MAINTENANCE_TOKEN')
+
+def maintenance_authorized():
+    """True if the request carries MAINTENANCE_TOKEN in X-Maintenance-Token or as an Authorization Bearer token"""
+    if not MAINTENANCE_TOKEN:
+        return False
+    supplied = request.headers.get('X-Maintenance-Token') or ''
+    authorization = request.headers.get('Authorization') or ''
+    if not supplied and authorization.startswith('Bearer '):
+        supplied = authorization[len('Bearer '):]
+    return hmac.compare_digest(supplied, MAINTENANCE_TOKEN)
+
+# Archive tier job; schedule it (e.g. daily) from cron or a Vercel cron job
+@app.route('/api/archive/run', methods=['POST'])
+def run_archive():
+    """Move notes untouched for ARCHIVE_AFTER_DAYS into the compressed archive tier"""
+    if not maintenance_authorized():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    try:
+        data = request.get_json(silent=True) or {}
+        max_notes = data.get('max_notes')
+        if max_notes is not None and (not isinstance(max_notes, int) or max_notes < 1):
+            return jsonify({'success': False, 'error': 'max_notes must be a positive integer'}), 400
+        return jsonify({'success': True, **note_tiering.run(max_notes)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Revision retention for notes that are no longer edited; schedule it (e.g. daily) like the archive job
+@app.route('/api/revisions/prune', methods=['POST'])
+def prune_revisions():
+    """Delete revisions older than REVISION_RETENTION_DAYS, keeping each note's latest snapshot chain"""
+    if not maintenance_authorized():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    try:
+        return jsonify({'success': True, **revision_history.prune_expired()})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Prometheus metrics endpoint
+@app.route('/api/metrics')
+def api_metrics():
+    """Per-route latency, DB time and upstream model call metrics"""
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+# Stored request profiles (protected by PROFILE_TOKEN)
+@app.route('/api/profiles')
+def list_profiles():
+    """List captured request profiles"""
+    if not request_profiler.is_authorized(request):
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    return jsonify({'success': True, 'profiles': request_profiler.list_profiles()})
+
+@app.route('/api/profiles/<profile_id>')
+def get_profile(profile_id):
+    """Collapsed stacks for one profile, ready for flamegraph.pl or speedscope"""
+    if not request_profiler.is_authorized(request):
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    collapsed = request_profiler.collapsed(profile_id)
+    if collapsed is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return collapsed, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
 # Database connection test - only for local development
 # In Vercel, this will be tested on first request, not at startup
 def test_database_connection():
@@ -105,19 +248,8 @@ if __name__ == '__main__':
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
-
+    """Static assets from the in-memory manifest; unknown paths get index.html"""
+    return static_assets.serve(path)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
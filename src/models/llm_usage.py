@@ -0,0 +1,34 @@
+"""
+LLM Usage Ledger Model for NoteTaker
+"""
+from src.models.user import db
+from datetime import datetime
+
+class LlmUsage(db.Model):
+    """Append-only record of one GitHub Models call (or cache hit)"""
+    __tablename__ = 'llm_usage'
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    service = db.Column(db.String(50), nullable=False)
+    method = db.Column(db.String(80), nullable=False)
+    note_id = db.Column(db.Integer, nullable=True)  # No FK: usage outlives deleted notes
+    prompt_tokens = db.Column(db.Integer, default=0, nullable=False)
+    completion_tokens = db.Column(db.Integer, default=0, nullable=False)
+    latency_ms = db.Column(db.Float, default=0, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    cache_hit = db.Column(db.Boolean, default=False, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'service': self.service,
+            'method': self.method,
+            'note_id': self.note_id,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'latency_ms': self.latency_ms,
+            'status': self.status,
+            'cache_hit': self.cache_hit
+        }
@@ -1,21 +1,76 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from typing import Dict
 from src.models.user import db
+from sqlalchemy import event, false, inspect, text
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.dialects.postgresql import ARRAY
 import json
+import re
+
+_SENTENCE_END = re.compile(r'[.!?]+')
+
+
+class TagArray(TypeDecorator):
+    """TEXT[] on PostgreSQL (GIN-indexed), a JSON array on SQLite"""
+    impl = db.JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(ARRAY(db.String))
+        # none_as_null: store SQL NULL rather than the JSON text 'null', like an empty TEXT[] column
+        return dialect.type_descriptor(db.JSON(none_as_null=True))
+
+
+def compute_text_stats(content: str) -> Dict:
+    """Word, character and sentence counts plus average word length for note content"""
+    content = content or ''
+    words = content.split()
+    word_count = len(words)
+    return {
+        'word_count': word_count,
+        'char_count': len(content),
+        'sentence_count': sum(1 for part in _SENTENCE_END.split(content) if part.strip()),
+        'avg_word_length': round(sum(len(word) for word in words) / word_count, 2) if word_count else 0.0
+    }
+
 
 class Note(db.Model):
+    __table_args__ = (
+        # Archival candidates: the oldest notes still in the hot tier
+        db.Index('idx_note_hot_updated_at', 'updated_at',
+                 postgresql_where=text('NOT is_archived'), sqlite_where=text('NOT is_archived')),
+        # Never reuse ids on SQLite, matching PostgreSQL sequences
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
+    # Owner; NULL notes belong to the shared scope (requests without a user)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
     title_zh = db.Column(db.String(200), nullable=True)
     content_zh = db.Column(db.Text, nullable=True)
     
     # New AI-powered fields
-    auto_tags = db.Column(ARRAY(db.String), nullable=True)  # AI-generated tags
+    auto_tags = db.Column(TagArray, nullable=True)  # AI-generated tags
     ai_suggestions = db.Column(db.JSON, nullable=True)  # AI writing suggestions
     last_ai_analysis = db.Column(db.DateTime, nullable=True)  # When AI last analyzed
+
+    # Text statistics, recomputed whenever content is written
+    word_count = db.Column(db.Integer, nullable=False, default=0)
+    char_count = db.Column(db.Integer, nullable=False, default=0)
+    sentence_count = db.Column(db.Integer, nullable=False, default=0)
+    avg_word_length = db.Column(db.Float, nullable=False, default=0.0)
     
+    # Archive tier: an archived note is a stub whose content is a short preview; the full content,
+    # translation and suggestions live compressed in note_archive until it is opened again
+    is_archived = db.Column(db.Boolean, nullable=False, default=False, server_default=false())
+    archived_at = db.Column(db.DateTime, nullable=True)
+    last_accessed_at = db.Column(db.DateTime, nullable=True)  # Last rehydration; restarts the idle clock
+
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -24,10 +79,20 @@ class Note(db.Model):
     
     def __repr__(self):
         return f'<Note {self.title}>'
+
+    @property
+    def text_stats(self) -> Dict:
+        return {
+            'word_count': self.word_count or 0,
+            'char_count': self.char_count or 0,
+            'sentence_count': self.sentence_count or 0,
+            'avg_word_length': self.avg_word_length or 0.0
+        }
     
     def to_dict(self):
         return {
             'id': self.id,
+            'user_id': self.user_id,
             'title': self.title,
             'content': self.content,
             'title_zh': self.title_zh,
@@ -36,7 +101,28 @@ class Note(db.Model):
             'ai_suggestions': self.ai_suggestions or {},
             'last_ai_analysis': self.last_ai_analysis.isoformat() if self.last_ai_analysis else None,
             'tags': [tag.to_dict() for tag in self.tags],
+            'stats': self.text_stats,
+            'archived': bool(self.is_archived),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+
+@event.listens_for(Note, 'before_insert')
+def _set_text_stats_on_insert(mapper, connection, note):
+    for name, value in compute_text_stats(note.content).items():
+        setattr(note, name, value)
+
+
+@event.listens_for(Note, 'before_update')
+def _set_text_stats_on_update(mapper, connection, note):
+    state = inspect(note)
+    if state.attrs.content.history.has_changes():
+        for name, value in compute_text_stats(note.content).items():
+            setattr(note, name, value)
+    elif not state.attrs.title.history.has_changes() and not state.attrs.updated_at.history.has_changes() \
+            and 'updated_at' in state.dict:
+        # Only title/content edits move a note up the list, as with the PostgreSQL trigger in
+        # database_migration_updated_at.sql: writing the current value skips onupdate for
+        # translations, AI results and other derived fields
+        flag_modified(note, 'updated_at')
@@ -0,0 +1,31 @@
+"""
+Note Archive Model for NoteTaker
+"""
+from src.models.user import db
+from datetime import datetime
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
+class SearchVector(TypeDecorator):
+    """TSVECTOR on PostgreSQL; unused on SQLite, where note_archive_fts indexes archived notes"""
+    impl = db.Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(TSVECTOR())
+        return dialect.type_descriptor(db.Text())
+
+
+class NoteArchive(db.Model):
+    """Cold tier: the large fields of an archived note as one zlib-compressed JSON payload"""
+    __tablename__ = 'note_archive'
+
+    note_id = db.Column(db.Integer, db.ForeignKey('note.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True)  # Copied from the note so searches stay within one user
+    payload = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer, nullable=False, default=0)  # Uncompressed payload bytes
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Title and content, indexed by idx_note_archive_user_search (database_migration_note_archive.sql)
+    search = db.Column(SearchVector, nullable=True)
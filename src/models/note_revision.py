@@ -0,0 +1,38 @@
+"""
+Note Revision Model for NoteTaker
+"""
+from src.models.user import db
+from datetime import datetime
+
+class NoteRevision(db.Model):
+    """One entry in a note's history: a zlib snapshot of the content, or a compressed diff from the previous revision"""
+    __tablename__ = 'note_revision'
+
+    id = db.Column(db.Integer, primary_key=True)
+    note_id = db.Column(db.Integer, db.ForeignKey('note.id', ondelete='CASCADE'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # 1, 2, ... per note
+    is_snapshot = db.Column(db.Boolean, nullable=False, default=False)
+    title = db.Column(db.String(200), nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer, nullable=False, default=0)  # Uncompressed content length
+    edits = db.Column(db.Integer, nullable=False, default=1)  # Saves coalesced into this revision
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Also the index for "latest revision" and snapshot-to-revision range scans
+    __table_args__ = (
+        db.UniqueConstraint('note_id', 'seq', name='uq_note_revision_seq'),
+        db.Index('idx_note_revision_updated_at', 'updated_at'),  # Age-based pruning
+    )
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'kind': 'snapshot' if self.is_snapshot else 'delta',
+            'title': self.title,
+            'size': self.size,
+            'stored_bytes': len(self.payload) if self.payload is not None else 0,
+            'edits': self.edits,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -3,17 +3,27 @@ Tag and Note-Tag Models for NoteTaker
 """
 from src.models.user import db
 from datetime import datetime
+from sqlalchemy import text
 
 class Tag(db.Model):
     """Tag model for categorizing notes"""
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), unique=True, nullable=False)
+    # Owner; NULL tags belong to the shared scope, like notes
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)
+    name = db.Column(db.String(50), nullable=False)
     color = db.Column(db.String(7), default='#6B73FF')  # Hex color
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship with notes through note_tag
     notes = db.relationship('Note', secondary='note_tag', back_populates='tags')
     
+    # Names are unique per user; NULLs never compare equal, so the shared scope needs its own index
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', name='uq_tag_user_name'),
+        db.Index('uq_tag_shared_name', 'name', unique=True,
+                 postgresql_where=text('user_id IS NULL'), sqlite_where=text('user_id IS NULL')),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
+from src.services.read_replicas import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession sends read-only endpoints to DATABASE_REPLICA_URLS when configured
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,130 @@
+"""
+Bulk note API routes
+Each request runs as a single transaction with per-item error reporting
+"""
+import io
+from flask import Blueprint, request, jsonify
+from src.models.user import db
+from src.services.bulk_operations import bulk_note_service, BulkOperationError
+from src.services.import_service import note_importer, detect_format, PARSERS
+from src.services.cache import note_cache
+from src.services.change_feed import change_feed
+from src.services.tenancy import tenancy, TenantQuotaExceeded
+
+bulk_bp = Blueprint('bulk', __name__)
+
+
+def _bulk_response(results_key, results, errors, status=200, **extra):
+    return jsonify({
+        'success': not errors,
+        results_key: results,
+        'count': len(results),
+        'errors': errors,
+        **extra
+    }), status
+
+
+@bulk_bp.route('/notes/bulk', methods=['POST'])
+def bulk_create_notes():
+    """Create many notes in one transaction"""
+    try:
+        data = request.get_json() or {}
+        created, errors = bulk_note_service.create_notes(data.get('notes'))
+        change_feed.record_many('notes.created', [note['id'] for note in created])
+        db.session.commit()
+        note_cache.invalidate('notes')
+        return _bulk_response('created', created, errors, 201 if created else 200)
+    except BulkOperationError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bulk_bp.route('/notes/bulk', methods=['PUT'])
+def bulk_update_notes():
+    """Update title and/or content of many notes in one transaction"""
+    try:
+        data = request.get_json() or {}
+        updated, errors = bulk_note_service.update_notes(data.get('notes'))
+        change_feed.record_many('notes.updated', [note['id'] for note in updated])
+        db.session.commit()
+        note_cache.invalidate('notes')
+        return _bulk_response('updated', updated, errors)
+    except BulkOperationError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bulk_bp.route('/notes/bulk', methods=['DELETE'])
+def bulk_delete_notes():
+    """Delete many notes by id in one transaction"""
+    try:
+        data = request.get_json() or {}
+        deleted, errors = bulk_note_service.delete_notes(data.get('ids'))
+        change_feed.record_many('notes.deleted', deleted)
+        db.session.commit()
+        note_cache.invalidate('notes')
+        return _bulk_response('deleted', deleted, errors)
+    except BulkOperationError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bulk_bp.route('/notes/bulk/tags', methods=['POST'])
+def bulk_assign_tags():
+    """Assign tags to notes; existing assignments are left untouched"""
+    try:
+        data = request.get_json() or {}
+        assignments = data.get('assignments')
+        assigned, errors = bulk_note_service.assign_tags(assignments)
+        change_feed.record_many('notes.tags', sorted({item['note_id'] for item in assigned}), action='added')
+        db.session.commit()
+        note_cache.invalidate('notes')
+        skipped = len(assignments) - len(assigned) - len(errors)
+        return _bulk_response('assigned', assigned, errors, skipped=skipped)
+    except BulkOperationError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bulk_bp.route('/import', methods=['POST'])
+def import_notes():
+    """Stream-import notes from an uploaded JSONL or Markdown export"""
+    try:
+        upload = request.files.get('file')
+        if upload:
+            stream = upload.stream
+            filename = upload.filename
+        else:
+            stream = request.stream
+            filename = None
+
+        format_type = request.args.get('format') or detect_format(filename)
+        if format_type not in PARSERS:
+            return jsonify({'success': False, 'error': 'Unsupported format'}), 400
+
+        lines = io.TextIOWrapper(stream, encoding='utf-8', errors='replace', newline='')
+        with tenancy.job('import'):
+            report = note_importer.import_lines(lines, format_type, user_id=tenancy.current_user_id())
+            if report.get('notes_created'):
+                change_feed.record('notes.imported', count=report['notes_created'])
+            db.session.commit()
+        note_cache.invalidate('notes', 'tags')
+
+        return jsonify({'success': True, 'report': report})
+    except TenantQuotaExceeded as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
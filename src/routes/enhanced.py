@@ -1,13 +1,22 @@
 """
 Enhanced API routes for AI features and export functionality
 """
-from flask import Blueprint, request, jsonify, send_file
+from contextlib import closing
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
 from src.models.note import Note
 from src.models.tag import Tag, NoteTag
 from src.models.user import db
 from src.services.ai_analysis import ai_analysis_service
-from src.services.export_service import export_service
+from src.services.cache import note_cache
+from src.services.llm_ledger import llm_ledger, usage_since
+from src.services.change_feed import change_feed
+from src.services.analytics import analytics_service
+from src.services.sqlite_backend import uses_sqlite
+from src.services.tenancy import tenancy, TenantQuotaExceeded
+from src.services.tiering import note_tiering
+from src.services.streaming import SSE_HEADERS, SSE_OPEN, sse_event
 from datetime import datetime
+from sqlalchemy import text
 import io
 
 # Create blueprint for enhanced features
@@ -18,19 +27,22 @@ enhanced_bp = Blueprint('enhanced', __name__)
 def analyze_note(note_id):
     """Analyze note with AI for tags and writing suggestions"""
     try:
-        note = Note.query.get_or_404(note_id)
+        note = note_tiering.get_or_404(note_id)
         
         # Get AI analysis
-        auto_tags, suggestions = ai_analysis_service.analyze_note_content(
-            note.title, note.content
-        )
+        with llm_ledger.note_context(note.id):
+            auto_tags, suggestions = ai_analysis_service.analyze_note_content(
+                note.title, note.content, note.text_stats
+            )
         
         # Update note with AI results
         note.auto_tags = auto_tags
         note.ai_suggestions = suggestions
         note.last_ai_analysis = datetime.utcnow()
+        change_feed.record('note.updated', note, fields=['auto_tags', 'ai_suggestions'])
         
         db.session.commit()
+        note_cache.invalidate('notes')
         
         return jsonify({
             'success': True,
@@ -47,12 +59,14 @@ def analyze_note(note_id):
 def get_suggestions(note_id):
     """Get AI writing suggestions for a note"""
     try:
-        note = Note.query.get_or_404(note_id)
+        note = note_tiering.get_or_404(note_id)
         
         # Check if we have recent suggestions
         if note.ai_suggestions and note.last_ai_analysis:
             time_diff = datetime.utcnow() - note.last_ai_analysis
             if time_diff.total_seconds() < 3600:  # 1 hour cache
+                llm_ledger.record('ai_analysis', 'generate_writing_suggestions', 'cached',
+                                  cache_hit=True, note_id=note.id)
                 return jsonify({
                     'success': True,
                     'suggestions': note.ai_suggestions,
@@ -60,14 +74,17 @@ def get_suggestions(note_id):
                 })
         
         # Generate new suggestions
-        suggestions = ai_analysis_service.generate_writing_suggestions(
-            note.title, note.content
-        )
+        with llm_ledger.note_context(note.id):
+            suggestions = ai_analysis_service.generate_writing_suggestions(
+                note.title, note.content, note.text_stats
+            )
         
         # Update note
         note.ai_suggestions = suggestions
         note.last_ai_analysis = datetime.utcnow()
+        change_feed.record('note.updated', note, fields=['ai_suggestions'])
         db.session.commit()
+        note_cache.invalidate('notes')
         
         return jsonify({
             'success': True,
@@ -78,15 +95,123 @@ def get_suggestions(note_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@enhanced_bp.route('/notes/<int:note_id>/suggestions/stream', methods=['GET'])
+def stream_suggestions(note_id):
+    """Stream AI writing suggestions as Server-Sent Events, saving them once complete"""
+    note = note_tiering.get_or_404(note_id)
+    title, content, stats = note.title, note.content, note.text_stats
+
+    # Recent suggestions are served as a single event, like the non-streaming route
+    if note.ai_suggestions and note.last_ai_analysis:
+        if (datetime.utcnow() - note.last_ai_analysis).total_seconds() < 3600:
+            llm_ledger.record('ai_analysis', 'generate_writing_suggestions', 'cached',
+                              cache_hit=True, note_id=note.id)
+            cached = sse_event('done', {'success': True, 'suggestions': note.ai_suggestions, 'cached': True})
+            return Response(cached, mimetype='text/event-stream', headers=SSE_HEADERS)
+
+    def generate():
+        yield SSE_OPEN
+        try:
+            parts = []
+            with llm_ledger.note_context(note_id):
+                # closing() cancels the upstream call if the client goes away mid-stream
+                with closing(ai_analysis_service.stream_writing_suggestions(title, content)) as deltas:
+                    for delta in deltas:
+                        parts.append(delta)
+                        yield sse_event('delta', {'text': delta})
+            suggestions = ai_analysis_service.parse_suggestions(''.join(parts), title, content, stats)
+
+            note = note_tiering.get(note_id)
+            if note is None:
+                yield sse_event('error', {'success': False, 'error': 'Note not found'})
+                return
+            note.ai_suggestions = suggestions
+            note.last_ai_analysis = datetime.utcnow()
+            change_feed.record('note.updated', note, fields=['ai_suggestions'])
+            db.session.commit()
+            note_cache.invalidate('notes')
+            yield sse_event('done', {'success': True, 'suggestions': suggestions, 'cached': False})
+        except Exception as e:
+            db.session.rollback()
+            yield sse_event('error', {'success': False, 'error': str(e)})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@enhanced_bp.route('/llm/usage', methods=['GET'])
+def get_llm_usage():
+    """Aggregate model usage by service and method, plus today's budget"""
+    try:
+        days = float(request.args.get('days', 1))
+    except ValueError:
+        days = None
+    if days is None or not 0 < days <= 3650:  # Also rejects nan
+        return jsonify({'success': False, 'error': 'days must be a number greater than 0 and at most 3650'}), 400
+    try:
+        llm_ledger.flush()
+        return jsonify({
+            'success': True,
+            'since': usage_since(days).isoformat(),
+            'usage': llm_ledger.aggregate(usage_since(days)),
+            'budget': llm_ledger.budget_status()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@enhanced_bp.route('/analytics', methods=['GET'])
+def get_analytics():
+    """Notes per day, words per tag and translation coverage from the summary tables"""
+    try:
+        days = request.args.get('days', 30, type=int)
+        return jsonify({'success': True, **analytics_service.summary(days)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # Tag Management Routes
 @enhanced_bp.route('/tags', methods=['GET'])
 def get_tags():
-    """Get all available tags"""
+    """Get the user's tags"""
+    try:
+        tags = note_cache.get_or_load(
+            'tags', 'all', lambda: [tag.to_dict() for tag in tenancy.query(Tag).all()]
+        )
+        return jsonify({
+            'success': True,
+            'tags': tags
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@enhanced_bp.route('/tags/facets', methods=['GET'])
+def get_tag_facets():
+    """Get per-tag note counts for manual tags and AI auto-tags"""
     try:
-        tags = Tag.query.all()
+        # auto_tags is TEXT[] on PostgreSQL and a JSON array on SQLite
+        auto_tags = ('j.value, NULL FROM note n, json_each(n.auto_tags) AS j' if uses_sqlite()
+                     else 'unnest(n.auto_tags), NULL FROM note n')
+        rows = db.session.execute(text(f"""
+            SELECT source, tag_id, name, color, COUNT(*) AS note_count FROM (
+                SELECT 'manual' AS source, t.id AS tag_id, t.name AS name, t.color AS color
+                FROM note_tag nt JOIN tag t ON t.id = nt.tag_id
+                WHERE {tenancy.owner_sql('t.user_id')}
+                UNION ALL
+                SELECT 'auto' AS source, NULL, {auto_tags}
+                WHERE {tenancy.owner_sql('n.user_id')}
+            ) AS facets
+            GROUP BY source, tag_id, name, color
+            ORDER BY note_count DESC, name
+        """))
+
+        facets = {'manual': [], 'auto': []}
+        for row in rows:
+            facet = {'name': row.name, 'count': row.note_count}
+            if row.source == 'manual':
+                facet.update({'id': row.tag_id, 'color': row.color})
+            facets[row.source].append(facet)
+
         return jsonify({
             'success': True,
-            'tags': [tag.to_dict() for tag in tags]
+            'facets': facets
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -103,13 +228,15 @@ def create_tag():
             return jsonify({'success': False, 'error': 'Tag name is required'}), 400
         
         # Check if tag already exists
-        existing_tag = Tag.query.filter_by(name=name).first()
+        existing_tag = tenancy.query(Tag).filter_by(name=name).first()
         if existing_tag:
             return jsonify({'success': False, 'error': 'Tag already exists'}), 409
         
-        tag = Tag(name=name, color=color)
+        tag = Tag(name=name, color=color, user_id=tenancy.current_user_id())
         db.session.add(tag)
+        change_feed.record('tag.created', tag_name=name, color=color)
         db.session.commit()
+        note_cache.invalidate('tags')
         
         return jsonify({
             'success': True,
@@ -131,8 +258,8 @@ def add_tag_to_note(note_id):
         if not tag_id:
             return jsonify({'success': False, 'error': 'Tag ID is required'}), 400
         
-        note = Note.query.get_or_404(note_id)
-        tag = Tag.query.get_or_404(tag_id)
+        note = tenancy.get_or_404(Note, note_id)
+        tag = tenancy.get_or_404(Tag, tag_id)
         
         # Check if association already exists
         existing = NoteTag.query.filter_by(note_id=note_id, tag_id=tag_id).first()
@@ -142,7 +269,9 @@ def add_tag_to_note(note_id):
         # Create association
         note_tag = NoteTag(note_id=note_id, tag_id=tag_id)
         db.session.add(note_tag)
+        change_feed.record('note.tags', note_id=note_id, tag_id=tag_id, action='added')
         db.session.commit()
+        note_cache.invalidate('notes')
         
         return jsonify({
             'success': True,
@@ -157,9 +286,12 @@ def add_tag_to_note(note_id):
 def remove_tag_from_note(note_id, tag_id):
     """Remove a tag from a note"""
     try:
+        tenancy.get_or_404(Note, note_id)
         note_tag = NoteTag.query.filter_by(note_id=note_id, tag_id=tag_id).first_or_404()
         db.session.delete(note_tag)
+        change_feed.record('note.tags', note_id=note_id, tag_id=tag_id, action='removed')
         db.session.commit()
+        note_cache.invalidate('notes')
         
         return jsonify({
             'success': True,
@@ -175,87 +307,95 @@ def remove_tag_from_note(note_id, tag_id):
 def export_notes(format_type):
     """Export notes in specified format"""
     try:
+        # Imported here so reportlab/python-docx load only when an export is requested
+        from src.services.export_service import get_export_service
+        export_service = get_export_service()
+
         data = request.get_json() or {}
         note_ids = data.get('note_ids', [])
         include_translations = data.get('include_translations', True)
         
-        # Get notes to export
-        if note_ids:
-            notes = Note.query.filter(Note.id.in_(note_ids)).all()
-        else:
-            notes = Note.query.order_by(Note.updated_at.desc()).all()
+        # Counts against the user's concurrent job quota until the file is built
+        with tenancy.job('export'):
+            # Get notes to export
+            if note_ids:
+                notes = tenancy.query(Note).filter(Note.id.in_(note_ids)).all()
+            else:
+                notes = tenancy.query(Note).order_by(Note.updated_at.desc()).all()
         
-        if not notes:
-            return jsonify({'success': False, 'error': 'No notes found'}), 404
+            if not notes:
+                return jsonify({'success': False, 'error': 'No notes found'}), 404
         
-        # Convert to dict format
-        notes_data = [note.to_dict() for note in notes]
+            # Convert to dict format; archived notes are read from the cold tier without rehydrating them
+            notes_data = note_tiering.full_dicts(notes)
         
-        # Generate export based on format
-        format_type = format_type.lower()
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            # Generate export based on format
+            format_type = format_type.lower()
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
-        if format_type == 'markdown':
-            content = export_service.export_to_markdown(notes_data, include_translations)
+            if format_type == 'markdown':
+                content = export_service.export_to_markdown(notes_data, include_translations)
             
-            # Return as downloadable file
-            buffer = io.BytesIO(content.encode('utf-8'))
-            buffer.seek(0)
+                # Return as downloadable file
+                buffer = io.BytesIO(content.encode('utf-8'))
+                buffer.seek(0)
             
-            return send_file(
-                buffer,
-                as_attachment=True,
-                download_name=f'notes_export_{timestamp}.md',
-                mimetype='text/markdown'
-            )
+                return send_file(
+                    buffer,
+                    as_attachment=True,
+                    download_name=f'notes_export_{timestamp}.md',
+                    mimetype='text/markdown'
+                )
             
-        elif format_type == 'pdf':
-            content = export_service.export_to_pdf(notes_data, include_translations)
+            elif format_type == 'pdf':
+                content = export_service.export_to_pdf(notes_data, include_translations)
             
-            buffer = io.BytesIO(content)
-            buffer.seek(0)
+                buffer = io.BytesIO(content)
+                buffer.seek(0)
             
-            return send_file(
-                buffer,
-                as_attachment=True,
-                download_name=f'notes_export_{timestamp}.pdf',
-                mimetype='application/pdf'
-            )
+                return send_file(
+                    buffer,
+                    as_attachment=True,
+                    download_name=f'notes_export_{timestamp}.pdf',
+                    mimetype='application/pdf'
+                )
             
-        elif format_type == 'docx':
-            content = export_service.export_to_docx(notes_data, include_translations)
+            elif format_type == 'docx':
+                content = export_service.export_to_docx(notes_data, include_translations)
             
-            if not content:
-                return jsonify({'success': False, 'error': 'DOCX export not available'}), 500
+                if not content:
+                    return jsonify({'success': False, 'error': 'DOCX export not available'}), 500
             
-            buffer = io.BytesIO(content)
-            buffer.seek(0)
+                buffer = io.BytesIO(content)
+                buffer.seek(0)
             
-            return send_file(
-                buffer,
-                as_attachment=True,
-                download_name=f'notes_export_{timestamp}.docx',
-                mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            )
+                return send_file(
+                    buffer,
+                    as_attachment=True,
+                    download_name=f'notes_export_{timestamp}.docx',
+                    mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+                )
             
-        elif format_type == 'all':
-            # Export multiple formats as ZIP
-            formats = ['markdown', 'pdf', 'docx']
-            content = export_service.export_multiple_formats(notes_data, formats, include_translations)
+            elif format_type == 'all':
+                # Export multiple formats as ZIP
+                formats = ['markdown', 'pdf', 'docx']
+                content = export_service.export_multiple_formats(notes_data, formats, include_translations)
             
-            buffer = io.BytesIO(content)
-            buffer.seek(0)
+                buffer = io.BytesIO(content)
+                buffer.seek(0)
             
-            return send_file(
-                buffer,
-                as_attachment=True,
-                download_name=f'notes_export_{timestamp}.zip',
-                mimetype='application/zip'
-            )
+                return send_file(
+                    buffer,
+                    as_attachment=True,
+                    download_name=f'notes_export_{timestamp}.zip',
+                    mimetype='application/zip'
+                )
         
-        else:
-            return jsonify({'success': False, 'error': 'Unsupported format'}), 400
+            else:
+                return jsonify({'success': False, 'error': 'Unsupported format'}), 400
             
+    except TenantQuotaExceeded as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -277,44 +417,50 @@ def get_export_formats():
 # Batch AI Analysis
 @enhanced_bp.route('/notes/analyze-all', methods=['POST'])
 def analyze_all_notes():
-    """Analyze all notes with AI (background task)"""
+    """Analyze all of the user's notes with AI (background task)"""
     try:
         data = request.get_json() or {}
         force_reanalysis = data.get('force', False)
         
-        # Get notes that need analysis
-        if force_reanalysis:
-            notes = Note.query.all()
-        else:
-            # Only analyze notes that haven't been analyzed recently
-            notes = Note.query.filter(
-                db.or_(
-                    Note.last_ai_analysis.is_(None),
-                    Note.updated_at > Note.last_ai_analysis
-                )
-            ).all()
-        
-        analyzed_count = 0
-        errors = []
-        
-        for note in notes:
-            try:
-                # Get AI analysis
-                auto_tags, suggestions = ai_analysis_service.analyze_note_content(
-                    note.title, note.content
-                )
+        with tenancy.job('analyze-all'):
+            # Get notes that need analysis; archived notes are left alone until they are opened again
+            hot_notes = tenancy.query(Note).filter(Note.is_archived.is_(False))
+            if force_reanalysis:
+                notes = hot_notes.all()
+            else:
+                # Only analyze notes that haven't been analyzed recently
+                notes = hot_notes.filter(
+                    db.or_(
+                        Note.last_ai_analysis.is_(None),
+                        Note.updated_at > Note.last_ai_analysis
+                    )
+                ).all()
+        
+            analyzed_count = 0
+            errors = []
+        
+            for note in notes:
+                try:
+                    # Get AI analysis
+                    with llm_ledger.note_context(note.id):
+                        auto_tags, suggestions = ai_analysis_service.analyze_note_content(
+                            note.title, note.content, note.text_stats
+                        )
                 
-                # Update note
-                note.auto_tags = auto_tags
-                note.ai_suggestions = suggestions
-                note.last_ai_analysis = datetime.utcnow()
+                    # Update note
+                    note.auto_tags = auto_tags
+                    note.ai_suggestions = suggestions
+                    note.last_ai_analysis = datetime.utcnow()
                 
-                analyzed_count += 1
+                    analyzed_count += 1
                 
-            except Exception as e:
-                errors.append(f"Note {note.id}: {str(e)}")
+                except Exception as e:
+                    errors.append(f"Note {note.id}: {str(e)}")
         
-        db.session.commit()
+            change_feed.record_many('notes.updated', [note.id for note in notes if note.last_ai_analysis],
+                                    fields=['auto_tags', 'ai_suggestions'])
+            db.session.commit()
+            note_cache.invalidate('notes')
         
         return jsonify({
             'success': True,
@@ -323,6 +469,8 @@ def analyze_all_notes():
             'errors': errors
         })
         
+    except TenantQuotaExceeded as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
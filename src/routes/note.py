@@ -1,13 +1,80 @@
-from flask import Blueprint, jsonify, request
+import re
+import time
+from contextlib import closing
+from flask import Blueprint, Response, jsonify, request, abort, stream_with_context
+from sqlalchemy import Text, cast, func, or_, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from src.models.note import Note, db
+from src.models.tag import Tag, NoteTag
 from src.services.translation import translation_service
+from src.services.cache import note_cache
+from src.services.llm_ledger import llm_ledger
+from src.services.enrichment import enrichment_pipeline
+from src.services.change_feed import change_feed
+from src.services.typeahead import typeahead_index
+from src.services.revisions import revision_history
+from src.services.tiering import note_tiering
+from src.services.sqlite_backend import uses_sqlite, fts_query
+from src.services.tenancy import tenancy
+from src.services.streaming import SSE_HEADERS, SSE_OPEN, sse_event
+from src.services.structured_logging import get_logger
 
 note_bp = Blueprint('note', __name__)
+logger = get_logger('routes.note')
+
+_SEARCH_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+def _list_arg(name):
+    """Parse a comma-separated query parameter into lowercase values"""
+    raw = request.args.get(name, '')
+    return list(dict.fromkeys(value.strip().lower() for value in raw.split(',') if value.strip()))
+
+def _apply_tag_filters(query):
+    """Filter by manual tags (?tags=) and AI tags (?auto_tags=), matching all or any (?match=)"""
+    tags = _list_arg('tags')
+    auto_tags = _list_arg('auto_tags')
+    match_all = request.args.get('match', 'all').lower() != 'any'
+
+    if auto_tags and uses_sqlite():
+        # auto_tags is a JSON array on SQLite
+        elements = func.json_each(Note.auto_tags).table_valued('value')
+        matched = select(func.count(func.distinct(elements.c.value))).where(elements.c.value.in_(auto_tags))
+        if match_all:
+            query = query.filter(matched.scalar_subquery() == len(auto_tags))
+        else:
+            query = query.filter(matched.scalar_subquery() > 0)
+    elif auto_tags:
+        # @> / && on the TEXT[] column are served by the idx_note_auto_tags GIN index
+        values = cast(auto_tags, ARRAY(Text))
+        if match_all:
+            query = query.filter(Note.auto_tags.op('@>')(values))
+        else:
+            query = query.filter(Note.auto_tags.op('&&')(values))
+
+    if tags:
+        tagged = db.session.query(NoteTag.note_id).join(Tag, Tag.id == NoteTag.tag_id).filter(
+            tenancy.owner_clause(Tag.user_id), func.lower(Tag.name).in_(tags)
+        ).group_by(NoteTag.note_id)
+        if match_all:
+            tagged = tagged.having(func.count(func.distinct(func.lower(Tag.name))) == len(tags))
+        query = query.filter(Note.id.in_(tagged))
+
+    return query
+
+def _pg_tsquery(query):
+    """to_tsquery('simple') expression requiring every word of query as a prefix, like fts_query on SQLite"""
+    tokens = _SEARCH_TOKEN.findall(query.lower())
+    if not tokens:
+        return None
+    return ' & '.join(f"'{token}':*" for token in tokens)
+
+def _has_tag_filters():
+    return bool(request.args.get('tags') or request.args.get('auto_tags'))
 
 @note_bp.route('/notes', methods=['GET'])
 def get_notes():
-    """Get all notes, ordered by most recently updated"""
-    notes = Note.query.order_by(Note.updated_at.desc()).all()
+    """Get the user's notes, ordered by most recently updated; archived notes are stubs with a preview"""
+    notes = _apply_tag_filters(tenancy.query(Note)).order_by(Note.updated_at.desc()).all()
     return jsonify([note.to_dict() for note in notes])
 
 @note_bp.route('/notes', methods=['POST'])
@@ -15,51 +82,92 @@ def create_note():
     """Create a new note"""
     try:
         data = request.json
-        print(f"Received data for note creation: {data}")  # Debug log
+        logger.debug('Received note creation request', extra={'payload': data})
         
         if not data or 'title' not in data or 'content' not in data:
-            print("Missing title or content")  # Debug log
+            logger.info('Rejected note creation: missing title or content')
             return jsonify({'error': 'Title and content are required'}), 400
         
-        note = Note(title=data['title'], content=data['content'])
+        note = Note(title=data['title'], content=data['content'], user_id=tenancy.current_user_id())
         db.session.add(note)
+        revision_history.record(note)
+        change_feed.record('note.created', note)
         db.session.commit()
+        note_cache.invalidate('notes')
+        enrichment_pipeline.publish(note.id)
         
         result = note.to_dict()
-        print(f"Note created successfully: {result}")  # Debug log
+        logger.info('Note created', extra={'note_id': note.id})
         return jsonify(result), 201
     except Exception as e:
-        print(f"Error creating note: {str(e)}")  # Debug log
+        logger.exception('Error creating note')
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@note_bp.route('/notes/stream', methods=['GET'])
+def stream_note_changes():
+    """Push note and tag changes as Server-Sent Events, resuming after Last-Event-ID"""
+    subscription = change_feed.subscribe(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id'),
+        user_id=tenancy.current_user_id()
+    )
+    # Streams end after CHANGE_FEED_MAX_SECONDS; EventSource reconnects and resumes
+    deadline = time.monotonic() + change_feed.max_stream_seconds
+
+    def generate():
+        yield 'retry: 3000\n\n'
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            item = subscription.get(timeout=min(change_feed.heartbeat_seconds, remaining))
+            if item is None:
+                yield ': heartbeat\n\n'  # Also surfaces disconnected clients
+            else:
+                yield sse_event(item['type'], item, item.get('id'))
+
+    response = Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+    response.call_on_close(subscription.close)
+    return response
+
 @note_bp.route('/notes/<int:note_id>', methods=['GET'])
 def get_note(note_id):
     """Get a specific note by ID"""
-    note = Note.query.get_or_404(note_id)
-    return jsonify(note.to_dict())
+    def load():
+        note = note_tiering.get(note_id)
+        return note.to_dict() if note else None
+
+    result = note_cache.get_or_load('notes', note_id, load)
+    if result is None:
+        abort(404)
+    return jsonify(result)
 
 @note_bp.route('/notes/<int:note_id>', methods=['PUT'])
 def update_note(note_id):
     """Update a specific note"""
     try:
-        note = Note.query.get_or_404(note_id)
+        note = note_tiering.get_or_404(note_id)
         data = request.json
-        print(f"Received data for note update: {data}")  # Debug log
+        logger.debug('Received note update request', extra={'note_id': note_id, 'payload': data})
         
         if not data:
-            print("No data provided for update")  # Debug log
+            logger.info('Rejected note update: no data provided', extra={'note_id': note_id})
             return jsonify({'error': 'No data provided'}), 400
         
+        previous = {'title': note.title, 'content': note.content, 'updated_at': note.updated_at}
         note.title = data.get('title', note.title)
         note.content = data.get('content', note.content)
+        revision_history.record(note, previous)
+        change_feed.record('note.updated', note)
         db.session.commit()
+        note_cache.invalidate('notes')
+        enrichment_pipeline.publish(note.id)
         
         result = note.to_dict()
-        print(f"Note updated successfully: {result}")  # Debug log
+        logger.info('Note updated', extra={'note_id': note_id})
         return jsonify(result)
     except Exception as e:
-        print(f"Error updating note: {str(e)}")  # Debug log
+        logger.exception('Error updating note', extra={'note_id': note_id})
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
@@ -67,41 +175,98 @@ def update_note(note_id):
 def delete_note(note_id):
     """Delete a specific note"""
     try:
-        note = Note.query.get_or_404(note_id)
+        note = tenancy.get_or_404(Note, note_id)
         db.session.delete(note)
+        change_feed.record('note.deleted', note_id=note_id)
         db.session.commit()
+        note_cache.invalidate('notes')
         return '', 204
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@note_bp.route('/notes/<int:note_id>/revisions', methods=['GET'])
+def list_revisions(note_id):
+    """List a note's revisions, newest first, with their stored size"""
+    note = note_tiering.get_or_404(note_id)
+    try:
+        revisions = revision_history.list(note_id)
+        return jsonify({
+            'success': True,
+            'note_id': note_id,
+            'revisions': revisions,
+            'live_bytes': len(note.content.encode('utf-8')),
+            'stored_bytes': sum(revision['stored_bytes'] for revision in revisions)
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@note_bp.route('/notes/<int:note_id>/revisions/<int:seq>', methods=['GET'])
+def get_revision(note_id, seq):
+    """Reconstruct one revision of a note from its snapshot and diffs"""
+    tenancy.get_or_404(Note, note_id)
+    revision = revision_history.get(note_id, seq)
+    if revision is None:
+        abort(404)
+    return jsonify({'success': True, 'note_id': note_id, 'revision': revision})
+
 @note_bp.route('/notes/search', methods=['GET'])
 def search_notes():
-    """Search notes by title or content"""
+    """Search notes by title or content, optionally narrowed by tag filters"""
     query = request.args.get('q', '')
-    if not query:
+    if not query and not _has_tag_filters():
         return jsonify([])
     
-    notes = Note.query.filter(
-        (Note.title.contains(query)) | (Note.content.contains(query))
-    ).order_by(Note.updated_at.desc()).all()
+    user_id = tenancy.current_user_id()
+    notes = _apply_tag_filters(tenancy.query(Note))
+    if query and uses_sqlite():
+        # Served by the note_fts FTS5 index: every word, as a prefix, in title or content
+        match = fts_query(query, user_id)
+        if match is None:
+            return jsonify([])
+        matches = text('SELECT rowid FROM note_fts WHERE note_fts MATCH :match').bindparams(match=match)
+        notes = notes.filter(or_(Note.id.in_(matches.columns(Note.id)), note_tiering.search_filter(match)))
+    elif query:
+        match = _pg_tsquery(query)
+        if match is None:
+            return jsonify([])
+        # Same expression as the idx_note_user_search GIN index (database_migration_user_ownership.sql)
+        notes = notes.filter(or_(text(
+            "to_tsvector('simple', note.title || ' ' || note.content) @@ to_tsquery('simple', :match)"
+        ).bindparams(match=match), note_tiering.search_filter(match)))
+    notes = notes.order_by(Note.updated_at.desc()).all()
     
     return jsonify([note.to_dict() for note in notes])
 
+@note_bp.route('/suggest', methods=['GET'])
+def suggest():
+    """Typeahead: recent note titles and tag names with a word starting with ?prefix="""
+    prefix = request.args.get('prefix', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    try:
+        return jsonify({'prefix': prefix, **typeahead_index.suggest(prefix, limit, tenancy.current_user_id())})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @note_bp.route('/notes/<int:note_id>/translate', methods=['POST'])
 def translate_note(note_id):
     """Translate note content to Chinese"""
     try:
-        note = Note.query.get_or_404(note_id)
+        note = note_tiering.get_or_404(note_id)
         
         # Translate title and content
-        title_zh = translation_service.translate_to_chinese(note.title)
-        content_zh = translation_service.translate_to_chinese(note.content)
+        with llm_ledger.note_context(note.id):
+            title_zh = translation_service.translate_to_chinese(note.title)
+            content_zh = translation_service.translate_to_chinese(note.content)
         
         # Update note with translations
         note.title_zh = title_zh
         note.content_zh = content_zh
+        change_feed.record('note.updated', note, fields=['title_zh', 'content_zh'])
         db.session.commit()
+        note_cache.invalidate('notes')
         
         return jsonify({
             'success': True,
@@ -112,3 +277,39 @@ def translate_note(note_id):
         db.session.rollback()
         return jsonify({'error': f'Translation failed: {str(e)}'}), 500
 
+@note_bp.route('/notes/<int:note_id>/translate/stream', methods=['GET'])
+def translate_note_stream(note_id):
+    """Stream the Chinese translation as Server-Sent Events, saving it once complete"""
+    note = note_tiering.get_or_404(note_id)
+    sources = (('title_zh', note.title), ('content_zh', note.content))
+
+    def generate():
+        yield SSE_OPEN
+        translated = {}
+        try:
+            with llm_ledger.note_context(note_id):
+                for field, source in sources:
+                    parts = []
+                    # closing() cancels the upstream call if the client goes away mid-stream
+                    with closing(translation_service.stream_translation(source)) as deltas:
+                        for delta in deltas:
+                            parts.append(delta)
+                            yield sse_event('delta', {'field': field, 'text': delta})
+                    translated[field] = ''.join(parts).strip()
+
+            note = note_tiering.get(note_id)
+            if note is None:
+                yield sse_event('error', {'success': False, 'error': 'Note not found'})
+                return
+            note.title_zh = translated['title_zh']
+            note.content_zh = translated['content_zh']
+            change_feed.record('note.updated', note, fields=['title_zh', 'content_zh'])
+            db.session.commit()
+            note_cache.invalidate('notes')
+            yield sse_event('done', {'success': True, **translated})
+        except Exception as e:
+            db.session.rollback()
+            yield sse_event('error', {'success': False, 'error': f'Translation failed: {str(e)}'})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
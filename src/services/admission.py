@@ -0,0 +1,318 @@
+"""
+Admission Control for NoteTaker
+Caps concurrent requests per endpoint class (ai, export, crud) with a bounded
+wait queue each, and rate limits every client with a token bucket per class,
+so batch AI and export work cannot take every worker from interactive editing
+"""
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from flask import g, jsonify, request
+from src.services.metrics import metrics, Counter, Gauge
+from src.services.structured_logging import get_logger
+
+logger = get_logger('services.admission')
+
+# Endpoints that hold a worker for seconds to minutes; other API endpoints are crud
+ENDPOINT_CLASSES = {
+    'note.translate_note': 'ai',
+    'note.translate_note_stream': 'ai',
+    'enhanced.analyze_note': 'ai',
+    'enhanced.get_suggestions': 'ai',
+    'enhanced.stream_suggestions': 'ai',
+    'enhanced.analyze_all_notes': 'ai',
+    'enhanced.export_notes': 'export',
+    'bulk.import_notes': 'export',
+}
+
+# Long-lived streams that wait on events rather than doing work
+EXEMPT_ENDPOINTS = {'note.stream_note_changes'}
+
+# (concurrency, queue, queue timeout seconds, rate per second per client, burst); queued requests
+# block a worker thread too, so together these fit the 32 ASGI_WSGI_THREADS with room to spare
+DEFAULTS = {
+    'ai': (4, 2, 10.0, 0.5, 10),
+    'export': (2, 1, 15.0, 0.05, 3),
+    'crud': (16, 3, 2.0, 20.0, 40),
+}
+
+# Threads left for unclassified requests (status, metrics, static files) when the budget is derived,
+# at most a quarter of them
+RESERVED_THREADS = 4
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a request is shed: 429 for a client over its rate, 503 for a saturated pool"""
+
+    def __init__(self, message: str, reason: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """0 if a token was taken, otherwise the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ThreadBudget:
+    """Worker threads held by admitted or queued requests across all pools
+
+    Waiting for a slot blocks a worker thread, so once the budget is spent
+    further requests are rejected at once instead of queueing on threads
+    the pools' own slots need.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.held = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> None:
+        with self._lock:
+            if self.limit and self.held >= self.limit:
+                raise AdmissionRejected('Server is at capacity', 'saturated', 503, 1)
+            self.held += 1
+
+    def give(self) -> None:
+        with self._lock:
+            self.held -= 1
+
+
+class Ticket:
+    """A pool slot, released once when the response is closed"""
+
+    def __init__(self, pool: 'Pool'):
+        self.pool = pool
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.pool.release(time.monotonic() - self.started)
+
+
+class Pool:
+    def __init__(self, name: str, threads: ThreadBudget):
+        concurrency, queue, timeout, rate, burst = DEFAULTS[name]
+        prefix = f'ADMISSION_{name.upper()}_'
+        self.name = name
+        self.threads = threads
+        # 0 disables the limit (and the queue) for this class
+        self.concurrency = int(os.environ.get(prefix + 'CONCURRENCY', concurrency))
+        self.max_queue = int(os.environ.get(prefix + 'QUEUE', queue))
+        self.queue_timeout = float(os.environ.get(prefix + 'QUEUE_TIMEOUT', timeout))
+        # Tokens per second per client; 0 disables rate limiting for this class
+        self.rate = float(os.environ.get(prefix + 'RATE', rate))
+        self.burst = max(float(os.environ.get(prefix + 'BURST', burst)), 1.0)
+        self.in_flight = 0
+        self.waiting = 0
+        self.avg_seconds = 1.0  # Moving average of slot hold time, for Retry-After
+        self._cond = threading.Condition()
+        self._counts = {
+            'admitted': 0, 'queued': 0, 'queue_full': 0, 'queue_timeout': 0, 'rate_limited': 0, 'saturated': 0
+        }
+
+    def acquire(self) -> Ticket:
+        """A slot, waiting up to queue_timeout behind at most max_queue other requests"""
+        try:
+            self.threads.take()
+        except AdmissionRejected:
+            self._counts['saturated'] += 1
+            raise
+        try:
+            return self._acquire()
+        except AdmissionRejected:
+            self.threads.give()
+            raise
+
+    def _acquire(self) -> Ticket:
+        with self._cond:
+            if self.concurrency and (self.in_flight >= self.concurrency or self.waiting):
+                if self.waiting >= self.max_queue:
+                    self._counts['queue_full'] += 1
+                    raise AdmissionRejected(
+                        f'Too many {self.name} requests in progress', 'queue_full', 503, self.retry_after()
+                    )
+                self.waiting += 1
+                self._counts['queued'] += 1
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while self.in_flight >= self.concurrency:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or not self._cond.wait(remaining):
+                            if self.in_flight < self.concurrency:
+                                break
+                            self._counts['queue_timeout'] += 1
+                            raise AdmissionRejected(
+                                f'Timed out waiting for a {self.name} slot', 'queue_timeout', 503, self.retry_after()
+                            )
+                finally:
+                    self.waiting -= 1
+            self.in_flight += 1
+            self._counts['admitted'] += 1
+        return Ticket(self)
+
+    def release(self, held_seconds: float) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self.avg_seconds += 0.2 * (held_seconds - self.avg_seconds)
+            self._cond.notify()
+        self.threads.give()
+
+    def retry_after(self) -> int:
+        """Seconds for the current queue to drain at the average hold time"""
+        return max(1, math.ceil(self.avg_seconds * (self.waiting + 1) / max(self.concurrency, 1)))
+
+    def stats(self) -> Dict:
+        return {
+            'concurrency': self.concurrency,
+            'queue': self.max_queue,
+            'rate_per_second': self.rate,
+            'burst': self.burst,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'avg_seconds': round(self.avg_seconds, 3),
+            **self._counts
+        }
+
+
+class AdmissionControl:
+    def __init__(self):
+        self.enabled = os.environ.get('ADMISSION_ENABLED', 'true').lower() == 'true'
+        # Worker threads the pools may hold between them, running or queued (0 = no limit)
+        workers = int(os.environ.get('ASGI_WSGI_THREADS', 32))
+        self.threads = ThreadBudget(
+            int(os.environ.get('ADMISSION_MAX_THREADS', workers - min(RESERVED_THREADS, workers // 4)))
+        )
+        self.pools = {name: Pool(name, self.threads) for name in DEFAULTS}
+        # Buckets of the least recently seen clients are dropped past this many
+        self.max_clients = int(os.environ.get('ADMISSION_MAX_CLIENTS', 10000))
+        self._buckets: 'OrderedDict[tuple, TokenBucket]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._rejected = Counter(
+            'notetaker_admission_rejected_total', 'Requests shed by endpoint class and reason', ('class', 'reason')
+        )
+
+    def init_app(self, app) -> None:
+        # Registered after tenancy, so requests with a rejected user header are answered 4xx without a slot
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        metrics.register(self._rejected)
+        metrics.register(Gauge(
+            'notetaker_admission_requests', 'Requests holding or waiting for a slot by endpoint class',
+            ('class', 'state'), lambda: [
+                ((name, state), getattr(pool, state)) for name, pool in self.pools.items()
+                for state in ('in_flight', 'waiting')
+            ]
+        ))
+
+    # Admission
+
+    def classify(self, endpoint: Optional[str], blueprint: Optional[str]) -> Optional[str]:
+        """ai, export or crud for API endpoints; None for static files, status and ops endpoints"""
+        if blueprint is None or endpoint in EXEMPT_ENDPOINTS:
+            return None
+        return ENDPOINT_CLASSES.get(endpoint, 'crud')
+
+    def client_key(self, address: Optional[str]) -> str:
+        """The remote address; the user header is not authenticated, so keying on it would
+        hand a client a fresh bucket per request and let it evict other clients' buckets"""
+        return f'addr:{address or "unknown"}'
+
+    def check_rate(self, kind: str, client: str) -> None:
+        pool = self.pools[kind]
+        if not self.enabled or not pool.rate:
+            return
+        key = (client, kind)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(pool.rate, pool.burst)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take()
+        if wait:
+            pool._counts['rate_limited'] += 1
+            self._rejected.inc((kind, 'rate_limited'))
+            raise AdmissionRejected(
+                f'Rate limit exceeded for {kind} requests', 'rate_limited', 429, max(1, math.ceil(wait))
+            )
+
+    def admit(self, kind: str, client: str) -> Optional[Ticket]:
+        """Rate limit the client, then take a slot in the class pool; raises AdmissionRejected"""
+        if not self.enabled:
+            return None
+        self.check_rate(kind, client)
+        try:
+            return self.pools[kind].acquire()
+        except AdmissionRejected as e:
+            self._rejected.inc((kind, e.reason))
+            logger.info('Shed request', extra={'class': kind, 'reason': e.reason, 'retry_after': e.retry_after})
+            raise
+
+    @staticmethod
+    def rejection(error: AdmissionRejected):
+        response = jsonify({'success': False, 'error': str(error), 'retry_after': error.retry_after})
+        response.status_code = error.status
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response
+
+    def _before_request(self):
+        if not self.enabled or request.method == 'OPTIONS':
+            return None
+        kind = self.classify(request.endpoint, request.blueprint)
+        if kind is None:
+            return None
+        try:
+            g.admission_ticket = self.admit(kind, self.client_key(request.remote_addr))
+        except AdmissionRejected as e:
+            return self.rejection(e)
+        return None
+
+    def _after_request(self, response):
+        ticket = g.pop('admission_ticket', None)
+        if ticket is not None:
+            # Streamed responses keep their slot until the last chunk is sent
+            response.call_on_close(ticket.release)
+        return response
+
+    def _teardown_request(self, exc):
+        ticket = g.pop('admission_ticket', None)
+        if ticket is not None:
+            ticket.release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            clients = len(self._buckets)
+        return {
+            'enabled': self.enabled,
+            'clients': clients,
+            'threads': {'limit': self.threads.limit, 'held': self.threads.held},
+            'pools': {name: pool.stats() for name, pool in self.pools.items()}
+        }
+
+
+# Initialize admission instance
+admission_control = AdmissionControl()
@@ -4,15 +4,22 @@ Uses GitHub Models API for intelligent content analysis
 """
 import os
 import json
-import requests
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 import re
+import time
 from datetime import datetime
+from src.models.note import compute_text_stats
+from src.services.metrics import metrics
+from src.services.llm_ledger import llm_ledger, LlmBudgetExceeded
+from src.services.structured_logging import get_logger
+from src.services.streaming import stream_chat_completion
+
+logger = get_logger('services.ai_analysis')
 
 class AIAnalysisService:
     def __init__(self):
         self.github_token = None
-        self.base_url = "https://models.inference.ai.azure.com"
+        self.base_url = os.environ.get('GITHUB_MODELS_BASE_URL', "https://models.inference.ai.azure.com")
         self.model = "gpt-4o-mini"
         
     def _ensure_token(self):
@@ -22,39 +29,72 @@ class AIAnalysisService:
             if not self.github_token:
                 raise ValueError("GITHUB_TOKEN environment variable is required")
     
-    def _make_request(self, messages: List[Dict], max_tokens: int = 500) -> Optional[str]:
+    def _make_request(self, messages: List[Dict], max_tokens: int = 500,
+                      operation: str = 'chat') -> Optional[str]:
         """Make request to GitHub Models API"""
         self._ensure_token()  # Ensure token is loaded
+        try:
+            llm_ledger.check_budget()
+        except LlmBudgetExceeded as e:
+            logger.warning('Skipping AI call: %s', e, extra={'operation': operation})
+            llm_ledger.record('ai_analysis', operation, 'budget_exceeded')
+            return None
+
+        import requests  # Deferred: keeps requests/urllib3 off the cold-start import path
+        started = time.perf_counter()
+        status = 'error'
+        usage = None
         try:
             response = requests.post(
                 f"{self.base_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.github_token}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.model,
-                    "messages": messages,
-                    "max_tokens": max_tokens,
-                    "temperature": 0.3  # Lower temperature for more consistent results
-                },
+                headers=self._request_headers(),
+                json=self._request_payload(messages, max_tokens),
                 timeout=30
             )
             
+            status = str(response.status_code)
             if response.status_code == 200:
                 result = response.json()
+                usage = result.get('usage')
                 return result['choices'][0]['message']['content'].strip()
             else:
-                print(f"API Error: {response.status_code} - {response.text}")
+                logger.warning('AI API error', extra={'operation': operation, 'status': response.status_code, 'body': response.text})
                 return None
                 
         except Exception as e:
-            print(f"Error calling AI service: {e}")
+            logger.warning('Error calling AI service: %s', e, extra={'operation': operation})
             return None
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe_upstream('ai_analysis', operation, elapsed, status)
+            llm_ledger.record('ai_analysis', operation, status, elapsed * 1000, usage)
+
+    def _request_headers(self) -> Dict:
+        return {
+            "Authorization": f"Bearer {self.github_token}",
+            "Content-Type": "application/json"
+        }
+
+    def _request_payload(self, messages: List[Dict], max_tokens: int) -> Dict:
+        return {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": 0.3  # Lower temperature for more consistent results
+        }
     
     def generate_auto_tags(self, title: str, content: str) -> List[str]:
         """Generate automatic tags for a note using AI"""
-        messages = [
+        try:
+            response = self._make_request(self._auto_tag_messages(title, content), max_tokens=100,
+                                          operation='generate_auto_tags')
+        except ValueError as e:
+            logger.warning('Skipping AI call: %s', e)
+            response = None
+        return self._parse_auto_tags(response, title, content)
+
+    def _auto_tag_messages(self, title: str, content: str) -> List[Dict]:
+        return [
             {
                 "role": "system",
                 "content": """You are an AI assistant that analyzes text and generates relevant tags. 
@@ -68,9 +108,10 @@ class AIAnalysisService:
                 "content": f"Title: {title}\n\nContent: {content[:1000]}"  # Limit content length
             }
         ]
-        
+
+    def _parse_auto_tags(self, response: Optional[str], title: str, content: str) -> List[str]:
+        """Clean the model's tag list, falling back to keyword tags"""
         try:
-            response = self._make_request(messages, max_tokens=100)
             if response:
                 # Parse JSON response
                 tags = json.loads(response)
@@ -89,7 +130,7 @@ class AIAnalysisService:
                 tags = re.findall(r'"([^"]+)"', response)
                 return [tag.lower()[:20] for tag in tags[:5] if tag.isalnum()]
         except Exception as e:
-            print(f"Error parsing tags: {e}")
+            logger.warning('Error parsing tags: %s', e)
         
         # Fallback tags based on keywords
         return self._generate_fallback_tags(title, content)
@@ -117,9 +158,27 @@ class AIAnalysisService:
         
         return fallback_tags or ['general']
     
-    def generate_writing_suggestions(self, title: str, content: str) -> Dict:
-        """Generate AI-powered writing suggestions"""
-        messages = [
+    def generate_writing_suggestions(self, title: str, content: str, stats: Optional[Dict] = None) -> Dict:
+        """Generate AI-powered writing suggestions; stats are the note's stored text statistics"""
+        try:
+            response = self._make_request(self._suggestion_messages(title, content), max_tokens=400,
+                                          operation='generate_writing_suggestions')
+        except ValueError as e:
+            logger.warning('Skipping AI call: %s', e)
+            response = None
+        return self.parse_suggestions(response, title, content, stats)
+
+    def stream_writing_suggestions(self, title: str, content: str) -> Iterator[str]:
+        """Yield the raw suggestions JSON as it streams from the model; parse with parse_suggestions"""
+        self._ensure_token()
+        return stream_chat_completion(
+            f"{self.base_url}/chat/completions", self._request_headers(),
+            self._request_payload(self._suggestion_messages(title, content), 400),
+            'ai_analysis', 'generate_writing_suggestions'
+        )
+
+    def _suggestion_messages(self, title: str, content: str) -> List[Dict]:
+        return [
             {
                 "role": "system",
                 "content": """You are a writing assistant. Analyze the given note and provide helpful suggestions.
@@ -138,9 +197,11 @@ class AIAnalysisService:
                 "content": f"Title: {title}\n\nContent: {content[:800]}"  # Limit for analysis
             }
         ]
-        
+
+    def parse_suggestions(self, response: Optional[str], title: str, content: str,
+                          stats: Optional[Dict] = None) -> Dict:
+        """Validate the model's suggestions, falling back to heuristic ones"""
         try:
-            response = self._make_request(messages, max_tokens=400)
             if response:
                 suggestions = json.loads(response)
                 if isinstance(suggestions, dict):
@@ -155,14 +216,15 @@ class AIAnalysisService:
                     }
                     return clean_suggestions
         except (json.JSONDecodeError, Exception) as e:
-            print(f"Error generating suggestions: {e}")
+            logger.warning('Error generating suggestions: %s', e)
         
         # Fallback suggestions
-        return self._generate_fallback_suggestions(title, content)
+        return self._generate_fallback_suggestions(title, content, stats)
     
-    def _generate_fallback_suggestions(self, title: str, content: str) -> Dict:
+    def _generate_fallback_suggestions(self, title: str, content: str, stats: Optional[Dict] = None) -> Dict:
         """Generate basic suggestions when AI fails"""
-        word_count = len(content.split())
+        stats = stats or compute_text_stats(content)
+        word_count = stats['word_count']
         
         suggestions = {
             'improvements': [],
@@ -181,11 +243,11 @@ class AIAnalysisService:
         if not title or len(title) < 5:
             suggestions['improvements'].append("Consider adding a more descriptive title")
         
-        if len(content.split('.')) < 3:
+        if stats['sentence_count'] < 2:
             suggestions['suggested_edits'].append("Break content into shorter sentences")
         
         # Readability analysis
-        avg_word_length = sum(len(word) for word in content.split()) / max(word_count, 1)
+        avg_word_length = stats['avg_word_length']
         if avg_word_length > 6:
             suggestions['readability_score'] = 'low'
             suggestions['improvements'].append("Consider using simpler words for better readability")
@@ -194,10 +256,11 @@ class AIAnalysisService:
         
         return suggestions
     
-    def analyze_note_content(self, title: str, content: str) -> Tuple[List[str], Dict]:
+    def analyze_note_content(self, title: str, content: str,
+                             stats: Optional[Dict] = None) -> Tuple[List[str], Dict]:
         """Analyze note and return both tags and suggestions"""
         tags = self.generate_auto_tags(title, content)
-        suggestions = self.generate_writing_suggestions(title, content)
+        suggestions = self.generate_writing_suggestions(title, content, stats)
         return tags, suggestions
 
 # Initialize service instance
@@ -0,0 +1,73 @@
+"""
+Note Analytics for NoteTaker
+Per-user dashboard aggregates read from the trigger-maintained note_stats_daily
+and tag_stats summary tables (database_migration_note_stats.sql), never from note
+"""
+from datetime import datetime, timedelta
+from typing import Dict
+from sqlalchemy import text
+from src.models.user import db
+from src.services.cache import note_cache
+from src.services.tenancy import tenancy
+
+MAX_DAYS = 366
+
+
+class AnalyticsService:
+    def summary(self, days: int = 30) -> Dict:
+        """The user's totals, notes per day for the last `days` days and per-tag word counts"""
+        days = min(max(int(days), 1), MAX_DAYS)
+        # Cached under the user's notes version, so any of their note or tag-link writes refreshes it
+        return note_cache.get_or_load('notes', f'analytics:{days}', lambda: self._load(days))
+
+    def _load(self, days: int) -> Dict:
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        # Summary rows are keyed by owner: user_id, or 0 for the shared scope
+        owner = tenancy.current_user_id() or 0
+
+        totals = db.session.execute(text(
+            'SELECT COALESCE(SUM(notes), 0) AS notes, COALESCE(SUM(words), 0) AS words, '
+            'COALESCE(SUM(chars), 0) AS chars, COALESCE(SUM(translated), 0) AS translated '
+            'FROM note_stats_daily WHERE owner = :owner'
+        ), {'owner': owner}).one()
+        per_day = db.session.execute(text(
+            'SELECT day, notes, words, translated FROM note_stats_daily '
+            'WHERE owner = :owner AND day >= :since AND notes > 0 ORDER BY day'
+        ), {'owner': owner, 'since': since.isoformat()})
+        tags = db.session.execute(text(
+            'SELECT t.id, t.name, t.color, COALESCE(s.notes, 0) AS notes, COALESCE(s.words, 0) AS words '
+            'FROM tag t LEFT JOIN tag_stats s ON s.tag_id = t.id '
+            f'WHERE {tenancy.owner_sql("t.user_id")} '
+            'ORDER BY words DESC, t.name'
+        ))
+
+        notes = int(totals.notes)
+        return {
+            'totals': {
+                'notes': notes,
+                'words': int(totals.words),
+                'chars': int(totals.chars),
+                'translated': int(totals.translated),
+                'translation_coverage': round(int(totals.translated) / notes, 4) if notes else 0.0,
+                'avg_words_per_note': round(int(totals.words) / notes, 2) if notes else 0.0
+            },
+            'since': since.isoformat(),
+            'per_day': [{
+                'day': str(row.day),  # date on PostgreSQL, ISO text on SQLite
+                'notes': int(row.notes),
+                'words': int(row.words),
+                'translated': int(row.translated)
+            } for row in per_day],
+            'tags': [{
+                'id': row.id,
+                'name': row.name,
+                'color': row.color,
+                'notes': int(row.notes),
+                'words': int(row.words),
+                'avg_words_per_note': round(int(row.words) / int(row.notes), 2) if row.notes else 0.0
+            } for row in tags]
+        }
+
+
+# Initialize service instance
+analytics_service = AnalyticsService()
@@ -0,0 +1,291 @@
+"""
+Async GitHub Models Services for NoteTaker
+httpx-based variants of the translation and AI analysis services used by the
+ASGI entry point, sharing one connection pool and concurrency limit per event loop
+"""
+import os
+import time
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from src.services.ai_analysis import AIAnalysisService
+from src.services.translation import TranslationService, TRANSLATION_FAILED
+from src.services.metrics import metrics, Gauge
+from src.services.llm_ledger import llm_ledger, LlmBudgetExceeded
+from src.services.structured_logging import get_logger
+from src.services.streaming import UpstreamStreamError, parse_chat_chunk, stream_payload
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+logger = get_logger('services.async_ai')
+
+
+class AsyncModelsClient:
+    """One httpx.AsyncClient and semaphore per event loop, capped at AI_MAX_CONCURRENCY"""
+
+    def __init__(self):
+        self.max_concurrency = int(os.environ.get('AI_MAX_CONCURRENCY', 100))
+        self.timeout = float(os.environ.get('AI_TIMEOUT_SECONDS', 30))
+        self._loops = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+
+    def _state(self) -> Tuple['httpx.AsyncClient', asyncio.Semaphore]:
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError('httpx is required for the async AI services')
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            with self._lock:
+                state = self._loops.get(loop)
+                if state is None:
+                    client = httpx.AsyncClient(
+                        # Connections are bounded by the semaphore, so never time out waiting for the pool
+                        timeout=httpx.Timeout(self.timeout, pool=None),
+                        limits=httpx.Limits(max_connections=self.max_concurrency,
+                                            max_keepalive_connections=self.max_concurrency)
+                    )
+                    state = (client, asyncio.Semaphore(self.max_concurrency))
+                    self._loops[loop] = state
+        return state
+
+    async def post(self, url: str, headers: Dict, payload: Dict) -> 'httpx.Response':
+        client, semaphore = self._state()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            return await client.post(url, headers=headers, json=payload)
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+
+    @asynccontextmanager
+    async def stream(self, url: str, headers: Dict, payload: Dict):
+        """Streamed POST holding a concurrency slot until the body is consumed or cancelled"""
+        client, semaphore = self._state()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            async with client.stream('POST', url, headers=headers, json=payload) as response:
+                yield response
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+
+    async def aclose(self) -> None:
+        """Close the client bound to the running loop (ASGI lifespan shutdown)"""
+        state = self._loops.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[0].aclose()
+
+    def stats(self) -> Dict:
+        return {
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting
+        }
+
+
+async def astream_chat_completion(client: AsyncModelsClient, url: str, headers: Dict, payload: Dict,
+                                  service: str, operation: str) -> AsyncIterator[str]:
+    """Async counterpart of streaming.stream_chat_completion; cancelling closes the upstream connection"""
+    try:
+        llm_ledger.check_budget()
+    except LlmBudgetExceeded:
+        llm_ledger.record(service, operation, 'budget_exceeded')
+        raise
+
+    started = time.perf_counter()
+    status = 'error'
+    usage = None
+    try:
+        async with client.stream(url, headers, stream_payload(payload)) as response:
+            status = str(response.status_code)
+            if response.status_code != 200:
+                body = (await response.aread()).decode('utf-8', 'replace')
+                logger.warning('Streaming API error', extra={'operation': operation, 'status': response.status_code, 'body': body})
+                raise UpstreamStreamError(f'Model API returned {response.status_code}')
+            async for line in response.aiter_lines():
+                delta, chunk_usage, done = parse_chat_chunk(line)
+                if chunk_usage:
+                    usage = chunk_usage
+                if done:
+                    break
+                if delta:
+                    yield delta
+    except (asyncio.CancelledError, GeneratorExit):
+        status = 'cancelled'
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe_upstream(service, operation, elapsed, status)
+        llm_ledger.record(service, operation, status, elapsed * 1000, usage)
+
+
+class AsyncAIAnalysisService(AIAnalysisService):
+    """AIAnalysisService with coroutine methods; prompts and parsing are shared"""
+
+    def __init__(self, client: AsyncModelsClient):
+        super().__init__()
+        self.client = client
+
+    async def _make_request(self, messages: List[Dict], max_tokens: int = 500,
+                            operation: str = 'chat') -> Optional[str]:
+        """Make request to GitHub Models API"""
+        self._ensure_token()
+        try:
+            llm_ledger.check_budget()
+        except LlmBudgetExceeded as e:
+            logger.warning('Skipping AI call: %s', e, extra={'operation': operation})
+            llm_ledger.record('ai_analysis', operation, 'budget_exceeded')
+            return None
+
+        started = time.perf_counter()
+        status = 'error'
+        usage = None
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/chat/completions",
+                self._request_headers(),
+                self._request_payload(messages, max_tokens)
+            )
+            status = str(response.status_code)
+            if response.status_code == 200:
+                result = response.json()
+                usage = result.get('usage')
+                return result['choices'][0]['message']['content'].strip()
+            logger.warning('AI API error', extra={'operation': operation, 'status': response.status_code, 'body': response.text})
+            return None
+        except Exception as e:
+            logger.warning('Error calling AI service: %s', e, extra={'operation': operation})
+            return None
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe_upstream('ai_analysis', operation, elapsed, status)
+            llm_ledger.record('ai_analysis', operation, status, elapsed * 1000, usage)
+
+    async def generate_auto_tags(self, title: str, content: str) -> List[str]:
+        """Generate automatic tags for a note using AI"""
+        try:
+            response = await self._make_request(self._auto_tag_messages(title, content), max_tokens=100,
+                                                operation='generate_auto_tags')
+        except ValueError as e:
+            logger.warning('Skipping AI call: %s', e)
+            response = None
+        return self._parse_auto_tags(response, title, content)
+
+    async def generate_writing_suggestions(self, title: str, content: str,
+                                           stats: Optional[Dict] = None) -> Dict:
+        """Generate AI-powered writing suggestions; stats are the note's stored text statistics"""
+        try:
+            response = await self._make_request(self._suggestion_messages(title, content), max_tokens=400,
+                                                operation='generate_writing_suggestions')
+        except ValueError as e:
+            logger.warning('Skipping AI call: %s', e)
+            response = None
+        return self.parse_suggestions(response, title, content, stats)
+
+    def stream_writing_suggestions(self, title: str, content: str) -> AsyncIterator[str]:
+        """Yield the raw suggestions JSON as it streams from the model; parse with parse_suggestions"""
+        self._ensure_token()
+        return astream_chat_completion(
+            self.client, f"{self.base_url}/chat/completions", self._request_headers(),
+            self._request_payload(self._suggestion_messages(title, content), 400),
+            'ai_analysis', 'generate_writing_suggestions'
+        )
+
+    async def analyze_note_content(self, title: str, content: str,
+                                   stats: Optional[Dict] = None) -> Tuple[List[str], Dict]:
+        """Tags and suggestions, requested concurrently"""
+        tags, suggestions = await asyncio.gather(
+            self.generate_auto_tags(title, content),
+            self.generate_writing_suggestions(title, content, stats)
+        )
+        return tags, suggestions
+
+
+class AsyncTranslationService(TranslationService):
+    """TranslationService with coroutine methods sharing the same request body"""
+
+    def __init__(self, client: AsyncModelsClient):
+        super().__init__()
+        self.client = client
+
+    async def translate_to_chinese(self, text):
+        """Translate English text to Chinese using GitHub Models"""
+        try:
+            if not text or not text.strip():
+                return ""
+
+            headers = self._get_headers()
+            try:
+                llm_ledger.check_budget()
+            except LlmBudgetExceeded:
+                llm_ledger.record('translation', 'translate_to_chinese', 'budget_exceeded')
+                raise
+
+            started = time.perf_counter()
+            try:
+                response = await self.client.post(self.endpoint, headers, self._payload(text))
+            except Exception:
+                elapsed = time.perf_counter() - started
+                metrics.observe_upstream('translation', 'translate_to_chinese', elapsed, 'error')
+                llm_ledger.record('translation', 'translate_to_chinese', 'error', elapsed * 1000)
+                raise
+            elapsed = time.perf_counter() - started
+            status = str(response.status_code)
+            metrics.observe_upstream('translation', 'translate_to_chinese', elapsed, status)
+
+            if response.status_code == 200:
+                result = response.json()
+                llm_ledger.record('translation', 'translate_to_chinese', status, elapsed * 1000, result.get('usage'))
+                return result["choices"][0]["message"]["content"].strip()
+            llm_ledger.record('translation', 'translate_to_chinese', status, elapsed * 1000)
+            logger.warning('Translation API error', extra={'status': response.status_code, 'body': response.text})
+            return TRANSLATION_FAILED
+
+        except Exception as e:
+            logger.warning('Translation error: %s', e)
+            return TRANSLATION_FAILED
+
+    async def stream_translation(self, text) -> AsyncIterator[str]:
+        """Yield the Chinese translation of text as it streams from the model"""
+        if not text or not text.strip():
+            return
+        async for delta in astream_chat_completion(self.client, self.endpoint, self._get_headers(), self._payload(text),
+                                                   'translation', 'translate_to_chinese'):
+            yield delta
+
+    async def translate_note(self, title: str, content: str) -> Tuple[str, str]:
+        """Title and content, translated concurrently"""
+        title_zh, content_zh = await asyncio.gather(
+            self.translate_to_chinese(title),
+            self.translate_to_chinese(content)
+        )
+        return title_zh, content_zh
+
+
+# Initialize shared client and service instances
+models_client = AsyncModelsClient()
+async_ai_analysis_service = AsyncAIAnalysisService(models_client)
+async_translation_service = AsyncTranslationService(models_client)
+
+metrics.register(Gauge(
+    'notetaker_ai_async_requests', 'Async GitHub Models calls in flight or waiting for a slot',
+    ('state',), lambda: [(('in_flight',), models_client.in_flight), (('waiting',), models_client.waiting)]
+))
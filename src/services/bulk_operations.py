@@ -0,0 +1,279 @@
+"""
+Bulk Note Operations Service
+Set-based create, update, delete and tag assignment in a single transaction
+"""
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.user import db
+from src.models.note import Note, compute_text_stats
+from src.models.tag import NoteTag
+from src.services.sqlite_backend import uses_sqlite
+from src.services.revisions import revision_history
+from src.services.tiering import note_tiering
+from src.services.tenancy import tenancy
+
+MAX_BULK_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 5000))
+CHUNK_SIZE = 1000
+
+
+def _chunks(items: List, size: int = CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _id_list(sql: str):
+    """Bind :ids as one array for `= ANY(:ids)` on PostgreSQL; SQLite gets an expanded IN list"""
+    if uses_sqlite():
+        return text(sql.replace('= ANY(:ids)', 'IN :ids')).bindparams(bindparam('ids', expanding=True))
+    return text(sql)
+
+
+def _is_id(value) -> bool:
+    """An integer id; bools are ints in Python but not valid ids"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _field_error(item: Dict) -> Optional[str]:
+    """Why an item's title or content cannot be stored, or None; absent (None) fields are allowed"""
+    title, content = item.get('title'), item.get('content')
+    if title is not None and not isinstance(title, str):
+        return 'Title must be a string'
+    if content is not None and not isinstance(content, str):
+        return 'Content must be a string'
+    if title is not None and len(title) > 200:
+        return 'Title must be at most 200 characters'
+    return None
+
+
+class BulkOperationError(ValueError):
+    """Raised when a bulk request as a whole is invalid"""
+
+
+class BulkNoteService:
+    def _check_size(self, items) -> None:
+        if not isinstance(items, list) or not items:
+            raise BulkOperationError('A non-empty list of items is required')
+        if len(items) > MAX_BULK_ITEMS:
+            raise BulkOperationError(f'At most {MAX_BULK_ITEMS} items are allowed per request')
+
+    def _existing_ids(self, table: str, ids: List[int]) -> set:
+        """Return the subset of ids present in table and owned by the user with one ANY() lookup"""
+        if not ids:
+            return set()
+        rows = db.session.execute(
+            _id_list(f'SELECT id FROM {table} WHERE id = ANY(:ids) AND {tenancy.owner_sql(f"{table}.user_id")}'),
+            {'ids': list(ids)}
+        )
+        return {row[0] for row in rows}
+
+    def _previous_versions(self, ids: List[int]):
+        """Title, content and updated_at of the user's notes before an update, for revision history"""
+        if not revision_history.enabled:
+            return None
+        rows = db.session.query(Note.id, Note.title, Note.content, Note.updated_at).filter(
+            Note.id.in_(ids), tenancy.owner_clause(Note.user_id)
+        )
+        return {row.id: {'title': row.title, 'content': row.content, 'updated_at': row.updated_at} for row in rows}
+
+    def create_notes(self, items: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Insert notes with multi-row INSERT ... RETURNING"""
+        self._check_size(items)
+        errors = []
+        rows, indexes = [], []
+        now = datetime.utcnow()
+        user_id = tenancy.current_user_id()
+
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get('title') or item.get('content') is None:
+                errors.append({'index': index, 'error': 'Title and content are required'})
+                continue
+            error = _field_error(item)
+            if error:
+                errors.append({'index': index, 'error': error})
+                continue
+            rows.append({
+                'user_id': user_id,
+                'title': item['title'],
+                'content': item['content'],
+                'created_at': now,
+                'updated_at': now,
+                **compute_text_stats(item['content'])
+            })
+            indexes.append(index)
+
+        created = []
+        if rows:
+            # insertmanyvalues renders batched multi-row VALUES and keeps RETURNING in input order
+            stmt = insert(Note.__table__).returning(
+                Note.__table__.c.id, Note.__table__.c.title, sort_by_parameter_order=True
+            )
+            result = db.session.execute(stmt, rows)
+            for index, row in zip(indexes, result):
+                created.append({
+                    'index': index,
+                    'id': row.id,
+                    'title': row.title,
+                    'created_at': now.isoformat(),
+                    'updated_at': now.isoformat()
+                })
+
+        return created, errors
+
+    def update_notes(self, items: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Update notes with WITH v AS (VALUES ...) UPDATE ... FROM v"""
+        self._check_size(items)
+        errors = []
+        pending = {}
+        now = datetime.utcnow()
+
+        for index, item in enumerate(items):
+            note_id = item.get('id') if isinstance(item, dict) else None
+            if not _is_id(note_id):
+                errors.append({'index': index, 'error': 'Integer note id is required'})
+                continue
+            if 'title' not in item and 'content' not in item:
+                errors.append({'index': index, 'id': note_id, 'error': 'No data provided'})
+                continue
+            error = _field_error(item)
+            if error:
+                errors.append({'index': index, 'id': note_id, 'error': error})
+                continue
+            if note_id in pending:
+                errors.append({'index': index, 'id': note_id, 'error': 'Duplicate note id in request'})
+                continue
+            pending[note_id] = (index, item.get('title'), item.get('content'))
+
+        # Archived notes get their content back first, so COALESCE keeps it rather than the preview
+        for chunk in _chunks(list(pending)):
+            note_tiering.rehydrate_many(chunk)
+
+        updated = []
+        for chunk in _chunks(list(pending.items())):
+            params = {'now': now}
+            values = []
+            for i, (note_id, (_, title, content)) in enumerate(chunk):
+                values.append(
+                    f'(CAST(:id_{i} AS BIGINT), CAST(:title_{i} AS VARCHAR(200)), CAST(:content_{i} AS TEXT), '
+                    f'CAST(:words_{i} AS INTEGER), CAST(:chars_{i} AS INTEGER), '
+                    f'CAST(:sentences_{i} AS INTEGER), CAST(:avg_{i} AS DOUBLE PRECISION))'
+                )
+                stats = compute_text_stats(content) if content is not None else {}
+                params.update({
+                    f'id_{i}': note_id, f'title_{i}': title, f'content_{i}': content,
+                    f'words_{i}': stats.get('word_count'), f'chars_{i}': stats.get('char_count'),
+                    f'sentences_{i}': stats.get('sentence_count'), f'avg_{i}': stats.get('avg_word_length')
+                })
+
+            previous = self._previous_versions([note_id for note_id, _ in chunk])
+
+            # A CTE with a column list names the VALUES columns on both PostgreSQL and SQLite
+            result = db.session.execute(text(
+                'WITH v (id, title, content, word_count, char_count, sentence_count, avg_word_length) '
+                f'AS (VALUES {", ".join(values)}) '
+                'UPDATE note '
+                'SET title = COALESCE(v.title, note.title), '
+                'content = COALESCE(v.content, note.content), '
+                'word_count = COALESCE(v.word_count, note.word_count), '
+                'char_count = COALESCE(v.char_count, note.char_count), '
+                'sentence_count = COALESCE(v.sentence_count, note.sentence_count), '
+                'avg_word_length = COALESCE(v.avg_word_length, note.avg_word_length), '
+                'updated_at = :now '
+                'FROM v '
+                f'WHERE note.id = v.id AND {tenancy.owner_sql()} '
+                'RETURNING note.id, note.title, note.content'
+            ), params)
+            changes = []
+            for row in result:
+                updated.append({
+                    'index': pending[row.id][0],
+                    'id': row.id,
+                    'title': row.title,
+                    'updated_at': now.isoformat()
+                })
+                if previous is not None:
+                    changes.append({'id': row.id, 'title': row.title, 'content': row.content,
+                                    'previous': previous.get(row.id)})
+            revision_history.record_many(changes)
+
+        found = {item['id'] for item in updated}
+        for note_id, (index, _, _) in pending.items():
+            if note_id not in found:
+                errors.append({'index': index, 'id': note_id, 'error': 'Note not found'})
+
+        updated.sort(key=lambda item: item['index'])
+        errors.sort(key=lambda item: item['index'])
+        return updated, errors
+
+    def delete_notes(self, ids: List[int]) -> Tuple[List[int], List[Dict]]:
+        """Delete notes with DELETE ... WHERE id = ANY(...)"""
+        self._check_size(ids)
+        errors = []
+        valid = []
+        for index, note_id in enumerate(ids):
+            if not _is_id(note_id):
+                errors.append({'index': index, 'error': 'Integer note id is required'})
+            else:
+                valid.append((index, note_id))
+
+        deleted = set()
+        for chunk in _chunks(valid):
+            result = db.session.execute(
+                _id_list(f'DELETE FROM note WHERE id = ANY(:ids) AND {tenancy.owner_sql()} RETURNING id'),
+                {'ids': [note_id for _, note_id in chunk]}
+            )
+            deleted.update(row[0] for row in result)
+
+        for index, note_id in valid:
+            if note_id not in deleted:
+                errors.append({'index': index, 'id': note_id, 'error': 'Note not found'})
+
+        errors.sort(key=lambda item: item['index'])
+        return sorted(deleted), errors
+
+    def assign_tags(self, assignments: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Upsert note_tag rows with INSERT ... ON CONFLICT DO NOTHING"""
+        self._check_size(assignments)
+        errors = []
+        pairs = []
+
+        for index, item in enumerate(assignments):
+            note_id = item.get('note_id') if isinstance(item, dict) else None
+            tag_id = item.get('tag_id') if isinstance(item, dict) else None
+            if not _is_id(note_id) or not _is_id(tag_id):
+                errors.append({'index': index, 'error': 'Integer note_id and tag_id are required'})
+                continue
+            pairs.append((index, note_id, tag_id))
+
+        note_ids = self._existing_ids('note', {note_id for _, note_id, _ in pairs})
+        tag_ids = self._existing_ids('tag', {tag_id for _, _, tag_id in pairs})
+
+        rows, seen = [], set()
+        now = datetime.utcnow()
+        for index, note_id, tag_id in pairs:
+            if note_id not in note_ids:
+                errors.append({'index': index, 'note_id': note_id, 'error': 'Note not found'})
+            elif tag_id not in tag_ids:
+                errors.append({'index': index, 'tag_id': tag_id, 'error': 'Tag not found'})
+            elif (note_id, tag_id) not in seen:
+                seen.add((note_id, tag_id))
+                rows.append({'note_id': note_id, 'tag_id': tag_id, 'created_at': now})
+
+        assigned = []
+        upsert = sqlite_insert if uses_sqlite() else pg_insert
+        for chunk in _chunks(rows):
+            stmt = upsert(NoteTag.__table__).values(chunk).on_conflict_do_nothing(
+                index_elements=['note_id', 'tag_id']
+            ).returning(NoteTag.__table__.c.note_id, NoteTag.__table__.c.tag_id)
+            assigned.extend({'note_id': row.note_id, 'tag_id': row.tag_id}
+                            for row in db.session.execute(stmt))
+
+        errors.sort(key=lambda item: item['index'])
+        return assigned, errors
+
+
+# Initialize service instance
+bulk_note_service = BulkNoteService()
@@ -0,0 +1,235 @@
+"""
+Versioned Read-Through Cache for NoteTaker
+In-process LRU tier with an optional shared tier, invalidated by per-table version counters
+(kept per tenant when a namespace callback is set)
+"""
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from src.services.structured_logging import get_logger
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = get_logger('services.cache')
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class LocalSharedBackend:
+    """In-process stand-in for a shared cache; same interface as RedisSharedBackend"""
+
+    def __init__(self):
+        self._values = LRUCache(max_entries=10000)
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._values.get(key)
+        return None if value is _MISSING else value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self._values.set(key, value, ttl)
+
+    def get_counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisSharedBackend:
+    """Shared cache tier backed by Redis so all instances see the same versions"""
+
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self._client.set(key, value, ex=max(int(ttl), 1))
+
+    def get_counter(self, key: str) -> int:
+        return int(self._client.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return self._client.incr(key)
+
+
+class VersionedCache:
+    """Read-through cache keyed by table, table version and entity key
+
+    Writers bump a table's version instead of deleting keys, so every entry
+    cached under the old version becomes unreachable at once. Entries also
+    expire after a TTL as a safety net for missed invalidations. With a
+    namespace callback each namespace (tenant) has its own table versions.
+    Values loaded while the skip_store callback returns True (e.g. read from
+    a lagging replica) are returned but not cached.
+    """
+
+    def __init__(self, local: LRUCache, shared=None, ttl: float = 300.0,
+                 version_refresh: float = 1.0, prefix: str = 'notetaker'):
+        self.local = local
+        self.shared = shared
+        self.ttl = ttl
+        self.version_refresh = version_refresh
+        self.prefix = prefix
+        self.namespace: Optional[Callable[[], Optional[str]]] = None
+        self.skip_store: Optional[Callable[[], bool]] = None
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0, 'errors': 0, 'not_stored': 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _table(self, table: str, namespace=_MISSING) -> str:
+        """Table name qualified by the namespace (current one unless given)"""
+        if namespace is _MISSING:
+            namespace = self.namespace() if self.namespace else None
+        return table if namespace is None else f'{table}@{namespace}'
+
+    def version(self, table: str) -> int:
+        """Current version of a table; shared versions are re-read at most every version_refresh seconds"""
+        now = time.monotonic()
+        cached = self._versions.get(table)
+        if cached and (self.shared is None or now - cached[1] < self.version_refresh):
+            return cached[0]
+
+        version = cached[0] if cached else 0
+        if self.shared is not None:
+            try:
+                version = self.shared.get_counter(f'{self.prefix}:version:{table}')
+            except Exception:
+                self._count('errors')
+        self._versions[table] = (version, now)
+        return version
+
+    def key(self, table: str, entity: Any) -> str:
+        return f'{self.prefix}:{table}:v{self.version(table)}:{entity}'
+
+    def get_or_load(self, table: str, entity: Any, loader: Callable[[], Any],
+                    ttl: Optional[float] = None, namespace=_MISSING) -> Any:
+        """Return the cached value or call loader; None results are not cached"""
+        key = self.key(self._table(table, namespace), entity)
+        value = self.local.get(key)
+        if value is not _MISSING:
+            self._count('hits')
+            return value
+
+        if self.shared is not None:
+            try:
+                raw = self.shared.get(key)
+                if raw is not None:
+                    value = json.loads(raw)
+                    self.local.set(key, value, ttl)
+                    self._count('shared_hits')
+                    return value
+            except Exception:
+                self._count('errors')
+
+        self._count('misses')
+        value = loader()
+        if value is not None and self.skip_store is not None and self.skip_store():
+            self._count('not_stored')
+        elif value is not None:
+            self.local.set(key, value, ttl)
+            if self.shared is not None:
+                try:
+                    self.shared.set(key, json.dumps(value), ttl or self.ttl)
+                except Exception:
+                    self._count('errors')
+        return value
+
+    def invalidate(self, *tables: str, namespace=_MISSING) -> None:
+        """Bump table versions so existing entries are no longer reachable"""
+        for table in (self._table(table, namespace) for table in tables):
+            version = self.version(table) + 1
+            if self.shared is not None:
+                try:
+                    version = self.shared.incr(f'{self.prefix}:version:{table}')
+                except Exception:
+                    self._count('errors')
+            self._versions[table] = (version, time.monotonic())
+            self._count('invalidations')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['shared_hits']) / lookups, 4) if lookups else 0.0
+        stats['entries'] = len(self.local)
+        stats['versions'] = {table: version for table, (version, _) in self._versions.items()}
+        stats['shared_backend'] = type(self.shared).__name__ if self.shared is not None else None
+        return stats
+
+
+def _build_shared_backend():
+    """Pick the shared tier from CACHE_BACKEND: none (default), local or redis"""
+    backend = os.environ.get('CACHE_BACKEND', 'none').lower()
+    if backend == 'redis':
+        url = os.environ.get('CACHE_REDIS_URL')
+        if REDIS_AVAILABLE and url:
+            return RedisSharedBackend(url)
+        logger.warning('CACHE_BACKEND=redis requires the redis package and CACHE_REDIS_URL; using in-process cache only')
+    elif backend == 'local':
+        return LocalSharedBackend()
+    return None
+
+
+# Initialize cache instance
+note_cache = VersionedCache(
+    LRUCache(
+        max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', 1024)),
+        ttl=float(os.environ.get('CACHE_TTL_SECONDS', 300))
+    ),
+    shared=_build_shared_backend(),
+    ttl=float(os.environ.get('CACHE_TTL_SECONDS', 300))
+)
@@ -0,0 +1,301 @@
+"""
+Note Change Feed for NoteTaker
+Fans note and tag mutations out to Server-Sent Events subscribers, either
+in-process or across instances through PostgreSQL LISTEN/NOTIFY; each
+subscriber only sees its own user's events
+"""
+import os
+import json
+import time
+import uuid
+import select
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import event, text
+from src.services.metrics import metrics, Gauge
+from src.services.structured_logging import get_logger
+from src.services.tenancy import tenancy
+
+logger = get_logger('services.change_feed')
+
+CHANNEL = 'note_changes'
+# Upper bound for ids carried by one bulk event; NOTIFY payloads must stay under 8000 bytes
+MAX_EVENT_IDS = 500
+
+_STAGED_KEY = 'change_feed_staged'
+_READY_KEY = 'change_feed_ready'
+
+
+def reset_event(reason: str) -> Dict:
+    """Tells a subscriber it may have missed events and should refetch /api/notes"""
+    return {'type': 'reset', 'reason': reason, 'at': datetime.utcnow().isoformat()}
+
+
+class Subscription:
+    """One SSE client's bounded queue; the publisher never blocks on a slow client"""
+
+    def __init__(self, feed: 'ChangeFeed', max_queue: int, user_id: Optional[int] = None):
+        self.feed = feed
+        self.max_queue = max_queue
+        self.user_id = user_id
+        self._events = deque()
+        self._cond = threading.Condition()
+        self._overflowed = False
+        self._waker = None  # (loop, asyncio.Event) of an event-loop reader, see next_event
+
+    def wants(self, item: Dict) -> bool:
+        return item['type'] == 'reset' or item.get('user_id') == self.user_id
+
+    def push(self, item: Dict) -> None:
+        with self._cond:
+            if self._overflowed:
+                return
+            if len(self._events) >= self.max_queue:
+                # Too far behind: drop the backlog and make the client resync instead
+                self._events.clear()
+                self._events.append(reset_event('overflow'))
+                self._overflowed = True
+                self.feed._counts['overflows'] += 1
+            else:
+                self._events.append(item)
+            self._cond.notify()
+            if self._waker is not None:
+                loop, ready = self._waker
+                try:
+                    loop.call_soon_threadsafe(ready.set)
+                except RuntimeError:
+                    pass  # The loop has shut down; the stream is gone with it
+
+    def _pop(self) -> Dict:
+        item = self._events.popleft()
+        if item['type'] == 'reset':
+            self._overflowed = False
+        return item
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        """Next event, or None if nothing arrived within timeout"""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+                if not self._events:
+                    return None
+            return self._pop()
+
+    async def next_event(self, timeout: float) -> Optional[Dict]:
+        """get() for a reader on an event loop: waits without holding a thread"""
+        with self._cond:
+            if self._events:
+                return self._pop()
+            if self._waker is None:
+                self._waker = (asyncio.get_running_loop(), asyncio.Event())
+            ready = self._waker[1]
+            ready.clear()
+        try:
+            await asyncio.wait_for(ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._cond:
+            return self._pop() if self._events else None
+
+    def close(self) -> None:
+        self.feed._unsubscribe(self)
+
+
+class ChangeFeed:
+    def __init__(self):
+        # memory: single process (local runs); postgres: LISTEN/NOTIFY across instances
+        self.backend = os.environ.get('CHANGE_FEED_BACKEND', 'memory').lower()
+        self.buffer_size = int(os.environ.get('CHANGE_FEED_BUFFER', 1000))
+        self.queue_size = int(os.environ.get('CHANGE_FEED_QUEUE_SIZE', 256))
+        self.heartbeat_seconds = float(os.environ.get('CHANGE_FEED_HEARTBEAT_SECONDS', 15))
+        self.max_stream_seconds = float(os.environ.get('CHANGE_FEED_MAX_SECONDS', 300))
+        # Event ids are "<epoch>-<seq>"; a new epoch per process means ids from
+        # another process (or before a restart) cannot be resumed and trigger a reset
+        self.epoch = uuid.uuid4().hex[:8]
+        self.session = None
+        self._seq = 0
+        self._buffer = deque(maxlen=self.buffer_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._listener = None
+        self._callbacks = []
+        self._counts = {'published': 0, 'overflows': 0, 'resets': 0, 'listener_errors': 0}
+
+    def init_app(self, app, session, engine) -> None:
+        self.session = session
+        event.listen(session, 'before_commit', self._before_commit)
+        event.listen(session, 'after_commit', self._after_commit)
+        event.listen(session, 'after_rollback', self._after_rollback)
+        metrics.register(Gauge(
+            'notetaker_change_feed_subscribers', 'Open /api/notes/stream connections',
+            (), lambda: [((), len(self._subscribers))]
+        ))
+        if self.backend == 'postgres':
+            url = os.environ.get('CHANGE_FEED_LISTEN_URL') or \
+                engine.url.set(drivername='postgresql').render_as_string(hide_password=False)
+            self._listener = threading.Thread(target=self._listen, args=(url,), name='change-feed-listener', daemon=True)
+            self._listener.start()
+
+    def add_listener(self, callback) -> None:
+        """Call callback(event) for every delivered event, including resets (e.g. to keep indexes current)"""
+        self._callbacks.append(callback)
+
+    def _notify_listeners(self, item: Dict) -> None:
+        for callback in self._callbacks:
+            try:
+                callback(item)
+            except Exception:
+                logger.exception('Change feed listener failed', extra={'event_type': item.get('type')})
+
+    # Publishing: events are staged on the session and only leave if it commits
+
+    def record(self, event_type: str, note=None, note_id: Optional[int] = None, **data) -> None:
+        """Stage an event on the current transaction
+
+        Pass the Note instance for new notes; its id is read after the commit's flush.
+        Events belong to the requesting user unless user_id is given.
+        """
+        data.setdefault('user_id', tenancy.current_user_id())
+        self.session.info.setdefault(_STAGED_KEY, []).append((event_type, note, note_id, data))
+
+    def record_many(self, event_type: str, note_ids: List[int], **data) -> None:
+        """Stage one event for a bulk change; oversized id lists are replaced by a count"""
+        if not note_ids:
+            return
+        if len(note_ids) > MAX_EVENT_IDS:
+            self.record(event_type, count=len(note_ids), **data)
+        else:
+            self.record(event_type, note_ids=list(note_ids), count=len(note_ids), **data)
+
+    def _before_commit(self, session) -> None:
+        staged = session.info.pop(_STAGED_KEY, None)
+        if not staged:
+            return
+        if any(note is not None for _, note, _, _ in staged):
+            session.flush()
+        ready = []
+        for event_type, note, note_id, data in staged:
+            item = {'type': event_type, 'at': datetime.utcnow().isoformat(), **data}
+            if note is not None:
+                item['note_id'] = note.id
+                item['user_id'] = note.user_id
+                item.setdefault('title', note.title)
+            elif note_id is not None:
+                item['note_id'] = note_id
+            ready.append(item)
+
+        if self.backend == 'postgres':
+            # NOTIFY is transactional: listeners only see it if this commit succeeds
+            for item in ready:
+                session.execute(text('SELECT pg_notify(:channel, :payload)'),
+                                {'channel': CHANNEL, 'payload': json.dumps(item, default=str)})
+        else:
+            session.info[_READY_KEY] = ready
+
+    def _after_commit(self, session) -> None:
+        for item in session.info.pop(_READY_KEY, None) or []:
+            self._dispatch(item)
+
+    def _after_rollback(self, session) -> None:
+        session.info.pop(_STAGED_KEY, None)
+        session.info.pop(_READY_KEY, None)
+
+    def _dispatch(self, item: Dict) -> None:
+        with self._lock:
+            self._seq += 1
+            item = {'id': f'{self.epoch}-{self._seq}', **item}
+            self._buffer.append((self._seq, item))
+            subscribers = list(self._subscribers)
+            self._counts['published'] += 1
+        self._notify_listeners(item)
+        for subscriber in subscribers:
+            if subscriber.wants(item):
+                subscriber.push(item)
+
+    def _broadcast_reset(self, reason: str) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._counts['resets'] += 1
+        self._notify_listeners(reset_event(reason))
+        for subscriber in subscribers:
+            subscriber.push(reset_event(reason))
+
+    # Subscribing
+
+    def subscribe(self, last_event_id: Optional[str] = None, user_id: Optional[int] = None) -> Subscription:
+        """Register a client for user_id's events, replaying buffered ones after last_event_id"""
+        subscription = Subscription(self, self.queue_size, user_id)
+        with self._lock:
+            if last_event_id:
+                epoch, _, seq = last_event_id.partition('-')
+                oldest = self._buffer[0][0] if self._buffer else self._seq + 1
+                if epoch != self.epoch or not seq.isdigit() or int(seq) < oldest - 1:
+                    subscription.push(reset_event('resume_unavailable'))
+                else:
+                    for buffered_seq, item in self._buffer:
+                        if buffered_seq > int(seq) and subscription.wants(item):
+                            subscription.push(item)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    # PostgreSQL listener
+
+    def _listen(self, url: str) -> None:
+        """Relay NOTIFY payloads to local subscribers, reconnecting with backoff"""
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        backoff = 1.0
+        connected_before = False
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(url)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CHANNEL}')
+                if connected_before:
+                    # Notifications sent while disconnected are lost
+                    self._broadcast_reset('reconnected')
+                connected_before = True
+                backoff = 1.0
+                while True:
+                    if select.select([conn], [], [], self.heartbeat_seconds) == ([], [], []):
+                        with conn.cursor() as cursor:
+                            cursor.execute('SELECT 1')  # Detect dead connections
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            self._dispatch(json.loads(notify.payload))
+                        except ValueError:
+                            logger.warning('Ignoring malformed change notification')
+            except Exception as e:
+                self._counts['listener_errors'] += 1
+                logger.warning('Change feed listener error: %s', e)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def stats(self) -> Dict:
+        return {
+            'backend': self.backend,
+            'subscribers': len(self._subscribers),
+            'buffered': len(self._buffer),
+            'listener_alive': self._listener.is_alive() if self._listener else None,
+            **self._counts
+        }
+
+
+# Initialize feed instance
+change_feed = ChangeFeed()
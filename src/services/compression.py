@@ -0,0 +1,217 @@
+"""
+Response Compression for NoteTaker
+Negotiates gzip, brotli or zstd based on Accept-Encoding
+"""
+import os
+import gzip
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Payloads that are already compressed and gain nothing from another pass
+SKIP_MIMETYPES = {
+    'application/pdf',
+    'application/zip',
+    'application/gzip',
+    'application/x-gzip',
+    'application/octet-stream',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'text/event-stream',
+}
+SKIP_MIMETYPE_PREFIXES = ('image/', 'audio/', 'video/', 'font/woff')
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into a {coding: q} mapping"""
+    codings = {}
+    if not header:
+        return codings
+
+    for part in header.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, params = part.partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[name.strip().lower()] = q
+    return codings
+
+
+def available_encodings() -> List[str]:
+    """Encodings supported by this process, most preferred first"""
+    encodings = []
+    if BROTLI_AVAILABLE:
+        encodings.append('br')
+    if ZSTD_AVAILABLE:
+        encodings.append('zstd')
+    encodings.append('gzip')
+    return encodings
+
+
+def choose_encoding(header: Optional[str], supported: Optional[List[str]] = None) -> Optional[str]:
+    """Pick the best supported encoding the client accepts, or None for identity"""
+    accepted = parse_accept_encoding(header)
+    if not accepted:
+        return None
+
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for encoding in supported or available_encodings():
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Compressor:
+    """Incremental compressor with a common compress/flush/finish interface"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._obj = brotli.Compressor(quality=min(level, 11))
+        elif encoding == 'zstd':
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            # wbits=31 produces a gzip container
+            self._obj = zlib.compressobj(min(level, 9), zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._obj.process(chunk)
+        return self._obj.compress(chunk)
+
+    def flush(self) -> bytes:
+        if self.encoding == 'br':
+            return self._obj.flush()
+        if self.encoding == 'zstd':
+            return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+def compress_bytes(data: bytes, encoding: str, level: int) -> bytes:
+    """Compress a complete payload in one call"""
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=min(level, 9), mtime=0)
+    compressor = _Compressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+class ResponseCompressor:
+    """Flask extension that compresses eligible responses after each request"""
+
+    def __init__(self, app=None):
+        self.min_size = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+        self.level = int(os.environ.get('COMPRESSION_LEVEL', 6))
+        self.enabled = os.environ.get('COMPRESSION_ENABLED', 'true').lower() != 'false'
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', self.min_size)
+        self.level = app.config.get('COMPRESSION_LEVEL', self.level)
+        self.enabled = app.config.get('COMPRESSION_ENABLED', self.enabled)
+        app.after_request(self.after_request)
+
+    def _is_compressible(self, response) -> bool:
+        mimetype = response.mimetype or ''
+        if mimetype in SKIP_MIMETYPES or mimetype.startswith(SKIP_MIMETYPE_PREFIXES):
+            return False
+        return mimetype.startswith('text/') or mimetype in (
+            'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'
+        )
+
+    def after_request(self, response):
+        """Compress the response body if the client and payload allow it"""
+        if not self.enabled:
+            return response
+
+        from flask import request
+
+        # Always advertise that the representation varies by encoding
+        if self._is_compressible(response):
+            response.vary.add('Accept-Encoding')
+
+        if (response.status_code != 200
+                or 'Content-Encoding' in response.headers
+                or not self._is_compressible(response)
+                or request.method == 'HEAD'):
+            return response
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if not encoding:
+            return response
+
+        length = response.content_length
+        if length is not None and length < self.min_size:
+            return response
+
+        if response.is_streamed or response.direct_passthrough:
+            # Generators are flushed per chunk so streamed output is not held back;
+            # file bodies are compressed as one continuous stream
+            response.response = self._stream(
+                response.response, encoding, flush=not response.direct_passthrough
+            )
+            response.direct_passthrough = False
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(compress_bytes(data, encoding, self.level))
+
+        response.headers['Content-Encoding'] = encoding
+        # Byte ranges no longer line up with the encoded body
+        response.headers.pop('Accept-Ranges', None)
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak=weak)
+        return response
+
+    def _stream(self, chunks: Iterable[bytes], encoding: str, flush: bool = True):
+        """Compress a streamed body chunk by chunk"""
+        compressor = _Compressor(encoding, self.level)
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                data = compressor.compress(chunk)
+                if flush:
+                    data += compressor.flush()
+                if data:
+                    yield data
+            tail = compressor.finish()
+            if tail:
+                yield tail
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close:
+                close()
+
+
+# Initialize extension instance
+response_compressor = ResponseCompressor()
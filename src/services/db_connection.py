@@ -0,0 +1,151 @@
+"""
+Database Connection Management for NoteTaker
+Chooses pool settings for serverless or long-running deployments and tracks connection health
+"""
+import os
+import time
+import threading
+from typing import Dict
+from sqlalchemy import event, text
+from sqlalchemy.pool import NullPool
+from src.services.sqlite_backend import is_sqlite_url, sqlite_engine_options
+
+CONNECTION_MODES = ('serverless', 'pooled')
+
+
+def resolve_connection_mode() -> str:
+    """DB_CONNECTION_MODE if set, otherwise serverless on Vercel and pooled elsewhere"""
+    mode = os.environ.get('DB_CONNECTION_MODE', '').lower()
+    if mode in CONNECTION_MODES:
+        return mode
+    return 'serverless' if os.environ.get('VERCEL') else 'pooled'
+
+
+def statement_timeout_ms() -> int:
+    return int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000))
+
+
+def build_engine_options(mode: str, database_url: str) -> Dict:
+    """SQLAlchemy engine options for the given connection mode"""
+    if is_sqlite_url(database_url):
+        return sqlite_engine_options(database_url)
+
+    connect_args = {'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5))}
+    if database_url.startswith('postgresql+psycopg:'):
+        # psycopg 3 prepares repeated statements server-side, which pgbouncer transaction mode breaks
+        connect_args['prepare_threshold'] = None
+
+    if mode == 'serverless':
+        # Every invocation may run on a fresh instance: don't hold idle connections open
+        # against Supabase, and let the pgbouncer pooler (port 6543) do the pooling.
+        # Statement timeouts are applied per transaction with SET LOCAL instead of
+        # startup options, which transaction-mode pgbouncer rejects.
+        return {
+            'poolclass': NullPool,
+            'connect_args': connect_args,
+        }
+
+    timeout = statement_timeout_ms()
+    if timeout:
+        connect_args['options'] = f'-c statement_timeout={timeout}'
+    return {
+        'pool_pre_ping': True,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'connect_args': connect_args,
+    }
+
+
+class ConnectionMonitor:
+    """Records connection setup latency and pool usage for /api/status"""
+
+    def __init__(self):
+        self.mode = None
+        self.engine = None
+        self._lock = threading.Lock()
+        self._connects = 0
+        self._connect_total_ms = 0.0
+        self._connect_max_ms = 0.0
+        self._last_connect_ms = None
+        self._warmup = None
+
+    def install(self, engine, mode: str) -> None:
+        self.engine = engine
+        self.mode = mode
+        event.listen(engine, 'do_connect', self._before_connect)
+        event.listen(engine, 'connect', self._after_connect)
+
+        timeout = statement_timeout_ms()
+        if mode == 'serverless' and timeout and engine.dialect.name == 'postgresql':
+            @event.listens_for(engine, 'begin')
+            def _set_statement_timeout(conn):
+                conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+    def _before_connect(self, dialect, conn_rec, cargs, cparams):
+        conn_rec.info['connect_started'] = time.perf_counter()
+
+    def _after_connect(self, dbapi_connection, conn_rec):
+        started = conn_rec.info.pop('connect_started', None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._connects += 1
+            self._connect_total_ms += elapsed_ms
+            self._connect_max_ms = max(self._connect_max_ms, elapsed_ms)
+            self._last_connect_ms = elapsed_ms
+
+    def warm_up(self, app, connections: int = 1) -> None:
+        """Open connections ahead of the first request (DB_WARMUP)"""
+        started = time.perf_counter()
+        try:
+            with app.app_context():
+                held = [self.engine.connect() for _ in range(max(connections, 1))]
+                for conn in held:
+                    conn.execute(text('SELECT 1'))
+                    conn.close()
+            self._warmup = {'ok': True, 'connections': len(held)}
+        except Exception as e:
+            app.logger.error(f"Database warm-up failed: {e}")
+            self._warmup = {'ok': False, 'error': str(e)[:100]}
+        self._warmup['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    def pool_stats(self) -> Dict:
+        pool = self.engine.pool if self.engine is not None else None
+        if pool is None or isinstance(pool, NullPool) or not hasattr(pool, 'checkedout'):
+            return {'type': type(pool).__name__ if pool is not None else None}
+
+        size = pool.size()
+        checked_out = pool.checkedout()
+        capacity = size + max(pool._max_overflow, 0)
+        return {
+            'type': type(pool).__name__,
+            'size': size,
+            'checked_in': pool.checkedin(),
+            'checked_out': checked_out,
+            'overflow': pool.overflow(),
+            'capacity': capacity,
+            'saturation': round(checked_out / capacity, 3) if capacity else None
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            connects = self._connects
+            stats = {
+                'mode': self.mode,
+                'statement_timeout_ms': statement_timeout_ms(),
+                'connects': connects,
+                'connect_avg_ms': round(self._connect_total_ms / connects, 2) if connects else None,
+                'connect_max_ms': round(self._connect_max_ms, 2) if connects else None,
+                'connect_last_ms': round(self._last_connect_ms, 2) if self._last_connect_ms is not None else None,
+            }
+        stats['pool'] = self.pool_stats()
+        if self._warmup is not None:
+            stats['warmup'] = self._warmup
+        return stats
+
+
+# Initialize monitor instance
+connection_monitor = ConnectionMonitor()
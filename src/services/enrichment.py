@@ -0,0 +1,176 @@
+"""
+Write-Behind Enrichment Pipeline for NoteTaker
+Re-tags, refreshes suggestions and re-translates notes in the background once
+they have been idle for ENRICHMENT_IDLE_SECONDS, coalescing bursts of edits
+into a single run per note
+"""
+import os
+import time
+import heapq
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple
+from sqlalchemy import update
+from src.models.note import Note, db
+from src.services.ai_analysis import ai_analysis_service
+from src.services.translation import translation_service, TRANSLATION_FAILED
+from src.services.cache import note_cache
+from src.services.change_feed import change_feed
+from src.services.tenancy import tenancy
+from src.services.llm_ledger import llm_ledger
+from src.services.metrics import metrics, Gauge
+from src.services.structured_logging import get_logger
+
+logger = get_logger('services.enrichment')
+
+ALL_TASKS = ('tags', 'suggestions', 'translation')
+
+
+class EnrichmentPipeline:
+    def __init__(self):
+        # Off by default: every idle note costs model calls, and serverless
+        # instances do not keep background threads alive between requests
+        self.enabled = os.environ.get('ENRICHMENT_ENABLED', 'false').lower() == 'true'
+        self.idle_seconds = float(os.environ.get('ENRICHMENT_IDLE_SECONDS', 30))
+        self.max_pending = int(os.environ.get('ENRICHMENT_MAX_PENDING', 10000))
+        tasks = os.environ.get('ENRICHMENT_TASKS', ','.join(ALL_TASKS))
+        self.tasks = {task.strip() for task in tasks.split(',') if task.strip() in ALL_TASKS}
+        self.app = None
+        self._due: Dict[int, float] = {}  # note_id -> monotonic time it becomes idle
+        self._heap: List[Tuple[float, int]] = []  # may hold stale entries; _due is authoritative
+        self._cond = threading.Condition()
+        self._worker = None
+        self._counts = {'published': 0, 'coalesced': 0, 'dropped': 0,
+                        'enriched': 0, 'skipped': 0, 'failed': 0}
+
+    def init_app(self, app) -> None:
+        self.app = app
+        metrics.register(Gauge(
+            'notetaker_enrichment_pending', 'Notes waiting to go idle before background enrichment',
+            (), lambda: [((), len(self._due))]
+        ))
+
+    def publish(self, note_id: int) -> None:
+        """Record that a note changed; enrichment runs once it has been idle long enough"""
+        if not self.enabled or self.app is None:
+            return
+        with self._cond:
+            if note_id in self._due:
+                self._counts['coalesced'] += 1
+            elif len(self._due) >= self.max_pending:
+                self._counts['dropped'] += 1
+                return
+            due = time.monotonic() + self.idle_seconds
+            self._due[note_id] = due
+            heapq.heappush(self._heap, (due, note_id))
+            self._counts['published'] += 1
+            self._cond.notify()
+        self._ensure_worker()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='enrichment', daemon=True)
+                self._worker.start()
+
+    def _next_idle_note(self) -> int:
+        """Block until some note has been idle for idle_seconds and return its id"""
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, note_id = self._heap[0]
+                if self._due.get(note_id) != due:
+                    heapq.heappop(self._heap)  # superseded by a later edit
+                    continue
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                del self._due[note_id]
+                return note_id
+
+    def _run(self) -> None:
+        while True:
+            note_id = self._next_idle_note()
+            try:
+                self.enrich(note_id)
+            except Exception:
+                self._counts['failed'] += 1
+                logger.exception('Enrichment failed', extra={'note_id': note_id})
+
+    def enrich(self, note_id: int) -> bool:
+        """Compute and store enrichment for one note; False if it was deleted or edited meanwhile"""
+        with self.app.app_context():
+            note = db.session.get(Note, note_id)
+            if note is None:
+                return False
+            title, content, stats, edited_at = note.title, note.content, note.text_stats, note.updated_at
+            owner = note.user_id
+            # Release the connection while waiting on the model
+            db.session.remove()
+
+            values = {}
+            with llm_ledger.note_context(note_id):
+                if 'tags' in self.tasks and 'suggestions' in self.tasks:
+                    values['auto_tags'], values['ai_suggestions'] = \
+                        ai_analysis_service.analyze_note_content(title, content, stats)
+                elif 'tags' in self.tasks:
+                    values['auto_tags'] = ai_analysis_service.generate_auto_tags(title, content)
+                elif 'suggestions' in self.tasks:
+                    values['ai_suggestions'] = ai_analysis_service.generate_writing_suggestions(title, content, stats)
+                if 'auto_tags' in values or 'ai_suggestions' in values:
+                    values['last_ai_analysis'] = datetime.utcnow()
+
+                if 'translation' in self.tasks:
+                    title_zh = translation_service.translate_to_chinese(title)
+                    content_zh = translation_service.translate_to_chinese(content)
+                    if TRANSLATION_FAILED not in (title_zh, content_zh):
+                        values['title_zh'] = title_zh
+                        values['content_zh'] = content_zh
+
+            if not values:
+                self._counts['skipped'] += 1
+                return False
+
+            # Only write if the note was not edited while the model was running (that
+            # edit has queued its own run); keep updated_at so ordering and analyze-all's staleness
+            # check are unaffected. On PostgreSQL this needs database_migration_updated_at.sql, as the
+            # original trigger sets updated_at = NOW() on every update
+            try:
+                result = db.session.execute(
+                    update(Note)
+                    .where(Note.id == note_id, Note.updated_at == edited_at)
+                    .values(**values, updated_at=Note.updated_at)
+                )
+                if result.rowcount:
+                    change_feed.record('note.updated', note_id=note_id, fields=sorted(values), user_id=owner)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            if result.rowcount == 0:
+                self._counts['skipped'] += 1
+                return False
+            note_cache.invalidate('notes', namespace=tenancy.cache_namespace(owner))
+            self._counts['enriched'] += 1
+            return True
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'enabled': self.enabled,
+                'idle_seconds': self.idle_seconds,
+                'tasks': sorted(self.tasks),
+                'pending': len(self._due),
+                **self._counts
+            }
+
+
+# Initialize pipeline instance
+enrichment_pipeline = EnrichmentPipeline()
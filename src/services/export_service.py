@@ -1,40 +1,53 @@
 """
 Export Service for NoteTaker
 Supports PDF, Markdown, and DOCX export functionality
+
+reportlab and python-docx are imported on first use so that importing this
+module (and the routes that reference it) stays cheap on cold start.
 """
-import os
 import io
 from datetime import datetime
 from typing import List, Dict, Optional
-import markdown
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_LEFT, TA_CENTER
-from reportlab.lib.colors import HexColor
 import zipfile
-import tempfile
+from src.services.structured_logging import get_logger
+
+logger = get_logger('services.export')
+_docx_available = None
+
 
-try:
-    from docx import Document
-    from docx.shared import Inches
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-    print("python-docx not installed. DOCX export will be unavailable.")
+def docx_available() -> bool:
+    """Whether python-docx can be imported; checked once on first use"""
+    global _docx_available
+    if _docx_available is None:
+        try:
+            import docx  # noqa: F401
+            _docx_available = True
+        except ImportError:
+            _docx_available = False
+            logger.warning('python-docx not installed. DOCX export will be unavailable.')
+    return _docx_available
 
 class ExportService:
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
+        self.styles = None
     
     def _setup_custom_styles(self):
-        """Setup custom styles for PDF generation"""
+        """Setup custom styles for PDF generation (built on the first PDF export)"""
+        if self.styles is not None:
+            return
+
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.lib.colors import HexColor
+
+        # self.styles is assigned last: concurrent first exports check it, so it must not be
+        # visible before the custom styles below exist
+        styles = getSampleStyleSheet()
+
         # Title style
         self.title_style = ParagraphStyle(
             'CustomTitle',
-            parent=self.styles['Heading1'],
+            parent=styles['Heading1'],
             fontSize=18,
             spaceAfter=20,
             textColor=HexColor('#2C3E50'),
@@ -44,7 +57,7 @@ class ExportService:
         # Note title style
         self.note_title_style = ParagraphStyle(
             'NoteTitle',
-            parent=self.styles['Heading2'],
+            parent=styles['Heading2'],
             fontSize=14,
             spaceBefore=15,
             spaceAfter=10,
@@ -54,7 +67,7 @@ class ExportService:
         # Content style
         self.content_style = ParagraphStyle(
             'Content',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=11,
             spaceAfter=12,
             leftIndent=20
@@ -63,11 +76,12 @@ class ExportService:
         # Metadata style
         self.meta_style = ParagraphStyle(
             'Metadata',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=9,
             textColor=HexColor('#7F8C8D'),
             spaceAfter=8
         )
+        self.styles = styles
     
     def export_to_markdown(self, notes: List[Dict], include_translations: bool = True) -> str:
         """Export notes to Markdown format"""
@@ -131,6 +145,10 @@ class ExportService:
     
     def export_to_pdf(self, notes: List[Dict], include_translations: bool = True) -> bytes:
         """Export notes to PDF format"""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+        self._setup_custom_styles()
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter)
         story = []
@@ -200,9 +218,12 @@ class ExportService:
     
     def export_to_docx(self, notes: List[Dict], include_translations: bool = True) -> Optional[bytes]:
         """Export notes to DOCX format"""
-        if not DOCX_AVAILABLE:
+        if not docx_available():
             raise ImportError("python-docx is required for DOCX export")
         
+        from docx import Document
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+
         doc = Document()
         
         # Title
@@ -293,16 +314,23 @@ class ExportService:
                         content = self.export_to_pdf(notes, include_translations)
                         zip_file.writestr(f"notes_export_{timestamp}.pdf", content)
                     
-                    elif format_type.lower() == 'docx' and DOCX_AVAILABLE:
+                    elif format_type.lower() == 'docx' and docx_available():
                         content = self.export_to_docx(notes, include_translations)
                         if content:
                             zip_file.writestr(f"notes_export_{timestamp}.docx", content)
                 
                 except Exception as e:
-                    print(f"Error exporting {format_type}: {e}")
+                    logger.exception('Error exporting %s', format_type)
         
         zip_buffer.seek(0)
         return zip_buffer.getvalue()
 
-# Initialize service instance
-export_service = ExportService()
\ No newline at end of file
+_export_service = None
+
+
+def get_export_service() -> ExportService:
+    """Return the shared ExportService, creating it on first use"""
+    global _export_service
+    if _export_service is None:
+        _export_service = ExportService()
+    return _export_service
\ No newline at end of file
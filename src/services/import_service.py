@@ -0,0 +1,382 @@
+"""
+Streaming Note Import Service
+Parses JSONL or exported Markdown and loads it through PostgreSQL COPY
+(batched inserts into the same staging table on SQLite)
+"""
+import os
+import io
+import re
+import csv
+import json
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from src.models.user import db
+from src.models.note import compute_text_stats
+from src.services.sqlite_backend import uses_sqlite, SQLITE_NOW
+from src.services.tenancy import tenancy
+
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+MAX_REPORTED_ERRORS = 100
+
+NOTE_HEADING = re.compile(r'^## \d+\. (.*)$')
+TAG_TOKEN = re.compile(r'`([^`]+)`')
+
+STAGING_COLUMNS = [
+    'seq', 'title', 'content', 'title_zh', 'content_zh',
+    'auto_tags', 'tags', 'created_at', 'updated_at',
+    'word_count', 'char_count', 'sentence_count', 'avg_word_length'
+]
+
+
+def _owner_value(user_id: Optional[int]) -> str:
+    """SQL literal for the imported rows' user_id"""
+    return 'NULL' if user_id is None else str(int(user_id))
+
+
+class ImportFormatError(ValueError):
+    """Raised when a single record cannot be parsed"""
+
+
+def _timestamp(record: Dict, field: str) -> str:
+    """ISO 8601 value of a record's timestamp in UTC ('' when absent), so the merge's casts cannot fail
+
+    Naive values are taken as UTC, as written by Note.to_dict() and the Markdown export.
+    """
+    value = record.get(field)
+    if value is None or value == '':
+        return ''
+    try:
+        if not isinstance(value, str):
+            raise ValueError
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ImportFormatError(f"Line {record.get('line')}: invalid {field} {str(value)[:40]!r}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def _strip_trailing(lines: List[str]) -> str:
+    """Drop the blank lines and '---' separator the Markdown export appends"""
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if lines and lines[-1].strip() == '---':
+        lines.pop()
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return '\n'.join(lines)
+
+
+def parse_jsonl(lines: Iterable[str]) -> Iterator[Dict]:
+    """Yield one note dict per JSON line; bad lines yield an ImportFormatError"""
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ImportFormatError(f'Line {line_no}: {e.msg}')
+            continue
+        if not isinstance(record, dict):
+            yield ImportFormatError(f'Line {line_no}: expected a JSON object')
+            continue
+
+        # Accept both tag names and the {'name': ...} dicts produced by Note.to_dict()
+        tags = [tag.get('name') if isinstance(tag, dict) else tag for tag in record.get('tags') or []]
+        record['tags'] = [tag for tag in tags if isinstance(tag, str)]
+        record['line'] = line_no
+        yield record
+
+
+def parse_markdown(lines: Iterable[str]) -> Iterator[Dict]:
+    """Yield notes from the layout written by ExportService.export_to_markdown"""
+    note = None
+    section = None
+
+    def finish(current):
+        return {
+            'title': current['title'],
+            'content': _strip_trailing(current['content']),
+            'title_zh': current['title_zh'],
+            'content_zh': _strip_trailing(current['content_zh']) or None,
+            'auto_tags': current['auto_tags'],
+            'tags': [],
+            'created_at': current['created_at'],
+            'updated_at': current['updated_at'],
+            'line': current['line']
+        }
+
+    for line_no, raw in enumerate(lines, 1):
+        line = raw.rstrip('\r\n')
+        heading = NOTE_HEADING.match(line)
+        if heading:
+            if note:
+                yield finish(note)
+            note = {
+                'title': heading.group(1).strip(), 'content': [], 'content_zh': [],
+                'title_zh': None, 'auto_tags': [], 'created_at': None,
+                'updated_at': None, 'line': line_no
+            }
+            section = 'meta'
+            continue
+
+        if note is None:
+            continue
+
+        if line == '### Content':
+            section = 'content'
+        elif line == '### Chinese Translation':
+            section = 'translation'
+        elif section == 'meta':
+            if line.startswith('**Created:**'):
+                note['created_at'] = line[len('**Created:**'):].strip()
+            elif line.startswith('**Last Updated:**'):
+                note['updated_at'] = line[len('**Last Updated:**'):].strip()
+            elif line.startswith('**Tags:**'):
+                note['auto_tags'] = TAG_TOKEN.findall(line)
+        elif section == 'content':
+            note['content'].append(line)
+        elif section == 'translation':
+            if line.startswith('**Title (中文):**'):
+                note['title_zh'] = line[len('**Title (中文):**'):].strip()
+            elif line.startswith('**Content (中文):**'):
+                section = 'content_zh'
+                note['content_zh'].append(line[len('**Content (中文):**'):].lstrip())
+        elif section == 'content_zh':
+            note['content_zh'].append(line)
+
+    if note:
+        yield finish(note)
+
+
+PARSERS = {
+    'jsonl': parse_jsonl,
+    'markdown': parse_markdown,
+}
+
+
+class NoteImporter:
+    """Loads parsed notes into a staging table with COPY, then merges set-based"""
+
+    def __init__(self, batch_size: int = IMPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def _create_staging(self, cursor, sqlite: bool) -> None:
+        if sqlite:
+            # SQLite has no ON COMMIT DROP; the table lives in the connection's temp schema
+            cursor.execute('DROP TABLE IF EXISTS temp.note_import_staging')
+        cursor.execute(
+            'CREATE TEMP TABLE note_import_staging ('
+            'seq BIGINT, note_id BIGINT, title TEXT, content TEXT, '
+            'title_zh TEXT, content_zh TEXT, auto_tags TEXT, tags TEXT, '
+            'created_at TEXT, updated_at TEXT, word_count INTEGER, char_count INTEGER, '
+            'sentence_count INTEGER, avg_word_length DOUBLE PRECISION)'
+            + ('' if sqlite else ' ON COMMIT DROP')
+        )
+
+    def _copy_batch(self, cursor, rows: List[List], sqlite: bool) -> None:
+        if sqlite:
+            placeholders = ', '.join('?' for _ in STAGING_COLUMNS)
+            cursor.executemany(
+                f'INSERT INTO note_import_staging ({", ".join(STAGING_COLUMNS)}) VALUES ({placeholders})', rows
+            )
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f'COPY note_import_staging ({", ".join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+
+    def _to_row(self, seq: int, record: Dict) -> List:
+        title = record.get('title')
+        content = record.get('content')
+        if not isinstance(title, str) or not title.strip() or not isinstance(content, str):
+            raise ImportFormatError(f"Line {record.get('line')}: title and content are required")
+
+        created_at = _timestamp(record, 'created_at')
+        updated_at = _timestamp(record, 'updated_at')
+        auto_tags = [tag for tag in record.get('auto_tags') or [] if isinstance(tag, str)]
+        stats = compute_text_stats(content)
+        return [
+            seq,
+            title.strip(),
+            content,
+            record.get('title_zh') or '',
+            record.get('content_zh') or '',
+            json.dumps(auto_tags) if auto_tags else '',
+            json.dumps(record.get('tags') or []),
+            created_at,
+            updated_at,
+            stats['word_count'],
+            stats['char_count'],
+            stats['sentence_count'],
+            stats['avg_word_length'],
+        ]
+
+    def _merge_sqlite(self, cursor, user_id: Optional[int]) -> Dict:
+        """SQLite version of _merge: json_each instead of jsonb, no sequences"""
+        owner = _owner_value(user_id)
+        # No conflict target: either uq_tag_user_name or uq_tag_shared_name can fire
+        cursor.execute(
+            'INSERT INTO tag (user_id, name, color, created_at) '
+            f"SELECT DISTINCT {owner}, lower(trim(t.value)), '#6B73FF', {SQLITE_NOW} "
+            'FROM note_import_staging s, json_each(s.tags) AS t '
+            "WHERE trim(t.value) <> '' "
+            'ON CONFLICT DO NOTHING'
+        )
+        tags_created = cursor.rowcount
+        # The tag insert took the database write lock, so no other writer can claim these ids
+        cursor.execute(
+            'UPDATE note_import_staging SET note_id = seq + 1 + max('
+            '(SELECT COALESCE(MAX(id), 0) FROM note), '
+            "(SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'note'))"
+        )
+        cursor.execute(
+            'INSERT INTO note (id, user_id, title, content, title_zh, content_zh, auto_tags, created_at, updated_at, '
+            'word_count, char_count, sentence_count, avg_word_length) '
+            f'SELECT note_id, {owner}, substr(title, 1, 200), content, '
+            "substr(NULLIF(title_zh, ''), 1, 200), NULLIF(content_zh, ''), NULLIF(auto_tags, ''), "
+            f"COALESCE(strftime('%Y-%m-%d %H:%M:%f', NULLIF(created_at, '')), {SQLITE_NOW}), "
+            f"COALESCE(strftime('%Y-%m-%d %H:%M:%f', NULLIF(updated_at, '')), {SQLITE_NOW}), "
+            'word_count, char_count, sentence_count, avg_word_length '
+            'FROM note_import_staging ORDER BY seq'
+        )
+        notes_created = cursor.rowcount
+        cursor.execute(
+            'INSERT INTO note_tag (note_id, tag_id, created_at) '
+            f'SELECT DISTINCT s.note_id, t.id, {SQLITE_NOW} '
+            'FROM note_import_staging s, json_each(s.tags) AS x '
+            'JOIN tag t ON t.name = lower(trim(x.value)) '
+            f'WHERE {tenancy.owner_sql("t.user_id", user_id)} '  # Also disambiguates ON CONFLICT after a SELECT
+            'ON CONFLICT (note_id, tag_id) DO NOTHING'
+        )
+        tag_links_created = cursor.rowcount
+        cursor.execute('DROP TABLE temp.note_import_staging')
+        return {
+            'notes_created': notes_created,
+            'tags_created': tags_created,
+            'tag_links_created': tag_links_created
+        }
+
+    def _merge(self, cursor, user_id: Optional[int]) -> Dict:
+        """Move staged rows into note, tag and note_tag with set-based statements"""
+        owner = _owner_value(user_id)
+        # Pre-allocate ids so note_tag rows can be joined back to their staged note
+        cursor.execute(
+            "UPDATE note_import_staging SET note_id = nextval(pg_get_serial_sequence('note', 'id'))"
+        )
+        # No conflict target: either uq_tag_user_name or uq_tag_shared_name can fire
+        cursor.execute(
+            'INSERT INTO tag (user_id, name) '
+            f'SELECT DISTINCT {owner}::bigint, lower(trim(t.name)) FROM note_import_staging s '
+            'CROSS JOIN LATERAL jsonb_array_elements_text(s.tags::jsonb) AS t(name) '
+            "WHERE trim(t.name) <> '' "
+            'ON CONFLICT DO NOTHING'
+        )
+        tags_created = cursor.rowcount
+        cursor.execute(
+            'INSERT INTO note (id, user_id, title, content, title_zh, content_zh, auto_tags, created_at, updated_at, '
+            'word_count, char_count, sentence_count, avg_word_length) '
+            f'SELECT note_id, {owner}::bigint, left(title, 200), content, '
+            "left(NULLIF(title_zh, ''), 200), NULLIF(content_zh, ''), "
+            "CASE WHEN auto_tags = '' THEN NULL "
+            'ELSE ARRAY(SELECT jsonb_array_elements_text(auto_tags::jsonb)) END, '
+            # Naive UTC like datetime.utcnow() elsewhere, whatever the session TimeZone
+            "COALESCE(NULLIF(created_at, '')::timestamptz AT TIME ZONE 'UTC', NOW() AT TIME ZONE 'UTC'), "
+            "COALESCE(NULLIF(updated_at, '')::timestamptz AT TIME ZONE 'UTC', NOW() AT TIME ZONE 'UTC'), "
+            'word_count, char_count, sentence_count, avg_word_length '
+            'FROM note_import_staging ORDER BY seq'
+        )
+        notes_created = cursor.rowcount
+        # The note_tag trigger bumps updated_at on the tagged notes
+        cursor.execute(
+            'INSERT INTO note_tag (note_id, tag_id, created_at) '
+            'SELECT DISTINCT s.note_id, t.id, NOW() FROM note_import_staging s '
+            'CROSS JOIN LATERAL jsonb_array_elements_text(s.tags::jsonb) AS x(name) '
+            'JOIN tag t ON t.name = lower(trim(x.name)) '
+            f'AND {tenancy.owner_sql("t.user_id", user_id)} '
+            'ON CONFLICT (note_id, tag_id) DO NOTHING'
+        )
+        return {
+            'notes_created': notes_created,
+            'tags_created': tags_created,
+            'tag_links_created': cursor.rowcount
+        }
+
+    def import_lines(self, lines: Iterable[str], format_type: str,
+                     progress: Optional[Callable[[Dict], None]] = None,
+                     user_id: Optional[int] = None) -> Dict:
+        """Import notes owned by user_id (None: shared scope) from an iterable of text lines and return a report"""
+        parser = PARSERS.get(format_type)
+        if parser is None:
+            raise ValueError(f'Unsupported import format: {format_type}')
+
+        started = time.monotonic()
+        report = {
+            'format': format_type,
+            'records_read': 0,
+            'records_staged': 0,
+            'records_skipped': 0,
+            'batches': 0,
+            'errors': []
+        }
+
+        def skip(message):
+            report['records_skipped'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append(message)
+
+        # Raw DBAPI connection shares the session's transaction
+        sqlite = uses_sqlite()
+        cursor = db.session.connection().connection.cursor()
+        try:
+            self._create_staging(cursor, sqlite)
+            batch = []
+            for record in parser(lines):
+                report['records_read'] += 1
+                if isinstance(record, ImportFormatError):
+                    skip(str(record))
+                    continue
+                try:
+                    batch.append(self._to_row(report['records_staged'] + len(batch), record))
+                except ImportFormatError as e:
+                    skip(str(e))
+                    continue
+
+                if len(batch) >= self.batch_size:
+                    self._copy_batch(cursor, batch, sqlite)
+                    report['records_staged'] += len(batch)
+                    report['batches'] += 1
+                    batch = []
+                    if progress:
+                        progress(dict(report, elapsed_seconds=round(time.monotonic() - started, 3)))
+
+            if batch:
+                self._copy_batch(cursor, batch, sqlite)
+                report['records_staged'] += len(batch)
+                report['batches'] += 1
+
+            report.update(self._merge_sqlite(cursor, user_id) if sqlite else self._merge(cursor, user_id))
+        finally:
+            cursor.close()
+
+        report['elapsed_seconds'] = round(time.monotonic() - started, 3)
+        if progress:
+            progress(report)
+        return report
+
+
+def detect_format(filename: Optional[str], default: str = 'jsonl') -> str:
+    """Infer the import format from a file name"""
+    if filename and filename.lower().endswith(('.md', '.markdown')):
+        return 'markdown'
+    return default
+
+
+# Initialize service instance
+note_importer = NoteImporter()
@@ -0,0 +1,209 @@
+"""
+LLM Usage Ledger for NoteTaker
+Records every model call off the request path in batches and enforces daily budgets
+"""
+import os
+import time
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import insert, text
+from src.models.llm_usage import LlmUsage
+from src.services.structured_logging import get_logger
+
+logger = get_logger('services.llm_ledger')
+
+# Note the current request is working on, attached to ledger entries
+_current_note_id: ContextVar[Optional[int]] = ContextVar('llm_note_id', default=None)
+
+
+class LlmBudgetExceeded(RuntimeError):
+    """Raised before an upstream call when the daily budget is used up"""
+
+
+class LlmLedger:
+    def __init__(self):
+        self.batch_size = int(os.environ.get('LLM_LEDGER_BATCH_SIZE', 100))
+        self.flush_interval = float(os.environ.get('LLM_LEDGER_FLUSH_SECONDS', 2.0))
+        self.daily_token_budget = int(os.environ.get('LLM_DAILY_TOKEN_BUDGET', 0))
+        self.daily_request_budget = int(os.environ.get('LLM_DAILY_REQUEST_BUDGET', 0))
+        self.engine = None
+        self._queue = queue.SimpleQueue()
+        self._writer = None
+        self._lock = threading.Lock()
+        self._day = None
+        self._day_tokens = 0
+        self._day_requests = 0
+        self._dropped = 0
+        self._written = 0
+
+    def init_app(self, app, engine) -> None:
+        self.engine = engine
+        atexit.register(self.flush)
+
+    @contextmanager
+    def note_context(self, note_id: Optional[int]):
+        """Attribute model calls made inside the block to a note"""
+        token = _current_note_id.set(note_id)
+        try:
+            yield
+        finally:
+            _current_note_id.reset(token)
+
+    def _roll_day(self) -> None:
+        """Reset daily counters at UTC midnight, seeding them from the ledger table
+
+        The query runs outside self._lock so record() and check_budget() callers do not queue
+        behind it; the first caller to finish swaps the counters in.
+        """
+        today = datetime.utcnow().date()
+        if self._day == today:
+            return
+        tokens = requests = 0
+        if self.engine is not None:
+            try:
+                with self.engine.connect() as conn:
+                    row = conn.execute(text(
+                        'SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0), COUNT(*) '
+                        'FROM llm_usage WHERE created_at >= :start AND cache_hit = FALSE'
+                    ), {'start': datetime.combine(today, datetime.min.time())}).one()
+                    tokens, requests = int(row[0]), int(row[1])
+            except Exception as e:
+                logger.warning("Could not load today's LLM usage: %s", e)
+        with self._lock:
+            if self._day != today:
+                self._day = today
+                self._day_tokens = tokens
+                self._day_requests = requests
+
+    def check_budget(self) -> None:
+        """Raise LlmBudgetExceeded if today's token or request budget is spent"""
+        if not self.daily_token_budget and not self.daily_request_budget:
+            return
+        self._roll_day()
+        with self._lock:
+            if self.daily_token_budget and self._day_tokens >= self.daily_token_budget:
+                raise LlmBudgetExceeded('Daily LLM token budget exhausted')
+            if self.daily_request_budget and self._day_requests >= self.daily_request_budget:
+                raise LlmBudgetExceeded('Daily LLM request budget exhausted')
+
+    def record(self, service: str, method: str, status: str, latency_ms: float = 0.0,
+               usage: Optional[Dict] = None, cache_hit: bool = False,
+               note_id: Optional[int] = None) -> None:
+        """Queue one ledger entry; never blocks on the database"""
+        usage = usage or {}
+        entry = {
+            'created_at': datetime.utcnow(),
+            'service': service,
+            'method': method,
+            'note_id': note_id if note_id is not None else _current_note_id.get(),
+            'prompt_tokens': int(usage.get('prompt_tokens') or 0),
+            'completion_tokens': int(usage.get('completion_tokens') or 0),
+            'latency_ms': round(latency_ms, 2),
+            'status': status,
+            'cache_hit': cache_hit
+        }
+        self._roll_day()
+        with self._lock:
+            if not cache_hit:
+                self._day_requests += 1
+                self._day_tokens += entry['prompt_tokens'] + entry['completion_tokens']
+
+        self._queue.put(entry)
+        self._ensure_writer()
+
+    def _ensure_writer(self) -> None:
+        if self.engine is None or (self._writer is not None and self._writer.is_alive()):
+            return
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name='llm-ledger-writer', daemon=True)
+                self._writer.start()
+
+    def _drain(self, block: bool) -> List[Dict]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict]) -> None:
+        if not batch or self.engine is None:
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(LlmUsage.__table__), batch)
+            self._written += len(batch)
+        except Exception as e:
+            self._dropped += len(batch)
+            logger.error('Dropped LLM ledger entries: %s', e, extra={'dropped': len(batch)})
+
+    def _run(self) -> None:
+        while True:
+            self._write(self._drain(block=True))
+
+    def flush(self) -> None:
+        """Write everything queued so far (used at shutdown)"""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def aggregate(self, since: datetime) -> List[Dict]:
+        """Usage grouped by service and method since a point in time"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(
+                'SELECT service, method, COUNT(*) AS calls, '
+                'SUM(CASE WHEN cache_hit THEN 1 ELSE 0 END) AS cache_hits, '
+                "SUM(CASE WHEN status NOT IN ('200', 'cached') THEN 1 ELSE 0 END) AS failures, "
+                'SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens, '
+                'AVG(CASE WHEN cache_hit THEN NULL ELSE latency_ms END) AS avg_latency_ms, '
+                'MAX(latency_ms) AS max_latency_ms '
+                'FROM llm_usage WHERE created_at >= :since '
+                'GROUP BY service, method ORDER BY SUM(prompt_tokens + completion_tokens) DESC'
+            ), {'since': since})
+            return [{
+                'service': row.service,
+                'method': row.method,
+                'calls': int(row.calls),
+                'cache_hits': int(row.cache_hits or 0),
+                'failures': int(row.failures or 0),
+                'prompt_tokens': int(row.prompt_tokens or 0),
+                'completion_tokens': int(row.completion_tokens or 0),
+                'avg_latency_ms': round(float(row.avg_latency_ms), 2) if row.avg_latency_ms is not None else None,
+                'max_latency_ms': round(float(row.max_latency_ms or 0), 2)
+            } for row in rows]
+
+    def budget_status(self) -> Dict:
+        self._roll_day()
+        with self._lock:
+            return {
+                'day': self._day.isoformat(),
+                'tokens_used': self._day_tokens,
+                'requests_used': self._day_requests,
+                'token_budget': self.daily_token_budget or None,
+                'request_budget': self.daily_request_budget or None,
+                'pending_writes': self._queue.qsize(),
+                'written': self._written,
+                'dropped': self._dropped
+            }
+
+
+def usage_since(days: float) -> datetime:
+    return datetime.utcnow() - timedelta(days=days)
+
+
+# Initialize ledger instance
+llm_ledger = LlmLedger()
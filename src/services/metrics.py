@@ -0,0 +1,210 @@
+"""
+Request Metrics for NoteTaker
+Per-route latency histograms, SQL time per request and upstream model call timings,
+exposed in Prometheus text format
+"""
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+UPSTREAM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+# Per-request SQL counters; None outside a request
+_request_stats: ContextVar[Optional[Dict]] = ContextVar('request_stats', default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f'{self.name}{_labels(self.label_names, labels)} {value}'
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = _labels(self.label_names, labels, 'le="%s"' % bound)
+                yield f'{self.name}_bucket{bucket_labels} {cumulative}'
+            cumulative += series[len(self.buckets)]
+            bucket_labels = _labels(self.label_names, labels, 'le="+Inf"')
+            label_text = _labels(self.label_names, labels)
+            yield f'{self.name}_bucket{bucket_labels} {cumulative}'
+            yield f'{self.name}_sum{label_text} {series[-1]}'
+            yield f'{self.name}_count{label_text} {cumulative}'
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], collect):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.collect = collect
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} gauge'
+        for labels, value in self.collect():
+            yield f'{self.name}{_labels(self.label_names, labels)} {value}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.request_latency = Histogram(
+            'notetaker_request_duration_seconds', 'HTTP request latency by route',
+            ('route', 'method'), LATENCY_BUCKETS
+        )
+        self.requests = Counter(
+            'notetaker_requests_total', 'HTTP responses by route and status code',
+            ('route', 'method', 'status')
+        )
+        self.db_statements = Histogram(
+            'notetaker_request_db_statements', 'SQL statements executed per request',
+            ('route',), STATEMENT_BUCKETS
+        )
+        self.db_time = Histogram(
+            'notetaker_request_db_seconds', 'Total SQL execution time per request',
+            ('route',), LATENCY_BUCKETS
+        )
+        self.upstream_latency = Histogram(
+            'notetaker_upstream_request_duration_seconds', 'GitHub Models call latency',
+            ('service', 'method', 'status'), UPSTREAM_BUCKETS
+        )
+        self.upstream_calls = Counter(
+            'notetaker_upstream_requests_total', 'GitHub Models calls by service method and outcome',
+            ('service', 'method', 'status')
+        )
+        self._metrics = [
+            self.request_latency, self.requests, self.db_statements,
+            self.db_time, self.upstream_latency, self.upstream_calls
+        ]
+
+    def register(self, metric) -> None:
+        """Add another metric (e.g. a Gauge) to the exposition"""
+        self._metrics.append(metric)
+
+    def init_app(self, app, engine) -> None:
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        self.instrument(engine)
+
+    def instrument(self, engine) -> None:
+        """Count an engine's statements in the per-request SQL metrics (also used for read replicas)"""
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    def _before_request(self):
+        _request_stats.set({'started': time.perf_counter(), 'statements': 0, 'db_seconds': 0.0})
+
+    def _after_request(self, response):
+        from flask import request
+
+        stats = _request_stats.get()
+        if stats is None:
+            return response
+        _request_stats.set(None)
+
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        elapsed = time.perf_counter() - stats['started']
+        self.request_latency.observe((route, request.method), elapsed)
+        self.requests.inc((route, request.method, response.status_code))
+        self.db_statements.observe((route,), stats['statements'])
+        self.db_time.observe((route,), stats['db_seconds'])
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append((cursor, time.perf_counter()))
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        _, started = conn.info['query_started'].pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats['statements'] += 1
+            stats['db_seconds'] += time.perf_counter() - started
+
+    def _handle_error(self, context):
+        # A failed statement never reaches after_cursor_execute; drop its start time so the
+        # stack on the pooled connection stays matched, and still count the time it took
+        execution = context.execution_context
+        if context.connection is None or execution is None:
+            return
+        pending = context.connection.info.get('query_started')
+        if pending and pending[-1][0] is execution.cursor:
+            _, started = pending.pop()
+            stats = _request_stats.get()
+            if stats is not None:
+                stats['statements'] += 1
+                stats['db_seconds'] += time.perf_counter() - started
+
+    def observe_upstream(self, service: str, method: str, seconds: float, status: str) -> None:
+        """Record one outbound model call"""
+        labels = (service, method, status)
+        self.upstream_latency.observe(labels, seconds)
+        self.upstream_calls.inc(labels)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Initialize registry instance
+metrics = MetricsRegistry()
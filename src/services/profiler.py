@@ -0,0 +1,124 @@
+"""
+On-Demand Request Profiler for NoteTaker
+Samples the request thread's stack and stores collapsed stacks for flamegraph tools
+"""
+import os
+import sys
+import hmac
+import time
+import uuid
+import random
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's call stack at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfiler:
+    """Profiles requests selected by token header/query flag or by sampling"""
+
+    def __init__(self):
+        self.token = os.environ.get('PROFILE_TOKEN')
+        self.sample_rate = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+        self.interval = float(os.environ.get('PROFILE_INTERVAL_MS', 5)) / 1000
+        self.profiles = deque(maxlen=int(os.environ.get('PROFILE_MAX_STORED', 50)))
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def is_authorized(self, request) -> bool:
+        """True if the request carries the PROFILE_TOKEN in X-Profile-Token or ?profile_token="""
+        if not self.token:
+            return False
+        supplied = request.headers.get('X-Profile-Token') or request.args.get('profile_token') or ''
+        return hmac.compare_digest(supplied, self.token)
+
+    def _wants_profile(self, request) -> bool:
+        if request.headers.get('X-Profile') or request.args.get('profile'):
+            return self.is_authorized(request)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _before_request(self):
+        from flask import g, request
+
+        if not self._wants_profile(request):
+            return
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        g._profile = {'sampler': sampler, 'started': time.perf_counter()}
+        sampler.start()
+
+    def _after_request(self, response):
+        from flask import g, request
+
+        state = g.pop('_profile', None)
+        if state is None:
+            return response
+
+        sampler = state['sampler']
+        sampler.stop()
+        profile_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self.profiles.append({
+                'id': profile_id,
+                'route': request.url_rule.rule if request.url_rule is not None else 'unmatched',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - state['started']) * 1000, 2),
+                'samples': sampler.samples,
+                'interval_ms': self.interval * 1000,
+                'created_at': datetime.utcnow().isoformat(),
+                'stacks': sampler.stacks
+            })
+        response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    def list_profiles(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {key: value for key, value in profile.items() if key != 'stacks'}
+                for profile in reversed(self.profiles)
+            ]
+
+    def collapsed(self, profile_id: str) -> Optional[str]:
+        """Collapsed-stack text ("frame;frame;frame count" per line) for flamegraph.pl/speedscope"""
+        with self._lock:
+            profile = next((p for p in self.profiles if p['id'] == profile_id), None)
+        if profile is None:
+            return None
+        return ''.join(f'{stack} {count}\n' for stack, count in profile['stacks'].most_common())
+
+
+# Initialize profiler instance
+request_profiler = RequestProfiler()
@@ -0,0 +1,245 @@
+"""
+Read Replica Routing for NoteTaker
+Sends the reads of read-only endpoints to the DATABASE_REPLICA_URLS replicas,
+skipping replicas that fail health checks or lag too far behind. Writes, and
+every read of a client that wrote within REPLICA_STICKY_SECONDS, use the primary
+"""
+import os
+import time
+import itertools
+import threading
+from typing import Dict, List, Optional
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from werkzeug.http import dump_cookie
+from src.services.metrics import metrics, Counter, Gauge
+from src.services.structured_logging import get_logger
+
+logger = get_logger('services.read_replicas')
+
+# Endpoints whose queries may be served by a replica; any write inside them moves the rest of
+# the request to the primary. Routes that commit AI results stay off this list
+READ_ENDPOINTS = {
+    'note.get_notes', 'note.get_note', 'note.search_notes', 'note.list_revisions', 'note.get_revision',
+    'enhanced.get_tags', 'enhanced.get_tag_facets', 'enhanced.get_analytics', 'enhanced.export_notes',
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Seconds of replay lag; 0 when the replica has replayed everything it received
+_PG_LAG = text(
+    'SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+
+class RoutingSession(Session):
+    """db.session: picks a replica engine for the reads of replica-routed requests"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            engine = read_replicas.route(self, clause)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class Replica:
+    def __init__(self, key: str, url: str):
+        self.key = key
+        self.url = url
+        self.engine = None
+        self.healthy = True
+        self.lag_seconds = None
+        self.error = None
+        self.checked_at = 0.0  # time.monotonic() of the last check; 0 checks on first use
+        self.lock = threading.Lock()
+
+    def describe(self) -> Dict:
+        return {
+            'name': self.key,
+            'host': (self.engine.url.host or self.engine.url.database) if self.engine is not None else None,
+            'healthy': self.healthy,
+            'lag_seconds': self.lag_seconds,
+            'error': self.error
+        }
+
+
+class ReadReplicas:
+    def __init__(self):
+        urls = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+        self.replicas: List[Replica] = [Replica(f'replica{index}', url) for index, url in enumerate(urls)]
+        # Replicas are re-checked at most this often, in the request that next picks them
+        self.health_interval = float(os.environ.get('REPLICA_HEALTH_INTERVAL', 10))
+        # Replicas further behind than this are skipped (0 = lag is not checked)
+        self.max_lag_seconds = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+        self.sticky_seconds = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+        self.cookie = os.environ.get('REPLICA_STICKY_COOKIE', 'nt_primary_until')
+        self._next = itertools.count()
+        self._reads = Counter(
+            'notetaker_db_routed_requests_total', 'Replica-eligible requests by the database that served them',
+            ('target',)
+        )
+        self._counts = {'replica': 0, 'primary_sticky': 0, 'primary_failover': 0, 'pinned_after_write': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def configure(self, app, mode: str) -> None:
+        """Add the replicas to SQLALCHEMY_BINDS; call before db.init_app"""
+        # Imported here: db_connection loads the models, which import this module for RoutingSession
+        from src.services.db_connection import build_engine_options
+
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+        for replica in self.replicas:
+            binds[replica.key] = {'url': replica.url, **build_engine_options(mode, replica.url)}
+
+    def init_app(self, app, db) -> None:
+        """Instrument the replica engines created by db.init_app; call inside an app context"""
+        from src.services import sqlite_backend
+        from src.services.cache import note_cache
+
+        for replica in self.replicas:
+            replica.engine = db.engines[replica.key]
+            if sqlite_backend.is_sqlite_url(replica.url):
+                sqlite_backend.install(replica.engine)
+            event.listen(replica.engine, 'handle_error', self._error_listener(replica))
+            metrics.instrument(replica.engine)
+        if self.enabled:
+            # The cache is shared with primary reads; what a lagging replica returned must not outlive the request
+            note_cache.skip_store = self.served_by_replica
+            app.after_request(self._after_request)
+            metrics.register(self._reads)
+            metrics.register(Gauge(
+                'notetaker_db_replica_healthy', 'Read replicas passing health and lag checks (1) or skipped (0)',
+                ('replica',), lambda: [((replica.key,), int(replica.healthy)) for replica in self.replicas]
+            ))
+            logger.info('Read replicas configured', extra={'replicas': len(self.replicas)})
+
+    # Routing
+
+    def route(self, session, clause) -> Optional[object]:
+        """The replica engine for this statement, or None for the primary"""
+        if not self.enabled or not has_request_context():
+            return None
+        if session._flushing or getattr(clause, 'is_dml', False):
+            # A write: this request and the client's next reads see the primary
+            if not g.get('db_primary') and g.get('db_replica') is not None:
+                self._counts['pinned_after_write'] += 1
+            g.db_primary = g.db_wrote = True
+            return None
+        if g.get('db_primary'):
+            return None
+        if 'db_replica' not in g:
+            g.db_replica = self._choose()
+        return g.db_replica.engine if g.db_replica is not None else None
+
+    def use_primary(self) -> None:
+        """Send the rest of the request to the primary, e.g. before reading rows it is about to change"""
+        if has_request_context():
+            g.db_primary = True
+
+    def served_by_replica(self) -> bool:
+        """Whether the current request has read from a replica"""
+        return has_request_context() and g.get('db_replica') is not None
+
+    def _choose(self) -> Optional[Replica]:
+        if request.endpoint not in READ_ENDPOINTS:
+            return None
+        if self._sticky():
+            self._counted('primary_sticky')
+            return None
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self._available(replica):
+                self._counted('replica')
+                return replica
+        self._counted('primary_failover')
+        return None
+
+    def _counted(self, target: str) -> None:
+        self._counts[target] += 1
+        self._reads.inc((target,))
+
+    def _sticky(self) -> bool:
+        try:
+            return float(request.cookies.get(self.cookie, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _after_request(self, response):
+        wrote = g.get('db_wrote') or (
+            request.method not in SAFE_METHODS and request.endpoint not in READ_ENDPOINTS and response.status_code < 400
+        )
+        cookie = self.sticky_cookie(request.is_secure) if wrote and request.blueprint is not None else None
+        if cookie:
+            response.headers.add('Set-Cookie', cookie)
+        return response
+
+    def sticky_cookie(self, secure: bool = False) -> Optional[str]:
+        """Set-Cookie value sending the client's reads to the primary for REPLICA_STICKY_SECONDS"""
+        if not self.enabled or not self.sticky_seconds:
+            return None
+        return dump_cookie(
+            self.cookie, str(int(time.time()) + self.sticky_seconds), max_age=self.sticky_seconds,
+            httponly=True, samesite='Lax', secure=secure
+        )
+
+    # Health
+
+    def _available(self, replica: Replica) -> bool:
+        """Last known health, re-checked once per REPLICA_HEALTH_INTERVAL by whichever request gets the lock"""
+        if time.monotonic() - replica.checked_at >= self.health_interval and replica.lock.acquire(blocking=False):
+            try:
+                self.check(replica)
+            finally:
+                replica.lock.release()
+        return replica.healthy
+
+    def check(self, replica: Replica) -> bool:
+        try:
+            with replica.engine.connect() as conn:
+                if conn.dialect.name == 'postgresql':
+                    lag = float(conn.execute(_PG_LAG).scalar() or 0)
+                else:
+                    conn.execute(text('SELECT 1'))
+                    lag = 0.0
+            replica.lag_seconds = round(lag, 3)
+            healthy = not self.max_lag_seconds or lag <= self.max_lag_seconds
+            error = None if healthy else f'Replication lag {lag:.1f}s exceeds {self.max_lag_seconds:g}s'
+        except Exception as e:
+            healthy, error = False, str(e)[:200]
+        self._set_health(replica, healthy, error)
+        return healthy
+
+    def _set_health(self, replica: Replica, healthy: bool, error: Optional[str]) -> None:
+        replica.checked_at = time.monotonic()
+        if healthy != replica.healthy:
+            if healthy:
+                logger.info('Read replica back in rotation', extra={'replica': replica.key})
+            else:
+                logger.warning('Read replica taken out of rotation', extra={'replica': replica.key, 'error': error})
+        replica.healthy, replica.error = healthy, error
+
+    def _error_listener(self, replica: Replica):
+        def _on_error(context):
+            # Lost connections fail over right away instead of at the next scheduled check
+            if context.is_disconnect:
+                self._set_health(replica, False, str(context.original_exception)[:200])
+        return _on_error
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'replicas': [replica.describe() for replica in self.replicas],
+            'max_lag_seconds': self.max_lag_seconds,
+            'sticky_seconds': self.sticky_seconds,
+            **self._counts
+        }
+
+
+# Initialize routing instance
+read_replicas = ReadReplicas()
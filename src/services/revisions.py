@@ -0,0 +1,261 @@
+"""
+Note Revision History for NoteTaker
+Keeps each note's history as a zlib snapshot every REVISION_SNAPSHOT_INTERVAL
+revisions with compressed line diffs in between; saves within
+REVISION_COALESCE_SECONDS of a revision's first edit are folded into it
+"""
+import os
+import json
+import zlib
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+from sqlalchemy import and_, case, func
+from src.models.user import db
+from src.models.note_revision import NoteRevision
+
+# Notes per "latest revision" lookup, like the bulk operation chunks
+LOOKUP_CHUNK = 1000
+
+
+def encode_delta(old: str, new: str, level: int = 6) -> bytes:
+    """Line diff from old to new: [start, end] copies old lines, strings are inserted text"""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(new_lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(',', ':')).encode('utf-8'), level)
+
+
+def apply_delta(old: str, payload: bytes) -> str:
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(zlib.decompress(payload)):
+        parts.append(''.join(old_lines[op[0]:op[1]]) if isinstance(op, list) else op)
+    return ''.join(parts)
+
+
+class RevisionHistory:
+    def __init__(self):
+        self.enabled = os.environ.get('REVISION_HISTORY_ENABLED', 'true').lower() == 'true'
+        # Reconstructing a revision applies at most interval - 1 diffs to a snapshot
+        self.snapshot_interval = max(int(os.environ.get('REVISION_SNAPSHOT_INTERVAL', 20)), 1)
+        self.coalesce_seconds = float(os.environ.get('REVISION_COALESCE_SECONDS', 120))
+        # Oldest revisions are dropped a snapshot interval at a time once either limit is passed (0 = no limit)
+        self.max_per_note = int(os.environ.get('REVISION_MAX_PER_NOTE', 100))
+        self.retention_days = float(os.environ.get('REVISION_RETENTION_DAYS', 90))
+        self.level = int(os.environ.get('REVISION_COMPRESSION_LEVEL', 6))
+        self._counts = {'revisions': 0, 'snapshots': 0, 'coalesced': 0, 'pruned': 0}
+
+    # Recording: call before the commit that writes the new title/content
+
+    def record(self, note, previous: Optional[Dict] = None) -> None:
+        """Record a note's current title and content; previous holds its title, content and updated_at before the edit"""
+        if note.id is None:
+            db.session.flush()
+        self.record_many([{'id': note.id, 'title': note.title, 'content': note.content, 'previous': previous}])
+
+    def record_many(self, changes: List[Dict]) -> None:
+        """Record edits to many notes with one "latest revision" lookup per LOOKUP_CHUNK notes
+
+        Each change has id, title, content and previous (None for new notes);
+        edits that leave title and content unchanged are skipped.
+        """
+        if not self.enabled:
+            return
+        changes = [change for change in changes if not self._unchanged(change)]
+        now = datetime.utcnow()
+        for start in range(0, len(changes), LOOKUP_CHUNK):
+            chunk = changes[start:start + LOOKUP_CHUNK]
+            heads = self._heads([change['id'] for change in chunk])
+            for change in chunk:
+                head, snapshot_seq = heads.get(change['id'], (None, None))
+                self._record(change, head, snapshot_seq, now)
+
+    @staticmethod
+    def _unchanged(change: Dict) -> bool:
+        previous = change.get('previous')
+        return previous is not None and \
+            (previous['title'], previous['content']) == (change['title'], change['content'])
+
+    def _heads(self, note_ids: List[int]) -> Dict:
+        """note_id -> (latest revision, seq of the snapshot its diff chain starts from)"""
+        latest = db.session.query(
+            NoteRevision.note_id,
+            func.max(NoteRevision.seq).label('seq'),
+            func.max(case((NoteRevision.is_snapshot, NoteRevision.seq))).label('snapshot_seq')
+        ).filter(NoteRevision.note_id.in_(note_ids)).group_by(NoteRevision.note_id).subquery()
+        rows = db.session.query(NoteRevision, latest.c.snapshot_seq).join(
+            latest, and_(NoteRevision.note_id == latest.c.note_id, NoteRevision.seq == latest.c.seq)
+        )
+        return {revision.note_id: (revision, snapshot_seq) for revision, snapshot_seq in rows}
+
+    def _record(self, change: Dict, head: Optional[NoteRevision], snapshot_seq: Optional[int], now: datetime) -> None:
+        previous = change.get('previous')
+        if head is None:
+            if previous is None:
+                self._append(change['id'], 1, change['title'], change['content'], None, now)
+                return
+            # First edit of a note created without history (bulk create, import, older notes): keep its original text
+            head = self._append(change['id'], 1, previous['title'], previous['content'], None,
+                                previous.get('updated_at') or now)
+            snapshot_seq = 1
+        elif now - head.created_at <= timedelta(seconds=self.coalesce_seconds):
+            self._coalesce(head, change, now)
+            return
+
+        seq = head.seq + 1
+        # Diffs are taken against the previous revision, which matches the note's text before this edit
+        base = previous['content'] if previous is not None else self.content_at(head.note_id, head.seq)
+        if seq - snapshot_seq >= self.snapshot_interval:
+            base = None
+        self._append(change['id'], seq, change['title'], change['content'], base, now)
+
+    def _append(self, note_id: int, seq: int, title: str, content: str,
+                base: Optional[str], now: datetime) -> NoteRevision:
+        revision = NoteRevision(note_id=note_id, seq=seq, created_at=now)
+        self._set_content(revision, title, content, base, now)
+        db.session.add(revision)
+        self._counts['revisions'] += 1
+        self._counts['snapshots'] += revision.is_snapshot
+        if revision.is_snapshot and seq > 1:
+            # Only a new snapshot lets older revisions go without breaking a diff chain
+            self._prune(note_id, seq, now)
+        return revision
+
+    def _coalesce(self, head: NoteRevision, change: Dict, now: datetime) -> None:
+        base = None if head.is_snapshot else self.content_at(head.note_id, head.seq - 1)
+        self._set_content(head, change['title'], change['content'], base, now)
+        head.edits = (head.edits or 1) + 1
+        self._counts['coalesced'] += 1
+
+    def _set_content(self, revision: NoteRevision, title: str, content: str,
+                     base: Optional[str], now: datetime) -> None:
+        """Store content as a diff from base, or as a snapshot when there is no base or the diff is no smaller"""
+        content = content or ''
+        snapshot = zlib.compress(content.encode('utf-8'), self.level)
+        delta = encode_delta(base, content, self.level) if base is not None else None
+        revision.is_snapshot = delta is None or len(delta) >= len(snapshot)
+        revision.payload = snapshot if revision.is_snapshot else delta
+        revision.title = title
+        revision.size = len(content)
+        revision.updated_at = now
+
+    def _prune(self, note_id: int, seq: int, now: datetime) -> None:
+        """Delete revisions older than the last snapshot that starts a chain of still-retained revisions
+
+        seq is a snapshot, which is always kept.
+        """
+        age_cutoff = now - timedelta(days=self.retention_days) if self.retention_days else None
+        count_cutoff = seq - self.max_per_note if self.max_per_note else 0
+
+        boundary = None
+        rows = db.session.query(NoteRevision.seq, NoteRevision.is_snapshot, NoteRevision.updated_at).filter(
+            NoteRevision.note_id == note_id, NoteRevision.seq < seq
+        ).order_by(NoteRevision.seq)
+        for row_seq, is_snapshot, updated_at in rows:
+            expired = row_seq <= count_cutoff or (age_cutoff is not None and updated_at < age_cutoff)
+            if not expired:
+                break
+            if is_snapshot:
+                boundary = row_seq
+        else:
+            # Everything before the new snapshot has expired
+            boundary = seq
+        if boundary:
+            pruned = NoteRevision.query.filter(
+                NoteRevision.note_id == note_id, NoteRevision.seq < boundary
+            ).delete(synchronize_session=False)
+            self._counts['pruned'] += pruned
+
+    def prune_expired(self, now: Optional[datetime] = None, batch_size: int = LOOKUP_CHUNK) -> Dict:
+        """Apply REVISION_RETENTION_DAYS to every note, including notes no longer edited
+
+        Appending a snapshot only prunes its own note; run this on a schedule for the rest.
+        """
+        if not self.enabled or not self.retention_days:
+            return {'pruned': 0, 'notes': 0, 'enabled': False}
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=self.retention_days)
+        latest_snapshot = db.session.query(
+            NoteRevision.note_id, func.max(NoteRevision.seq).label('seq')
+        ).filter(NoteRevision.is_snapshot).group_by(NoteRevision.note_id).subquery()
+
+        before = self._counts['pruned']
+        notes, after_id = 0, 0
+        while True:
+            # Notes with an expired revision older than their latest snapshot, in note_id order
+            candidates = db.session.query(NoteRevision.note_id, latest_snapshot.c.seq).join(
+                latest_snapshot, NoteRevision.note_id == latest_snapshot.c.note_id
+            ).filter(
+                NoteRevision.note_id > after_id, NoteRevision.updated_at < cutoff,
+                NoteRevision.seq < latest_snapshot.c.seq
+            ).distinct().order_by(NoteRevision.note_id).limit(batch_size).all()
+            if not candidates:
+                break
+            try:
+                for note_id, snapshot_seq in candidates:
+                    self._prune(note_id, snapshot_seq, now)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            notes += len(candidates)
+            after_id = candidates[-1][0]
+        return {'pruned': self._counts['pruned'] - before, 'notes': notes, 'enabled': True, 'cutoff': cutoff.isoformat()}
+
+    # Reading
+
+    def _chain(self, note_id: int, seq: int) -> List[NoteRevision]:
+        """The revision and the diffs back to its snapshot, oldest first"""
+        start = db.session.query(func.max(NoteRevision.seq)).filter(
+            NoteRevision.note_id == note_id, NoteRevision.is_snapshot, NoteRevision.seq <= seq
+        ).scalar_subquery()
+        return NoteRevision.query.filter(
+            NoteRevision.note_id == note_id, NoteRevision.seq >= start, NoteRevision.seq <= seq
+        ).order_by(NoteRevision.seq).all()
+
+    def _reconstruct(self, note_id: int, seq: int):
+        """(revision, content), or None if the note has no such revision"""
+        chain = self._chain(note_id, seq)
+        if not chain or chain[-1].seq != seq:
+            return None
+        content = zlib.decompress(chain[0].payload).decode('utf-8')
+        for revision in chain[1:]:
+            content = apply_delta(content, revision.payload)
+        return chain, content
+
+    def content_at(self, note_id: int, seq: int) -> Optional[str]:
+        found = self._reconstruct(note_id, seq)
+        return found[1] if found else None
+
+    def list(self, note_id: int) -> List[Dict]:
+        """Revisions newest first, without content"""
+        revisions = NoteRevision.query.filter_by(note_id=note_id).order_by(NoteRevision.seq.desc()).all()
+        return [revision.to_dict() for revision in revisions]
+
+    def get(self, note_id: int, seq: int) -> Optional[Dict]:
+        """One revision with its reconstructed content"""
+        found = self._reconstruct(note_id, seq)
+        if found is None:
+            return None
+        chain, content = found
+        return {**chain[-1].to_dict(), 'content': content, 'diffs_applied': len(chain) - 1}
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'snapshot_interval': self.snapshot_interval,
+            'coalesce_seconds': self.coalesce_seconds,
+            'max_per_note': self.max_per_note,
+            'retention_days': self.retention_days,
+            **self._counts
+        }
+
+
+# Initialize history instance
+revision_history = RevisionHistory()
@@ -0,0 +1,308 @@
+"""
+Embedded SQLite Backend for NoteTaker
+WAL-mode pragmas, an FTS5 index over notes and trigger-maintained summary
+tables, for single-node deployments and local benchmarks (DATABASE_URL=sqlite:///...)
+"""
+import os
+import re
+from typing import Dict, Optional
+from sqlalchemy import event
+from src.models.user import db
+from src.services.structured_logging import get_logger
+
+logger = get_logger('services.sqlite_backend')
+
+_FTS_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# Timestamps written by triggers use the same text layout SQLAlchemy stores
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def is_sqlite_url(database_url: str) -> bool:
+    return database_url.startswith('sqlite')
+
+
+def uses_sqlite() -> bool:
+    """True when the app database is SQLite; used to pick dialect-specific SQL"""
+    return db.engine.dialect.name == 'sqlite'
+
+
+def busy_timeout_ms() -> int:
+    return int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+
+def sqlite_pragmas() -> Dict[str, str]:
+    """Applied to every new connection"""
+    return {
+        # Readers never block the single writer (and vice versa)
+        'journal_mode': 'WAL',
+        # With WAL, NORMAL only fsyncs at checkpoints; a power loss can drop the last commits but never corrupts
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'foreign_keys': 'ON',
+        'busy_timeout': str(busy_timeout_ms()),
+        # Negative cache_size is in KiB
+        'cache_size': str(-int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))),
+        'mmap_size': os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+        'temp_store': 'MEMORY',
+    }
+
+
+def sqlite_engine_options(database_url: str) -> Dict:
+    """SQLAlchemy engine options for a SQLite database"""
+    # Connections are shared across request threads through the pool
+    options = {'connect_args': {'check_same_thread': False, 'timeout': busy_timeout_ms() / 1000}}
+    if ':memory:' not in database_url and database_url.rstrip('/') not in ('sqlite:', 'sqlite+pysqlite:'):
+        options.update({
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        })
+    return options
+
+
+def install(engine) -> None:
+    """Set the pragmas on each new connection"""
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def fts_query(query: str, user_id: Optional[int] = None) -> Optional[str]:
+    """FTS5 MATCH expression requiring every word of query as a prefix in title or content
+
+    With a user_id only that user's notes match. None if query has no words.
+    """
+    tokens = _FTS_TOKEN.findall(query)
+    if not tokens:
+        return None
+    match = '{title content} : (' + ' '.join(f'"{token}"*' for token in tokens) + ')'
+    if user_id is not None:
+        match = f'user_id : "{int(user_id)}" AND {match}'
+    return match
+
+
+# The SQLite equivalents of supabase_setup.sql and the database_migration_*.sql
+# files; SQLite has no statement-level triggers, so the summaries are maintained per row
+SCHEMA_VERSION = 3
+
+SCHEMA = [
+    # Full-text index over title and content, stored once (external content table); user_id
+    # is indexed too so searches match "user_id : N" and only walk one user's postings
+    "CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5("
+    "user_id, title, content, content='note', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    """CREATE TRIGGER IF NOT EXISTS note_fts_insert AFTER INSERT ON note BEGIN
+        INSERT INTO note_fts (rowid, user_id, title, content) VALUES (new.id, new.user_id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS note_fts_delete AFTER DELETE ON note BEGIN
+        INSERT INTO note_fts (note_fts, rowid, user_id, title, content)
+        VALUES ('delete', old.id, old.user_id, old.title, old.content);
+    END""",
+    # AI and translation updates leave title/content alone and skip the index
+    """CREATE TRIGGER IF NOT EXISTS note_fts_update AFTER UPDATE OF user_id, title, content ON note BEGIN
+        INSERT INTO note_fts (note_fts, rowid, user_id, title, content)
+        VALUES ('delete', old.id, old.user_id, old.title, old.content);
+        INSERT INTO note_fts (rowid, user_id, title, content) VALUES (new.id, new.user_id, new.title, new.content);
+    END""",
+
+    # Archived notes, indexed when archived (services/tiering.py). Contentless, so archived text is only
+    # stored compressed; rows are removed with the 'delete' command on rehydration, while those of
+    # deleted notes linger harmlessly because note ids are never reused
+    "CREATE VIRTUAL TABLE IF NOT EXISTS note_archive_fts USING fts5("
+    "user_id, title, content, content='', tokenize='unicode61 remove_diacritics 2')",
+
+    # Every list is per user; NULL (shared scope) rows sort first and use the same index
+    "CREATE INDEX IF NOT EXISTS idx_note_user_updated_at ON note (user_id, updated_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_note_tag_tag_id ON note_tag (tag_id)",
+    f"""CREATE TRIGGER IF NOT EXISTS trigger_update_note_on_tag_change AFTER INSERT ON note_tag BEGIN
+        UPDATE note SET updated_at = {SQLITE_NOW} WHERE id = new.note_id;
+    END""",
+
+    # owner is user_id, with 0 for the shared scope
+    """CREATE TABLE IF NOT EXISTS note_stats_daily (
+        owner INTEGER NOT NULL DEFAULT 0,
+        day TEXT NOT NULL,
+        notes INTEGER NOT NULL DEFAULT 0,
+        words INTEGER NOT NULL DEFAULT 0,
+        chars INTEGER NOT NULL DEFAULT 0,
+        translated INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (owner, day)
+    )""",
+    """CREATE TABLE IF NOT EXISTS tag_stats (
+        tag_id INTEGER PRIMARY KEY REFERENCES tag (id) ON DELETE CASCADE,
+        notes INTEGER NOT NULL DEFAULT 0,
+        words INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS note_stats_insert AFTER INSERT ON note BEGIN
+        INSERT INTO note_stats_daily (owner, day, notes, words, chars, translated)
+        VALUES (COALESCE(new.user_id, 0), date(new.created_at), 1, new.word_count, new.char_count,
+                new.title_zh IS NOT NULL)
+        ON CONFLICT (owner, day) DO UPDATE SET
+            notes = notes + excluded.notes, words = words + excluded.words,
+            chars = chars + excluded.chars, translated = translated + excluded.translated;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS note_stats_delete AFTER DELETE ON note BEGIN
+        UPDATE note_stats_daily SET
+            notes = notes - 1, words = words - old.word_count,
+            chars = chars - old.char_count, translated = translated - (old.title_zh IS NOT NULL)
+        WHERE owner = COALESCE(old.user_id, 0) AND day = date(old.created_at);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS note_stats_update
+    AFTER UPDATE OF user_id, created_at, word_count, char_count, title_zh ON note BEGIN
+        UPDATE note_stats_daily SET
+            notes = notes - 1, words = words - old.word_count,
+            chars = chars - old.char_count, translated = translated - (old.title_zh IS NOT NULL)
+        WHERE owner = COALESCE(old.user_id, 0) AND day = date(old.created_at);
+        INSERT INTO note_stats_daily (owner, day, notes, words, chars, translated)
+        VALUES (COALESCE(new.user_id, 0), date(new.created_at), 1, new.word_count, new.char_count,
+                new.title_zh IS NOT NULL)
+        ON CONFLICT (owner, day) DO UPDATE SET
+            notes = notes + excluded.notes, words = words + excluded.words,
+            chars = chars + excluded.chars, translated = translated + excluded.translated;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tag_stats_note_words AFTER UPDATE OF word_count ON note
+    WHEN new.word_count <> old.word_count BEGIN
+        UPDATE tag_stats SET words = words + new.word_count - old.word_count
+        WHERE tag_id IN (SELECT tag_id FROM note_tag WHERE note_id = new.id);
+    END""",
+    # Cascaded note_tag deletes run after the note row is gone, so take its words off first
+    """CREATE TRIGGER IF NOT EXISTS tag_stats_note_deleted BEFORE DELETE ON note BEGIN
+        UPDATE tag_stats SET words = words - old.word_count
+        WHERE tag_id IN (SELECT tag_id FROM note_tag WHERE note_id = old.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tag_stats_insert AFTER INSERT ON note_tag BEGIN
+        INSERT INTO tag_stats (tag_id, notes, words)
+        VALUES (new.tag_id, 1, COALESCE((SELECT word_count FROM note WHERE id = new.note_id), 0))
+        ON CONFLICT (tag_id) DO UPDATE SET notes = notes + excluded.notes, words = words + excluded.words;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tag_stats_delete AFTER DELETE ON note_tag BEGIN
+        UPDATE tag_stats SET
+            notes = notes - 1,
+            words = words - COALESCE((SELECT word_count FROM note WHERE id = old.note_id), 0)
+        WHERE tag_id = old.tag_id;
+    END""",
+]
+
+REBUILD_FTS = ["INSERT INTO note_fts (note_fts) VALUES ('rebuild')"]
+
+REBUILD_SUMMARIES = [
+    "DELETE FROM note_stats_daily",
+    "DELETE FROM tag_stats",
+    "INSERT INTO note_stats_daily (owner, day, notes, words, chars, translated) "
+    "SELECT COALESCE(user_id, 0), date(created_at), count(*), sum(word_count), sum(char_count), count(title_zh) "
+    "FROM note GROUP BY 1, 2",
+    "INSERT INTO tag_stats (tag_id, notes, words) "
+    "SELECT nt.tag_id, count(*), sum(n.word_count) "
+    "FROM note_tag nt JOIN note n ON n.id = nt.note_id GROUP BY nt.tag_id",
+]
+
+
+def _upgrade_to_v2(cursor) -> None:
+    """Add note/tag owners to a database created before per-user scoping"""
+    from sqlalchemy.schema import CreateIndex, CreateTable
+    from src.models.tag import Tag
+
+    cursor.execute('ALTER TABLE note ADD COLUMN user_id INTEGER REFERENCES "user" (id) ON DELETE CASCADE')
+    # Tag names become unique per user: rebuild tag without its UNIQUE (name). legacy_alter_table
+    # keeps note_tag's foreign key pointing at "tag" rather than following the rename
+    cursor.execute('PRAGMA legacy_alter_table = ON')
+    cursor.execute('ALTER TABLE tag RENAME TO tag_v1')
+    cursor.execute(str(CreateTable(Tag.__table__).compile(dialect=db.engine.dialect)))
+    for index in Tag.__table__.indexes:
+        cursor.execute(str(CreateIndex(index).compile(dialect=db.engine.dialect)))
+    cursor.execute('INSERT INTO tag (id, name, color, created_at) SELECT id, name, color, created_at FROM tag_v1')
+    cursor.execute('DROP TABLE tag_v1')
+    cursor.execute('PRAGMA legacy_alter_table = OFF')
+    # Derived objects changed shape; drop them so create_schema recreates and rebuilds them
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+    for (trigger,) in cursor.fetchall():
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    for table in ('note_fts', 'note_stats_daily'):
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+    cursor.execute('DROP INDEX IF EXISTS idx_note_updated_at')
+
+
+def _upgrade_to_v3(cursor) -> None:
+    """Add the archive tier columns to notes"""
+    from sqlalchemy.schema import CreateIndex
+    from src.models.note import Note
+
+    cursor.execute('ALTER TABLE note ADD COLUMN is_archived BOOLEAN NOT NULL DEFAULT 0')
+    cursor.execute('ALTER TABLE note ADD COLUMN archived_at DATETIME')
+    cursor.execute('ALTER TABLE note ADD COLUMN last_accessed_at DATETIME')
+    for index in Note.__table__.indexes:
+        cursor.execute(str(CreateIndex(index).compile(dialect=db.engine.dialect)))
+
+
+# (version, note column the upgrade adds, upgrade, description)
+UPGRADES = [
+    (2, 'user_id', _upgrade_to_v2, 'per-user notes and tags'),
+    (3, 'is_archived', _upgrade_to_v3, 'note archive tier'),
+]
+
+
+def _upgrade() -> None:
+    """Migrate files created by older releases, in one transaction"""
+    raw = db.engine.raw_connection()
+    connection = raw.driver_connection
+    isolation_level = connection.isolation_level
+    connection.isolation_level = None  # Issue BEGIN/COMMIT ourselves so DDL is transactional
+    cursor = connection.cursor()
+    try:
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+        cursor.execute('PRAGMA table_info(note)')
+        columns = {row[1] for row in cursor.fetchall()}
+        pending = [upgrade for upgrade in UPGRADES if version < upgrade[0] and upgrade[1] not in columns]
+        if not pending:
+            return
+        # Table rebuilds need foreign keys off, which only takes effect outside a transaction
+        cursor.execute('PRAGMA foreign_keys = OFF')
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            for _, _, upgrade, _ in pending:
+                upgrade(cursor)
+            cursor.execute('PRAGMA foreign_key_check')
+            if cursor.fetchone():
+                raise RuntimeError('Foreign key violations after the SQLite schema upgrade')
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        for target, _, _, description in pending:
+            logger.info('Upgraded SQLite schema to version %s (%s)', target, description)
+    finally:
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
+        connection.isolation_level = isolation_level
+        raw.close()
+
+
+def create_schema() -> None:
+    """Create the tables, FTS index, triggers and summaries; safe to run on every start"""
+    # Primary only: read replicas receive the schema through replication
+    db.create_all(bind_key=None)
+    _upgrade()
+    with db.engine.begin() as conn:
+        existing = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for statement in SCHEMA:
+            conn.exec_driver_sql(statement)
+        # Index and summarize notes written before these objects existed
+        if 'note_fts' not in existing:
+            for statement in REBUILD_FTS:
+                conn.exec_driver_sql(statement)
+        if 'note_stats_daily' not in existing:
+            for statement in REBUILD_SUMMARIES:
+                conn.exec_driver_sql(statement)
+        conn.exec_driver_sql(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+
+def drop_schema() -> None:
+    """Drop everything create_schema made (benchmark resets)"""
+    with db.engine.begin() as conn:
+        for table in ('note_fts', 'note_archive_fts', 'note_stats_daily', 'tag_stats'):
+            conn.exec_driver_sql(f'DROP TABLE IF EXISTS {table}')
+    db.drop_all()
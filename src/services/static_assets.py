@@ -0,0 +1,185 @@
+"""
+Static Asset Pipeline for NoteTaker
+Builds an in-memory manifest of the static folder on first use: content-hashed
+names, precompressed gzip/brotli variants and HTML rewritten to the hashed
+URLs. Hashed assets are cached for a year; HTML and unhashed names briefly,
+revalidated by ETag
+"""
+import os
+import re
+import hashlib
+import mimetypes
+import threading
+from typing import Dict
+from flask import Response, request
+from src.services.compression import BROTLI_AVAILABLE, choose_encoding, compress_bytes
+from src.services.structured_logging import get_logger
+
+logger = get_logger('services.static_assets')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Assets already compressed by their format
+SKIP_COMPRESSION = ('image/png', 'image/jpeg', 'image/gif', 'image/webp', 'font/woff', 'font/woff2')
+# A variant is kept only if it saves at least this fraction of the original size
+MIN_SAVING = 0.1
+
+
+class Asset:
+    """One file: its bytes per encoding, ETag and whether it is addressed by a hashed name"""
+
+    def __init__(self, name: str, data: bytes, content_type: str, digest: str, hashed: bool):
+        self.name = name
+        self.content_type = content_type
+        self.digest = digest
+        self.hashed = hashed
+        self.variants = {'identity': data}
+
+    def etag(self, encoding: str) -> str:
+        return self.digest if encoding == 'identity' else f'{self.digest}-{encoding}'
+
+
+class StaticAssets:
+    def __init__(self):
+        self.folder = None
+        # HTML and the original (unhashed) names: revalidated after this many seconds
+        self.html_max_age = int(os.environ.get('STATIC_HTML_MAX_AGE', 60))
+        self.level = int(os.environ.get('STATIC_COMPRESSION_LEVEL', 9))
+        self.index = 'index.html'
+        self.reload = False
+        self._assets: Dict[str, Asset] = {}
+        self._urls: Dict[str, str] = {}  # Logical name -> hashed name
+        self._mtimes: Dict[str, float] = {}
+        self._built = False
+        self._app = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self._app = app
+        self.folder = app.static_folder
+        # Rebuild when a file changes; app.debug is read per request since app.run(debug=True) sets it late
+        self.reload = os.environ.get('STATIC_ASSETS_RELOAD', 'false').lower() == 'true'
+
+    # Building
+
+    def _sources(self) -> Dict[str, str]:
+        sources = {}
+        for root, dirs, files in os.walk(self.folder):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+            for filename in files:
+                if not filename.startswith('.'):
+                    path = os.path.join(root, filename)
+                    sources[os.path.relpath(path, self.folder).replace(os.sep, '/')] = path
+        return sources
+
+    def _compress(self, asset: Asset) -> None:
+        if asset.content_type.split(';')[0] in SKIP_COMPRESSION:
+            return
+        data = asset.variants['identity']
+        for encoding in (['br'] if BROTLI_AVAILABLE else []) + ['gzip']:
+            compressed = compress_bytes(data, encoding, min(self.level, 11 if encoding == 'br' else 9))
+            if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                asset.variants[encoding] = compressed
+
+    def _asset(self, name: str, data: bytes) -> Asset:
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        asset = Asset(name, data, content_type, hashlib.sha256(data).hexdigest()[:16], hashed=False)
+        self._compress(asset)
+        return asset
+
+    def build(self) -> None:
+        """Hash, rewrite and compress every file in the static folder, then swap in the new manifest"""
+        sources = self._sources()
+        assets, urls, pages = {}, {}, {}
+        for name, path in sources.items():
+            with open(path, 'rb') as source:
+                data = source.read()
+            if name.endswith('.html'):
+                pages[name] = data
+                continue
+            # Served under both names: app.js (short TTL) and app.<hash>.js (immutable)
+            asset = assets[name] = self._asset(name, data)
+            stem, ext = os.path.splitext(name)
+            hashed = Asset(f'{stem}.{asset.digest[:10]}{ext}', data, asset.content_type, asset.digest, hashed=True)
+            hashed.variants = asset.variants
+            assets[hashed.name] = hashed
+            urls[name] = hashed.name
+
+        # Pages keep their names and point at the hashed assets
+        if urls:
+            reference = re.compile(r'''((?:src|href)=["'])/(%s)(["'])''' % '|'.join(
+                re.escape(name) for name in sorted(urls, key=len, reverse=True)
+            ))
+        for name, data in pages.items():
+            if urls:
+                data = reference.sub(lambda match: f'{match.group(1)}/{urls[match.group(2)]}{match.group(3)}',
+                                     data.decode('utf-8')).encode('utf-8')
+            assets[name] = self._asset(name, data)
+
+        self._assets, self._urls = assets, urls
+        self._mtimes = {path: os.path.getmtime(path) for path in sources.values()}
+        self._built = True
+        logger.info('Built static asset manifest', extra={
+            'assets': len(sources),
+            'bytes': sum(len(asset.variants['identity']) for asset in assets.values() if not asset.hashed),
+            'compressed_bytes': sum(min(len(data) for data in asset.variants.values())
+                                    for asset in assets.values() if not asset.hashed)
+        })
+
+    def _stale(self) -> bool:
+        try:
+            return set(self._mtimes) != set(self._sources().values()) or \
+                any(os.path.getmtime(path) != mtime for path, mtime in self._mtimes.items())
+        except OSError:
+            return True
+
+    def _ensure_built(self) -> None:
+        reload = self.reload or (self._app is not None and self._app.debug)
+        if self._built and not (reload and self._stale()):
+            return
+        with self._lock:
+            if not self._built or (reload and self._stale()):
+                self.build()
+
+    # Serving
+
+    def serve(self, path: str) -> Response:
+        """The asset at path, or index.html for client-side routes"""
+        if self.folder is None:
+            return Response('Static folder not configured', 404)
+        self._ensure_built()
+        asset = self._assets.get(path) or self._assets.get(self.index)
+        if asset is None:
+            return Response(f'{self.index} not found', 404)
+
+        encodings = [name for name in asset.variants if name != 'identity']
+        encoding = (encodings and choose_encoding(request.headers.get('Accept-Encoding'), encodings)) or 'identity'
+        response = Response(status=200, content_type=asset.content_type)
+        response.set_etag(asset.etag(encoding))
+        response.vary.add('Accept-Encoding')
+        if asset.hashed:
+            response.headers['Cache-Control'] = IMMUTABLE
+        else:
+            response.headers['Cache-Control'] = f'public, max-age={self.html_max_age}, must-revalidate'
+
+        # Same content in any encoding: a validator for one variant matches them all
+        if any(request.if_none_match.contains(asset.etag(name)) for name in asset.variants):
+            response.status_code = 304
+            return response
+
+        response.set_data(asset.variants[encoding])
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def stats(self) -> Dict:
+        return {
+            'built': self._built,
+            'assets': sum(1 for asset in self._assets.values() if not asset.hashed),
+            'manifest': dict(self._urls)
+        }
+
+
+# Initialize pipeline instance
+static_assets = StaticAssets()
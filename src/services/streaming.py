@@ -0,0 +1,94 @@
+"""
+Streaming Helpers for NoteTaker
+Server-Sent Events framing and streamed GitHub Models chat completions
+"""
+import json
+import time
+from typing import Dict, Iterator, Optional, Tuple
+from src.services.metrics import metrics
+from src.services.llm_ledger import llm_ledger, LlmBudgetExceeded
+from src.services.structured_logging import get_logger
+
+logger = get_logger('services.streaming')
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'  # Stop nginx/Vercel proxies from buffering the stream
+}
+# Sent first so headers reach the browser before the model's first token
+SSE_OPEN = ': stream opened\n\n'
+
+
+class UpstreamStreamError(RuntimeError):
+    """Raised when the model API rejects a streaming request"""
+
+
+def sse_event(event: str, data, event_id: Optional[str] = None) -> str:
+    """Format one Server-Sent Event frame"""
+    frame = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+    return f"id: {event_id}\n{frame}" if event_id else frame
+
+
+def stream_payload(payload: Dict) -> Dict:
+    """Chat completion body with streaming (and a final usage chunk) turned on"""
+    return {**payload, 'stream': True, 'stream_options': {'include_usage': True}}
+
+
+def parse_chat_chunk(line) -> Tuple[Optional[str], Optional[Dict], bool]:
+    """(text delta, usage, done) for one line of a streamed chat completion"""
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    line = line.strip()
+    if not line.startswith('data:'):
+        return None, None, False
+    data = line[5:].strip()
+    if data == '[DONE]':
+        return None, None, True
+    chunk = json.loads(data)
+    choices = chunk.get('choices') or []
+    delta = (choices[0].get('delta') or {}).get('content') if choices else None
+    return delta, chunk.get('usage'), False
+
+
+def stream_chat_completion(url: str, headers: Dict, payload: Dict,
+                           service: str, operation: str) -> Iterator[str]:
+    """Yield text deltas as the model produces them
+
+    Closing the generator (e.g. when the client disconnects) closes the
+    upstream connection; the call is recorded with status 'cancelled'.
+    """
+    try:
+        llm_ledger.check_budget()
+    except LlmBudgetExceeded:
+        llm_ledger.record(service, operation, 'budget_exceeded')
+        raise
+
+    import requests  # Deferred: keeps requests/urllib3 off the cold-start import path
+    started = time.perf_counter()
+    status = 'error'
+    usage = None
+    response = None
+    try:
+        response = requests.post(url, headers=headers, json=stream_payload(payload), stream=True, timeout=30)
+        status = str(response.status_code)
+        if response.status_code != 200:
+            logger.warning('Streaming API error', extra={'operation': operation, 'status': response.status_code, 'body': response.text})
+            raise UpstreamStreamError(f'Model API returned {response.status_code}')
+
+        for line in response.iter_lines():
+            delta, chunk_usage, done = parse_chat_chunk(line)
+            if chunk_usage:
+                usage = chunk_usage
+            if done:
+                break
+            if delta:
+                yield delta
+    except GeneratorExit:
+        status = 'cancelled'
+        raise
+    finally:
+        if response is not None:
+            response.close()
+        elapsed = time.perf_counter() - started
+        metrics.observe_upstream(service, operation, elapsed, status)
+        llm_ledger.record(service, operation, status, elapsed * 1000, usage)
@@ -0,0 +1,156 @@
+"""
+Structured Logging for NoteTaker
+JSON log lines written from a background queue, with field truncation,
+per-route sampling and request-ID correlation
+"""
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+LOGGER_NAME = 'notetaker'
+MAX_FIELD_CHARS = int(os.environ.get('LOG_MAX_FIELD_CHARS', 200))
+
+_request_id: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+_sampled: ContextVar[bool] = ContextVar('log_sampled', default=True)
+
+# LogRecord attributes that are not user-supplied fields
+_RESERVED = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the notetaker namespace, e.g. get_logger('routes.note')"""
+    return logging.getLogger(f'{LOGGER_NAME}.{name}')
+
+
+def set_request_id(request_id: Optional[str] = None) -> str:
+    """Bind a request ID (generated if missing) to the current context"""
+    request_id = (request_id or uuid.uuid4().hex)[:64]
+    _request_id.set(request_id)
+    return request_id
+
+
+def truncate(value: Any, limit: int = MAX_FIELD_CHARS) -> Any:
+    """Shorten long strings (and strings inside dicts/lists) to at most limit characters"""
+    if isinstance(value, str):
+        if len(value) > limit:
+            return f'{value[:limit]}…(+{len(value) - limit} chars)'
+        return value
+    if isinstance(value, dict):
+        return {key: truncate(item, limit) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [truncate(item, limit) for item in value[:20]]
+        if len(value) > 20:
+            items.append(f'…(+{len(value) - 20} items)')
+        return items
+    return value
+
+
+def parse_sample_rates(raw: str) -> Dict[str, float]:
+    """Parse LOG_SAMPLE_RATES, e.g. 'note.update_note=0.05,note.create_note=0.2'"""
+    rates = {}
+    for part in (raw or '').split(','):
+        endpoint, _, rate = part.partition('=')
+        if endpoint.strip() and rate.strip():
+            try:
+                rates[endpoint.strip()] = min(max(float(rate), 0.0), 1.0)
+            except ValueError:
+                continue
+    return rates
+
+
+class ContextFilter(logging.Filter):
+    """Attaches the request ID, drops unsampled sub-WARNING records and truncates fields
+
+    Runs in the calling thread before the record is queued, so large payloads
+    are cut down before any formatting work happens.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and not _sampled.get():
+            return False
+        record.request_id = _request_id.get()
+        if record.args:
+            record.args = tuple(truncate(arg) for arg in record.args) if isinstance(record.args, tuple) \
+                else truncate(record.args)
+        for key, value in list(record.__dict__.items()):
+            if key not in _RESERVED and key != 'request_id':
+                record.__dict__[key] = truncate(value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and key not in entry and key != 'request_id':
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class StructuredLogging:
+    """Flask extension wiring the queue-based JSON logger and request correlation"""
+
+    def __init__(self):
+        self.listener = None
+        self.sample_rates = parse_sample_rates(os.environ.get('LOG_SAMPLE_RATES', ''))
+        self.default_rate = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+
+    def configure(self) -> None:
+        """Install the non-blocking queue handler on the notetaker logger (idempotent)"""
+        if self.listener is not None:
+            return
+
+        log_queue = queue.SimpleQueue()
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter())
+        self.listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(ContextFilter())
+
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.handlers = [queue_handler]
+        logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+        logger.propagate = False
+
+    def init_app(self, app) -> None:
+        self.configure()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        from flask import request
+
+        set_request_id(request.headers.get('X-Request-ID'))
+        rate = self.sample_rates.get(request.endpoint or '', self.default_rate)
+        _sampled.set(rate >= 1.0 or random.random() < rate)
+
+    def _after_request(self, response):
+        request_id = _request_id.get()
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+        return response
+
+
+# Initialize logging instance
+structured_logging = StructuredLogging()
@@ -0,0 +1,174 @@
+"""
+Tenant Scoping for NoteTaker
+Resolves the requesting user from a header set by the auth proxy and scopes
+note and tag queries, cache versions and heavy jobs to that user
+"""
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from flask import g, has_app_context, jsonify, request
+from src.services.cache import note_cache
+from src.services.metrics import metrics, Gauge
+
+_UNSET = object()
+
+# Blueprints that serve account management rather than one user's notes
+UNSCOPED_BLUEPRINTS = {'user'}
+
+
+class TenantError(ValueError):
+    """Raised when the user header is malformed, or required and missing"""
+
+
+class TenantQuotaExceeded(RuntimeError):
+    """Raised when a user already runs TENANT_MAX_CONCURRENT_JOBS heavy jobs"""
+
+
+def _parse_user_id(value) -> Optional[int]:
+    if value is None or not str(value).strip():
+        return None
+    value = str(value).strip()
+    if not value.isdigit() or int(value) <= 0:
+        raise TenantError(f'Invalid user id: {value[:20]}')
+    return int(value)
+
+
+class Tenancy:
+    """Notes and tags with user_id NULL form the shared scope used when no user is given"""
+
+    def __init__(self):
+        # Trusted as-is: deploy behind a proxy that authenticates users and sets this header
+        self.header = os.environ.get('TENANT_USER_HEADER', 'X-User-Id')
+        self.default_user_id = _parse_user_id(os.environ.get('DEFAULT_USER_ID'))
+        self.require_user = os.environ.get('TENANT_REQUIRE_USER', 'false').lower() == 'true'
+        self.max_jobs = int(os.environ.get('TENANT_MAX_CONCURRENT_JOBS', 2))
+        # Set by the ASGI handlers, which run outside a Flask request
+        self._user: ContextVar[Optional[int]] = ContextVar('tenant_user_id', default=self.default_user_id)
+        self._jobs: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self._counts = {'jobs_started': 0, 'jobs_rejected': 0, 'rejected_requests': 0}
+
+    def init_app(self, app) -> None:
+        app.before_request(self._before_request)
+        note_cache.namespace = self.cache_namespace
+        metrics.register(Gauge(
+            'notetaker_tenant_jobs', 'Heavy jobs (analyze-all, export, import) running by kind',
+            ('kind',), self._job_gauge
+        ))
+
+    def resolve(self, value: Optional[str]) -> Optional[int]:
+        """User id from a header value, falling back to DEFAULT_USER_ID"""
+        user_id = _parse_user_id(value)
+        if user_id is None:
+            user_id = self.default_user_id
+        if user_id is None and self.require_user:
+            raise TenantError(f'{self.header} header is required')
+        return user_id
+
+    def _before_request(self):
+        if request.blueprint is None or request.blueprint in UNSCOPED_BLUEPRINTS:
+            return None
+        try:
+            g.tenant_user_id = self.resolve(request.headers.get(self.header))
+        except TenantError as e:
+            self._counts['rejected_requests'] += 1
+            return jsonify({'success': False, 'error': str(e)}), 401 if self.require_user else 400
+        return None
+
+    def current_user_id(self) -> Optional[int]:
+        """The requesting user, or None for the shared scope"""
+        if has_app_context():
+            user_id = g.get('tenant_user_id', _UNSET)
+            if user_id is not _UNSET:
+                return user_id
+        return self._user.get()
+
+    @contextmanager
+    def acting_as(self, user_id: Optional[int]):
+        """Scope code running outside a Flask request (ASGI handlers) to user_id"""
+        token = self._user.set(user_id)
+        try:
+            yield
+        finally:
+            self._user.reset(token)
+
+    # Query scoping
+
+    def _user_id(self, user_id) -> Optional[int]:
+        return self.current_user_id() if user_id is _UNSET else user_id
+
+    def owner_clause(self, column, user_id=_UNSET):
+        """column = user, or IS NULL for the shared scope; both served by the (user_id, ...) indexes"""
+        user_id = self._user_id(user_id)
+        return column.is_(None) if user_id is None else column == user_id
+
+    def owner_sql(self, column: str = 'note.user_id', user_id=_UNSET) -> str:
+        """owner_clause for raw SQL; the id is an int validated by resolve()"""
+        user_id = self._user_id(user_id)
+        return f'{column} IS NULL' if user_id is None else f'{column} = {int(user_id)}'
+
+    def query(self, model):
+        """model.query limited to the current user's rows"""
+        return model.query.filter(self.owner_clause(model.user_id))
+
+    def get(self, model, row_id: int):
+        return self.query(model).filter(model.id == row_id).first()
+
+    def get_or_404(self, model, row_id: int):
+        """Other users' rows are reported as missing, not forbidden"""
+        return self.query(model).filter(model.id == row_id).first_or_404()
+
+    def cache_namespace(self, user_id=_UNSET) -> Optional[str]:
+        """Per-user cache versions, so one user's writes leave other users' entries cached"""
+        user_id = self._user_id(user_id)
+        return None if user_id is None else f'u{user_id}'
+
+    # Quotas
+
+    @contextmanager
+    def job(self, kind: str):
+        """Count a heavy job against the user's concurrency quota for its duration"""
+        key = (self.current_user_id(), kind)
+        with self._lock:
+            running = sum(count for (user_id, _), count in self._jobs.items() if user_id == key[0])
+            if self.max_jobs and running >= self.max_jobs:
+                self._counts['jobs_rejected'] += 1
+                raise TenantQuotaExceeded(
+                    f'At most {self.max_jobs} export, import or batch analysis jobs may run at once'
+                )
+            self._jobs[key] = self._jobs.get(key, 0) + 1
+            self._counts['jobs_started'] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._jobs[key] -= 1
+                if not self._jobs[key]:
+                    del self._jobs[key]
+
+    def _job_gauge(self):
+        with self._lock:
+            totals = {}
+            for (_, kind), count in self._jobs.items():
+                totals[kind] = totals.get(kind, 0) + count
+        return [((kind,), count) for kind, count in totals.items()]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            running = sum(self._jobs.values())
+            users = len({user_id for user_id, _ in self._jobs})
+        return {
+            'header': self.header,
+            'default_user_id': self.default_user_id,
+            'require_user': self.require_user,
+            'max_concurrent_jobs': self.max_jobs,
+            'running_jobs': running,
+            'users_with_jobs': users,
+            **self._counts
+        }
+
+
+# Initialize tenancy instance
+tenancy = Tenancy()
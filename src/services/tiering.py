@@ -0,0 +1,241 @@
+"""
+Hot/Cold Note Tiering for NoteTaker
+Moves notes untouched for ARCHIVE_AFTER_DAYS into note_archive as one
+compressed payload, leaving a stub with the title, tags, statistics and a
+short preview; stubs are rehydrated when the note is opened or edited
+"""
+import os
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import and_, bindparam, delete, func, insert, null, or_, select, text, update
+from src.models.user import db
+from src.models.note import Note
+from src.models.note_archive import NoteArchive
+from src.services.cache import note_cache
+from src.services.read_replicas import read_replicas
+from src.services.sqlite_backend import uses_sqlite
+from src.services.tenancy import tenancy
+from src.services.structured_logging import get_logger
+
+logger = get_logger('services.tiering')
+
+_note = Note.__table__
+_archive = NoteArchive.__table__
+
+# Moved into the archive payload; everything else stays on the stub
+COLD_FIELDS = ('content', 'content_zh', 'ai_suggestions')
+
+# Written literally so the planner matches the idx_note_hot_updated_at partial index on both dialects
+_HOT = text('NOT note.is_archived')
+_ARCHIVED = text('note.is_archived')
+
+
+class NoteTiering:
+    def __init__(self):
+        # 0 disables archiving; rehydration and archive search keep working
+        self.archive_after_days = float(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+        self.batch_size = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+        self.max_per_run = int(os.environ.get('ARCHIVE_MAX_PER_RUN', 5000))
+        self.preview_chars = int(os.environ.get('ARCHIVE_PREVIEW_CHARS', 200))
+        self.level = int(os.environ.get('ARCHIVE_COMPRESSION_LEVEL', 9))
+        self._counts = {'runs': 0, 'archived': 0, 'rehydrated': 0, 'archived_bytes': 0, 'stored_bytes': 0}
+
+    def _pack(self, row):
+        """(uncompressed size, payload) for a row's cold fields"""
+        raw = json.dumps({field: row[field] for field in COLD_FIELDS}).encode('utf-8')
+        return len(raw), zlib.compress(raw, self.level)
+
+    @staticmethod
+    def _unpack(payload: bytes) -> Dict:
+        return json.loads(zlib.decompress(payload))
+
+    def _invalidate(self, owners) -> None:
+        for owner in owners:
+            note_cache.invalidate('notes', namespace=tenancy.cache_namespace(owner))
+
+    # Archiving
+
+    def run(self, max_notes: Optional[int] = None, now: Optional[datetime] = None) -> Dict:
+        """Archive idle notes of every user in ARCHIVE_BATCH_SIZE transactions, up to max_notes"""
+        if not self.archive_after_days:
+            return {'archived': 0, 'enabled': False}
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=self.archive_after_days)
+        max_notes = max_notes or self.max_per_run
+        archived, owners = 0, set()
+        self._counts['runs'] += 1
+        while archived < max_notes:
+            size = min(self.batch_size, max_notes - archived)
+            try:
+                batch = self._archive_batch(cutoff, size, now)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            archived += len(batch)
+            owners.update(batch)
+            if len(batch) < size:
+                break
+        self._invalidate(owners)
+        if archived:
+            logger.info('Archived idle notes', extra={'archived': archived, 'cutoff': cutoff.isoformat()})
+        return {'archived': archived, 'enabled': True, 'cutoff': cutoff.isoformat()}
+
+    def _archive_batch(self, cutoff: datetime, size: int, now: datetime) -> List[Optional[int]]:
+        """Archive up to size notes; returns the owner of each archived note"""
+        idle = (_note.c.updated_at < cutoff, or_(_note.c.last_accessed_at.is_(None), _note.c.last_accessed_at < cutoff))
+        rows = db.session.execute(
+            select(_note.c.id, _note.c.user_id, _note.c.title, *(_note.c[field] for field in COLD_FIELDS))
+            .where(_HOT, *idle).order_by(_note.c.updated_at).limit(size)
+        ).mappings().all()
+        if not rows:
+            return []
+
+        # Rows written since the SELECT have a fresh updated_at and are skipped here, so no edit is lost
+        stubbed = set(db.session.execute(
+            update(_note).where(_note.c.id.in_([row['id'] for row in rows]), _HOT, *idle).values(
+                content=func.substr(_note.c.content, 1, self.preview_chars),
+                content_zh=null(), ai_suggestions=null(),
+                is_archived=True, archived_at=now,
+                updated_at=_note.c.updated_at  # Archiving is not an edit (PG trigger: database_migration_note_archive.sql)
+            ).returning(_note.c.id)
+        ).scalars())
+
+        archived = []
+        for row in rows:
+            if row['id'] not in stubbed:
+                continue
+            raw_size, payload = self._pack(row)
+            archived.append({
+                'note_id': row['id'], 'user_id': row['user_id'], 'payload': payload, 'size': raw_size,
+                'archived_at': now, 'title': row['title'], 'content': row['content'] or ''
+            })
+        if uses_sqlite():
+            db.session.execute(insert(_archive), [
+                {key: item[key] for key in ('note_id', 'user_id', 'payload', 'size', 'archived_at')} for item in archived
+            ])
+            db.session.execute(text(
+                'INSERT INTO note_archive_fts (rowid, user_id, title, content) VALUES (:note_id, :user_id, :title, :content)'
+            ), archived)
+        else:
+            db.session.execute(text(
+                'INSERT INTO note_archive (note_id, user_id, payload, size, archived_at, search) '
+                "VALUES (:note_id, :user_id, :payload, :size, :archived_at, to_tsvector('simple', :title || ' ' || :content))"
+            ), archived)
+
+        self._counts['archived'] += len(archived)
+        self._counts['archived_bytes'] += sum(item['size'] for item in archived)
+        self._counts['stored_bytes'] += sum(len(item['payload']) for item in archived)
+        return [item['user_id'] for item in archived]
+
+    # Rehydration
+
+    def rehydrate_many(self, note_ids: List[int], now: Optional[datetime] = None) -> List[int]:
+        """Restore the user's archived notes among note_ids into the hot tier, in the caller's transaction"""
+        if not note_ids:
+            return []
+        now = now or datetime.utcnow()
+        rows = db.session.execute(
+            select(_archive.c.note_id, _archive.c.user_id, _archive.c.payload, _note.c.title)
+            .join(_note, _note.c.id == _archive.c.note_id)
+            .where(_archive.c.note_id.in_(list(note_ids)), _ARCHIVED, tenancy.owner_clause(_note.c.user_id))
+        ).all()
+        if not rows:
+            return []
+
+        restored = []
+        for row in rows:
+            cold = self._unpack(row.payload)
+            restored.append({'note_id': row.note_id, 'user_id': row.user_id, 'title': row.title,
+                             'cold_content': cold['content'], 'cold_content_zh': cold['content_zh'],
+                             'cold_ai_suggestions': cold['ai_suggestions']})
+        db.session.execute(
+            update(_note).where(_note.c.id == bindparam('note_id')).values(
+                content=bindparam('cold_content'), content_zh=bindparam('cold_content_zh'),
+                ai_suggestions=bindparam('cold_ai_suggestions', type_=_note.c.ai_suggestions.type),
+                is_archived=False, archived_at=None, last_accessed_at=now,
+                updated_at=_note.c.updated_at  # Opening a note does not reorder the list
+            ),
+            restored
+        )
+        db.session.execute(delete(_archive).where(_archive.c.note_id.in_([item['note_id'] for item in restored])))
+        if uses_sqlite():
+            # Contentless FTS5 rows are removed by repeating the values they were indexed with
+            db.session.execute(text(
+                "INSERT INTO note_archive_fts (note_archive_fts, rowid, user_id, title, content) "
+                "VALUES ('delete', :note_id, :user_id, :title, :content)"
+            ), [{'note_id': item['note_id'], 'user_id': item['user_id'], 'title': item['title'],
+                 'content': item['cold_content'] or ''} for item in restored])
+        self._counts['rehydrated'] += len(restored)
+        return [item['note_id'] for item in restored]
+
+    def load(self, note: Optional[Note]) -> Optional[Note]:
+        """Return note with its content, rehydrating (and committing) first if it is archived"""
+        if note is None or not note.is_archived:
+            return note
+        owner = note.user_id
+        # The stub may have come from a replica; rehydrate and reload it from the primary
+        read_replicas.use_primary()
+        try:
+            self.rehydrate_many([note.id])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._invalidate({owner})
+        return note  # Expired by the commit; attributes reload with the full content
+
+    def get(self, note_id: int) -> Optional[Note]:
+        """tenancy.get for notes, rehydrating archived ones"""
+        return self.load(tenancy.get(Note, note_id))
+
+    def get_or_404(self, note_id: int) -> Note:
+        return self.load(tenancy.get_or_404(Note, note_id))
+
+    # Reads that should not move notes back
+
+    def full_dicts(self, notes: List[Note]) -> List[Dict]:
+        """to_dict() of each note with archived content read from the cold tier in place (exports)"""
+        archived = [note.id for note in notes if note.is_archived]
+        payloads = {}
+        for start in range(0, len(archived), 1000):
+            payloads.update(db.session.execute(
+                select(_archive.c.note_id, _archive.c.payload).where(_archive.c.note_id.in_(archived[start:start + 1000]))
+            ).all())
+        result = []
+        for note in notes:
+            data = note.to_dict()
+            if note.id in payloads:
+                cold = self._unpack(payloads[note.id])
+                data.update(cold, ai_suggestions=cold['ai_suggestions'] or {})
+            result.append(data)
+        return result
+
+    def search_filter(self, match: str):
+        """Note.id IN (archived notes of the user matching match), for /api/notes/search
+
+        match is an fts_query() expression on SQLite and a to_tsquery('simple') string on PostgreSQL.
+        """
+        if uses_sqlite():
+            matches = text('SELECT rowid FROM note_archive_fts WHERE note_archive_fts MATCH :archive_match')
+        else:
+            matches = text(
+                f'SELECT note_id FROM note_archive WHERE {tenancy.owner_sql("note_archive.user_id")} '
+                "AND search @@ to_tsquery('simple', :archive_match)"
+            )
+        # Stale FTS rows of deleted notes match nothing: ids are never reused
+        return and_(_ARCHIVED, Note.id.in_(matches.bindparams(archive_match=match).columns(Note.id)))
+
+    def stats(self) -> Dict:
+        return {
+            'archive_after_days': self.archive_after_days,
+            'batch_size': self.batch_size,
+            'preview_chars': self.preview_chars,
+            **self._counts
+        }
+
+
+# Initialize tiering instance
+note_tiering = NoteTiering()
@@ -1,10 +1,18 @@
 import os
 import json
-import requests
+import time
+from src.services.metrics import metrics
+from src.services.llm_ledger import llm_ledger, LlmBudgetExceeded
+from src.services.structured_logging import get_logger
+from src.services.streaming import stream_chat_completion
+
+logger = get_logger('services.translation')
+
+TRANSLATION_FAILED = "翻译失败 (Translation failed)"
 
 class TranslationService:
     def __init__(self):
-        self.endpoint = "https://models.github.ai/inference/chat/completions"
+        self.endpoint = os.environ.get('TRANSLATION_API_ENDPOINT', "https://models.github.ai/inference/chat/completions")
         self.model = "openai/gpt-4o-mini"
     
     def _get_headers(self):
@@ -18,6 +26,24 @@ class TranslationService:
             "Content-Type": "application/json"
         }
     
+    def _payload(self, text):
+        """Chat completion request body for one translation"""
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system", 
+                    "content": "You are a professional translator. Translate the given English text to Chinese (Simplified). Only return the translated text, no explanations or additional content."
+                },
+                {
+                    "role": "user", 
+                    "content": f"Translate this to Chinese: {text}"
+                }
+            ],
+            "temperature": 0.3,
+            "top_p": 1.0
+        }
+    
     def translate_to_chinese(self, text):
         """Translate English text to Chinese using GitHub Models"""
         try:
@@ -25,35 +51,50 @@ class TranslationService:
                 return ""
             
             headers = self._get_headers()
+            import requests  # Deferred: keeps requests/urllib3 off the cold-start import path
             
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {
-                        "role": "system", 
-                        "content": "You are a professional translator. Translate the given English text to Chinese (Simplified). Only return the translated text, no explanations or additional content."
-                    },
-                    {
-                        "role": "user", 
-                        "content": f"Translate this to Chinese: {text}"
-                    }
-                ],
-                "temperature": 0.3,
-                "top_p": 1.0
-            }
+            payload = self._payload(text)
             
-            response = requests.post(self.endpoint, headers=headers, json=payload, timeout=30)
+            try:
+                llm_ledger.check_budget()
+            except LlmBudgetExceeded:
+                llm_ledger.record('translation', 'translate_to_chinese', 'budget_exceeded')
+                raise
+
+            started = time.perf_counter()
+            try:
+                response = requests.post(self.endpoint, headers=headers, json=payload, timeout=30)
+            except Exception:
+                elapsed = time.perf_counter() - started
+                metrics.observe_upstream('translation', 'translate_to_chinese', elapsed, 'error')
+                llm_ledger.record('translation', 'translate_to_chinese', 'error', elapsed * 1000)
+                raise
+            elapsed = time.perf_counter() - started
+            status = str(response.status_code)
+            metrics.observe_upstream('translation', 'translate_to_chinese', elapsed, status)
             
             if response.status_code == 200:
                 result = response.json()
+                llm_ledger.record('translation', 'translate_to_chinese', status, elapsed * 1000, result.get('usage'))
                 return result["choices"][0]["message"]["content"].strip()
             else:
-                print(f"Translation API error: {response.status_code} - {response.text}")
-                return "翻译失败 (Translation failed)"
+                llm_ledger.record('translation', 'translate_to_chinese', status, elapsed * 1000)
+                logger.warning('Translation API error', extra={'status': response.status_code, 'body': response.text})
+                return TRANSLATION_FAILED
         
         except Exception as e:
-            print(f"Translation error: {e}")
-            return "翻译失败 (Translation failed)"
+            logger.warning('Translation error: %s', e)
+            return TRANSLATION_FAILED
+
+    def stream_translation(self, text):
+        """Yield the Chinese translation of text as it streams from the model
+
+        A generator, so callers can always close() it; closing also closes the upstream stream
+        """
+        if not text or not text.strip():
+            return
+        yield from stream_chat_completion(self.endpoint, self._get_headers(), self._payload(text),
+                                      'translation', 'translate_to_chinese')
 
 # Global translation service instance
 translation_service = TranslationService()
\ No newline at end of file
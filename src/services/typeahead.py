@@ -0,0 +1,291 @@
+"""
+Typeahead Index for NoteTaker
+In-memory sorted token arrays over note titles and tag names, one per user,
+answering prefix lookups with bisect and ranking matches by recency
+"""
+import os
+import re
+import sys
+import heapq
+import bisect
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from src.models.note import Note, db
+from src.models.tag import Tag
+from src.services.structured_logging import get_logger
+from src.services.tenancy import tenancy
+
+logger = get_logger('services.typeahead')
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+MAX_TOKENS_PER_TITLE = 16
+
+
+def tokenize(text: str) -> List[str]:
+    """Distinct lowercase word tokens, interned so repeated words share storage"""
+    seen = []
+    for token in _TOKEN.findall((text or '').casefold()):
+        if token not in seen:
+            seen.append(sys.intern(token))
+            if len(seen) >= MAX_TOKENS_PER_TITLE:
+                break
+    return seen
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            pass
+    return datetime.utcnow().timestamp()
+
+
+class UserIndex:
+    """One user's sorted (token, ref) pairs; refs are note ids, or negated tag numbers"""
+
+    def __init__(self, user_id: Optional[int], max_scan: int):
+        self.user_id = user_id
+        self.max_scan = max_scan
+        self._lock = threading.RLock()
+        self._tokens: List[str] = []
+        self._refs = array('q')
+        self._notes: Dict[int, Tuple[str, float]] = {}  # note_id -> (title, updated)
+        self._tags: Dict[str, Tuple[int, float]] = {}  # name -> (tag number, created)
+        self._next_tag = 1
+        self._stale = True
+        self._pending: List[Dict] = []  # events received while stale, replayed after a rebuild
+        self._build_lock = threading.Lock()
+        self._builds = 0
+
+    # Building and maintenance
+
+    def _insert(self, tokens: Iterable[str], ref: int) -> None:
+        for token in tokens:
+            i = bisect.bisect_left(self._tokens, token)
+            # Keep pairs ordered by (token, ref) so removal can bisect too
+            while i < len(self._tokens) and self._tokens[i] == token and self._refs[i] < ref:
+                i += 1
+            self._tokens.insert(i, token)
+            self._refs.insert(i, ref)
+
+    def _remove(self, tokens: Iterable[str], ref: int) -> None:
+        for token in tokens:
+            i = bisect.bisect_left(self._tokens, token)
+            while i < len(self._tokens) and self._tokens[i] == token:
+                if self._refs[i] == ref:
+                    del self._tokens[i]
+                    del self._refs[i]
+                    break
+                i += 1
+
+    def rebuild(self) -> None:
+        """Load the user's note titles and tag names from the database and sort once"""
+        with self._build_lock:
+            if self._stale:
+                self._rebuild()
+
+    def _rebuild(self) -> None:
+        with self._lock:
+            # Anything committed before this point is in the snapshot below
+            self._pending = []
+        notes = db.session.execute(
+            select(Note.id, Note.title, Note.updated_at).where(tenancy.owner_clause(Note.user_id, self.user_id))
+        ).all()
+        tags = db.session.execute(
+            select(Tag.name, Tag.created_at).where(tenancy.owner_clause(Tag.user_id, self.user_id))
+        ).all()
+
+        note_map = {row.id: (row.title, _timestamp(row.updated_at)) for row in notes}
+        tag_map = {}
+        pairs = []
+        for note_id, (title, _) in note_map.items():
+            pairs.extend((token, note_id) for token in tokenize(title))
+        for number, row in enumerate(tags, start=1):
+            tag_map[row.name] = (number, _timestamp(row.created_at))
+            pairs.extend((token, -number) for token in tokenize(row.name))
+        pairs.sort()
+
+        with self._lock:
+            self._tokens = [token for token, _ in pairs]
+            self._refs = array('q', (ref for _, ref in pairs))
+            self._notes = note_map
+            self._tags = tag_map
+            self._next_tag = len(tags) + 1
+            self._stale = False
+            self._builds += 1
+            pending, self._pending = self._pending, []
+            for event in pending:
+                self._apply(event)
+
+    def invalidate(self) -> None:
+        """Rebuild from the database on the next lookup"""
+        with self._lock:
+            self._stale = True
+            self._pending = []
+
+    def upsert_note(self, note_id: int, title: str, updated=None) -> None:
+        with self._lock:
+            previous = self._notes.get(note_id)
+            if previous:
+                self._remove(tokenize(previous[0]), note_id)
+            self._notes[note_id] = (title, _timestamp(updated))
+            self._insert(tokenize(title), note_id)
+
+    def remove_note(self, note_id: int) -> None:
+        with self._lock:
+            previous = self._notes.pop(note_id, None)
+            if previous:
+                self._remove(tokenize(previous[0]), note_id)
+
+    def upsert_tag(self, name: str, created=None) -> None:
+        with self._lock:
+            if name in self._tags:
+                return
+            self._tags[name] = (self._next_tag, _timestamp(created))
+            self._insert(tokenize(name), -self._next_tag)
+            self._next_tag += 1
+
+    def apply_event(self, event: Dict) -> None:
+        """Change feed listener; bulk changes without titles fall back to a lazy rebuild"""
+        with self._lock:
+            if not self._stale:
+                self._apply(event)
+            elif len(self._pending) < 10000:
+                self._pending.append(event)
+
+    def _apply(self, event: Dict) -> None:
+        kind = event.get('type')
+        if event.get('fields'):
+            return  # AI enrichment only, titles unchanged
+        if kind in ('note.created', 'note.updated') and 'title' in event:
+            self.upsert_note(event['note_id'], event['title'], event.get('at'))
+        elif kind == 'note.deleted':
+            self.remove_note(event['note_id'])
+        elif kind == 'notes.deleted' and event.get('note_ids'):
+            for note_id in event['note_ids']:
+                self.remove_note(note_id)
+        elif kind == 'tag.created':
+            self.upsert_tag(event['tag_name'], event.get('at'))
+        elif kind in ('notes.created', 'notes.updated', 'notes.deleted', 'notes.imported', 'reset'):
+            self.invalidate()
+
+    # Lookup
+
+    def suggest(self, prefix: str, limit: int = 10) -> Dict[str, List[Dict]]:
+        """Most recently updated notes and tags with a word starting with prefix"""
+        words = tokenize(prefix)
+        if not words:
+            return {'notes': [], 'tags': []}
+        if self._stale:
+            self.rebuild()
+        # Earlier words must appear in the title; the last one is the prefix being typed
+        last, earlier = words[-1], words[:-1]
+
+        with self._lock:
+            note_ids = set()
+            tag_numbers = set()
+            i = bisect.bisect_left(self._tokens, last)
+            end = min(len(self._tokens), i + self.max_scan)
+            while i < end and self._tokens[i].startswith(last):
+                ref = self._refs[i]
+                if ref > 0:
+                    note_ids.add(ref)
+                else:
+                    tag_numbers.add(-ref)
+                i += 1
+
+            notes = ((note_id, self._notes[note_id]) for note_id in note_ids if note_id in self._notes)
+            if earlier:
+                notes = ((note_id, entry) for note_id, entry in notes
+                         if all(word in entry[0].casefold() for word in earlier))
+            top_notes = heapq.nlargest(limit, notes, key=lambda item: item[1][1])
+
+            tags = []
+            if tag_numbers and not earlier:
+                tags = heapq.nlargest(
+                    limit,
+                    ((name, entry) for name, entry in self._tags.items() if entry[0] in tag_numbers),
+                    key=lambda item: item[1][1]
+                )
+
+        return {
+            'notes': [{'id': note_id, 'title': title} for note_id, (title, _) in top_notes],
+            'tags': [{'name': name} for name, _ in tags]
+        }
+
+    def stats(self) -> Dict:
+        return {
+            'tokens': len(self._tokens),
+            'notes': len(self._notes),
+            'tags': len(self._tags),
+            'stale': self._stale,
+            'builds': self._builds
+        }
+
+
+class TypeaheadIndex:
+    """Per-user indexes, built on a user's first lookup; least recently used ones are dropped"""
+
+    def __init__(self):
+        self.max_scan = int(os.environ.get('TYPEAHEAD_MAX_SCAN', 20000))
+        self.max_users = int(os.environ.get('TYPEAHEAD_MAX_USERS', 1000))
+        self._users: 'OrderedDict[Optional[int], UserIndex]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._evicted = 0
+
+    def init_app(self, feed) -> None:
+        """Follow note and tag mutations through the change feed"""
+        feed.add_listener(self.apply_event)
+
+    def _index(self, user_id: Optional[int]) -> UserIndex:
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None:
+                index = self._users[user_id] = UserIndex(user_id, self.max_scan)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+                    self._evicted += 1
+            self._users.move_to_end(user_id)
+            return index
+
+    def apply_event(self, event: Dict) -> None:
+        """Change feed listener; events go to their user's index if it is loaded"""
+        if event.get('type') == 'reset':
+            with self._lock:
+                indexes = list(self._users.values())
+            for index in indexes:
+                index.apply_event(event)
+            return
+        with self._lock:
+            index = self._users.get(event.get('user_id'))
+        if index is not None:
+            index.apply_event(event)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._users.clear()
+
+    def suggest(self, prefix: str, limit: int = 10, user_id: Optional[int] = None) -> Dict[str, List[Dict]]:
+        """Most recently updated notes and tags of user_id with a word starting with prefix"""
+        return self._index(user_id).suggest(prefix, limit)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            indexes = list(self._users.values())
+        totals = {'users': len(indexes), 'evicted': self._evicted, 'tokens': 0, 'notes': 0, 'tags': 0,
+                  'stale': 0, 'builds': 0}
+        for index in indexes:
+            for name, value in index.stats().items():
+                totals[name] += int(value)
+        return totals
+
+
+# Initialize index instance
+typeahead_index = TypeaheadIndex()
@@ -175,9 +175,24 @@ class NoteTaker {
     }
 
     async selectNote(noteId) {
-        const note = this.notes.find(n => n.id === noteId);
+        let note = this.notes.find(n => n.id === noteId);
         if (!note) return;
 
+        // Archived notes are listed with a preview only; opening one restores its full content
+        if (note.archived) {
+            try {
+                const response = await fetch(`/api/notes/${noteId}`);
+                if (!response.ok) throw new Error('Failed to load note');
+                note = await response.json();
+                const noteIndex = this.notes.findIndex(n => n.id === noteId);
+                if (noteIndex !== -1) this.notes[noteIndex] = note;
+            } catch (error) {
+                console.error('Error loading archived note:', error);
+                this.showMessage('Failed to load note', 'error');
+                return;
+            }
+        }
+
         this.currentNote = note;
         this.clearAIElements(); // Clear tags and suggestions from previous note
         this.showEditor();
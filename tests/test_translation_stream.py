@@ -0,0 +1,54 @@
+"""
+Streaming translation endpoint tests
+Run with: python -m pytest tests
+"""
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ['ADMISSION_ENABLED'] = 'false'
+os.environ.setdefault('GITHUB_TOKEN', 'test-token')
+
+import pytest
+
+from src.main import app
+from src.services import translation
+
+
+def _events(body: str):
+    events = []
+    for frame in body.split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in frame.splitlines() if not line.startswith(':'))
+        if 'event' in lines:
+            events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Stand-in for GitHub Models: one delta per translated text
+    monkeypatch.setattr(translation, 'stream_chat_completion', lambda *args: iter(['标题']))
+    return app.test_client()
+
+
+def test_stream_translation_of_empty_content_is_saved(client):
+    note_id = client.post('/api/notes', json={'title': 'Title', 'content': ''}).get_json()['id']
+
+    response = client.get(f'/api/notes/{note_id}/translate/stream')
+    events = _events(response.get_data(as_text=True))
+
+    assert events[-1] == ('done', {'success': True, 'title_zh': '标题', 'content_zh': ''})
+    note = client.get(f'/api/notes/{note_id}').get_json()
+    assert note['title_zh'] == '标题'
+    assert note['content_zh'] == ''
+
+
+def test_stream_translation_of_empty_text_is_closeable():
+    deltas = translation.translation_service.stream_translation('   ')
+    assert list(deltas) == []
+    deltas.close()